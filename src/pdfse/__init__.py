@@ -0,0 +1,3 @@
+from .extractor import Extractor
+
+__all__ = ["Extractor"]
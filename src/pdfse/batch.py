@@ -0,0 +1,213 @@
+import copy
+import time
+from typing import Any, Callable
+from pdfse.wordspace import WordSpace
+from pdfse.machine import CHECKS, COMMANDS, ExecutionConfig, get_execution_config
+
+# A compiled command is a tuple whose first item is its kind:
+#   ("command", function, args)
+#   ("loop", condition, body)
+#   ("if", condition, then, else)
+#   ("fail",)
+# where a condition is (function, args, expected result) and functions are
+# unbound WordSpace methods, so one compiled plan serves every document.
+# "fail" stands for a command that makes HeuristicMachine abandon the field.
+Op = tuple
+Condition = tuple[Callable[..., bool], dict[str, Any], Any]
+
+
+def _never(wordspace: WordSpace) -> bool:
+    return False
+
+
+def _compile_condition(condition: dict[str, Any]) -> Condition:
+    # HeuristicMachine evaluates an unknown check, or one whose arguments
+    # don't fit, as false
+    name = condition.get("name")
+    args = condition.get("args", {})
+    if name not in CHECKS or not isinstance(args, dict):
+        return _never, {}, True
+    return getattr(WordSpace, name), args, condition.get("check", True)
+
+
+def compile_commands(commands: Any) -> list[Op]:
+    """
+    Resolve and validate a command list once. Commands HeuristicMachine
+    would skip (unknown names, loops and ifs missing a condition or body)
+    are dropped.
+    """
+    ops: list[Op] = []
+    if not isinstance(commands, list):
+        return ops
+    for command in commands:
+        if not isinstance(command, dict):
+            continue
+        kind = command.get("type")
+        if kind == "command":
+            name = command.get("name")
+            args = command.get("args", {})
+            if name in COMMANDS and isinstance(args, dict):
+                ops.append(("command", getattr(WordSpace, name), args))
+        elif kind == "loop":
+            condition = command.get("condition")
+            if not condition or not command.get("body"):
+                continue
+            if not isinstance(condition, dict):
+                ops.append(("fail",))
+                continue
+            ops.append(("loop", _compile_condition(condition), compile_commands(command.get("body"))))
+        elif kind == "if":
+            condition = command.get("condition")
+            if not condition or not command.get("then"):
+                continue
+            if not isinstance(condition, dict):
+                ops.append(("fail",))
+                continue
+            then_branch = compile_commands(command.get("then"))
+            else_branch = compile_commands(command.get("else"))
+            ops.append(("if", _compile_condition(condition), then_branch, else_branch))
+    return ops
+
+
+class BatchExecutor:
+    """
+    Runs one label's heuristic over many documents at once.
+
+    The heuristic is compiled a single time, then every document advances
+    through each command together: command lookup and argument checks are
+    paid once per batch, and loop and if conditions are evaluated over the
+    documents still active at that point. Results match HeuristicMachine.run
+    document by document, with time budgets charged per document.
+    """
+    def __init__(self, heuristic: dict[str, list[dict[str, Any]]], config: ExecutionConfig | None = None):
+        self.config = config or get_execution_config()
+        self.fields: dict[str, list[Op]] = {}
+        if isinstance(heuristic, dict):
+            self.fields = {field: compile_commands(commands) for field, commands in heuristic.items()}
+        self.stalled_loops = 0
+        # Per document of the last run, the fields cut short by a time budget
+        self.timed_out: list[list[str]] = []
+
+    def fork(self) -> "BatchExecutor":
+        """
+        An executor sharing this one's compiled plan. run() keeps its state
+        on the executor, so concurrent runs each need their own.
+        """
+        executor = copy.copy(self)
+        executor.stalled_loops = 0
+        executor.timed_out = []
+        return executor
+
+    def run(self, wordspaces: list[WordSpace]) -> list[dict[str, Any]]:
+        self._wordspaces = wordspaces
+        self._budgeted = self.config.document_timeout is not None or self.config.field_timeout is not None
+        self._document_spent = [0.0] * len(wordspaces)
+        self._field_spent = [0.0] * len(wordspaces)
+        self._document_stopped: set[int] = set()
+        self._stopped: set[int] = set()
+        self._failed: set[int] = set()
+
+        results: list[dict[str, Any]] = [{} for _ in wordspaces]
+        timed_out: list[list[str]] = [[] for _ in wordspaces]
+        self.timed_out = timed_out
+        for field, ops in self.fields.items():
+            for ws in wordspaces:
+                ws.reset_cursor()
+                ws.clear_text_buffer()
+            self._field_spent = [0.0] * len(wordspaces)
+            self._stopped = set(self._document_stopped) if ops else set()
+            self._failed = set()
+
+            self._execute(ops, [i for i in range(len(wordspaces)) if i not in self._stopped])
+
+            for i, ws in enumerate(wordspaces):
+                text = ws._dump_text()
+                if i in self._failed:
+                    results[i][field] = None
+                elif i in self._stopped:
+                    results[i][field] = None
+                    timed_out[i].append(field)
+                else:
+                    results[i][field] = text.strip() if text else None
+
+        self._wordspaces = []
+        return results
+
+    def _charge(self, i: int, elapsed: float):
+        self._field_spent[i] += elapsed
+        self._document_spent[i] += elapsed
+        document_timeout = self.config.document_timeout
+        field_timeout = self.config.field_timeout
+        if document_timeout is not None and self._document_spent[i] > document_timeout:
+            self._document_stopped.add(i)
+            self._stopped.add(i)
+        elif field_timeout is not None and self._field_spent[i] > field_timeout:
+            self._stopped.add(i)
+
+    def _check(self, i: int, condition: Condition) -> bool:
+        func, args, expected = condition
+        try:
+            return func(self._wordspaces[i], **args) == expected
+        except Exception:
+            return False
+
+    def _execute(self, ops: list[Op], docs: list[int]):
+        wordspaces = self._wordspaces
+        for op in ops:
+            if self._stopped:
+                docs = [i for i in docs if i not in self._stopped]
+            if not docs:
+                return
+            kind = op[0]
+
+            if kind == "command":
+                _, func, args = op
+                if not self._budgeted:
+                    for i in docs:
+                        try:
+                            func(wordspaces[i], **args)
+                        except Exception:
+                            pass
+                    continue
+                for i in docs:
+                    start = time.perf_counter()
+                    try:
+                        func(wordspaces[i], **args)
+                    except Exception:
+                        pass
+                    self._charge(i, time.perf_counter() - start)
+
+            elif kind == "loop":
+                _, condition, body = op
+                max_iterations = self.config.max_loop_iterations
+                counts = dict.fromkeys(docs, 0)
+                active = [i for i in docs if max_iterations > 0 and self._check(i, condition)]
+                while active:
+                    states = {i: (wordspaces[i].cursor, wordspaces[i].text) for i in active}
+                    self._execute(body, active)
+                    still_active = []
+                    for i in active:
+                        counts[i] += 1
+                        if i in self._stopped:
+                            continue
+                        if (wordspaces[i].cursor, wordspaces[i].text) == states[i]:
+                            self.stalled_loops += 1
+                            continue
+                        if self._check(i, condition) and counts[i] < max_iterations:
+                            still_active.append(i)
+                    active = still_active
+
+            elif kind == "if":
+                _, condition, then_branch, else_branch = op
+                then_docs = []
+                else_docs = []
+                for i in docs:
+                    (then_docs if self._check(i, condition) else else_docs).append(i)
+                if then_docs:
+                    self._execute(then_branch, then_docs)
+                if else_docs and else_branch:
+                    self._execute(else_branch, else_docs)
+
+            elif kind == "fail":
+                self._failed.update(docs)
+                self._stopped.update(docs)
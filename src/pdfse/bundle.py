@@ -0,0 +1,149 @@
+import asyncio
+import rich
+from dataclasses import dataclass, field
+from .llm import fetch_heuristic, fetch_bundled_heuristics, get_bundle_system_prompt
+from .scheduler import LLMScheduler
+from .utils import estimate_tokens
+
+
+@dataclass
+class BundleItem:
+    label: str
+    schema: dict[str, str]
+    samples_data: list[bytes] | list[str]
+    tokens: int
+    future: asyncio.Future = field(repr=False)
+
+
+def pack_bundles(items: list[BundleItem], token_budget: int, max_labels: int) -> list[list[BundleItem]]:
+    """
+    First-fit packing of items into bundles under a token budget.
+    An item larger than the budget gets a bundle of its own.
+    """
+    bundles: list[list[BundleItem]] = []
+    bundle_tokens: list[int] = []
+    for item in items:
+        for i, bundle in enumerate(bundles):
+            if len(bundle) < max_labels and bundle_tokens[i] + item.tokens <= token_budget:
+                bundle.append(item)
+                bundle_tokens[i] += item.tokens
+                break
+        else:
+            bundles.append([item])
+            bundle_tokens.append(item.tokens)
+    return bundles
+
+
+class HeuristicBundler:
+    """
+    Packs the requests of several small labels into shared LLM requests.
+
+    Each expected label either registers its samples with `fetch()` or
+    withdraws with `skip()`. Bundles are sent once every expected label
+    has done so, or `linger` seconds after the first registration, so a
+    label stuck behind another process never holds the rest back.
+    """
+    def __init__(
+        self,
+        scheduler: LLMScheduler,
+        labels: list[str],
+        image_mode: bool,
+        token_budget: int,
+        max_labels: int = 8,
+        linger: float = 0.5,
+        cropped: bool = False
+    ):
+        self.scheduler = scheduler
+        self.image_mode = image_mode
+        self.cropped = cropped
+        self.token_budget = token_budget
+        self.max_labels = max_labels
+        self.linger = linger
+        self._expected: set[str] = set(labels)
+        self._pending: list[BundleItem] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._sending: set[asyncio.Task] = set()
+
+    async def fetch(self, label: str, schema: dict[str, str], samples_data: list[bytes] | list[str], sample_tokens: int) -> dict:
+        future = asyncio.get_running_loop().create_future()
+        tokens = sample_tokens + estimate_tokens(str(schema)) + estimate_tokens(label)
+        self._pending.append(BundleItem(label, schema, samples_data, tokens, future))
+        self._expected.discard(label)
+        self._maybe_flush()
+        return await future
+
+    def skip(self, label: str):
+        if label in self._expected:
+            self._expected.discard(label)
+            self._maybe_flush()
+
+    def _maybe_flush(self):
+        if not self._pending:
+            return
+        if not self._expected:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.linger, self._flush)
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        items, self._pending = self._pending, []
+        for bundle in pack_bundles(items, self.token_budget, self.max_labels):
+            task = asyncio.create_task(self._send(bundle))
+            self._sending.add(task)
+            task.add_done_callback(self._sending.discard)
+
+    async def _send_single(self, item: BundleItem, found: dict | None = None):
+        """
+        Fetch the fields of `item` missing from `found` (all of them by
+        default) on their own, and resolve it with both.
+        """
+        found = found or {}
+        schema = {name: desc for name, desc in item.schema.items() if name not in found}
+        try:
+            result = await self.scheduler.submit(
+                item.label,
+                lambda: fetch_heuristic(schema, item.samples_data, self.image_mode, cropped=self.cropped),
+                item.tokens
+            )
+            item.future.set_result({**found, **result})
+        except Exception as e:
+            item.future.set_exception(e)
+
+    async def _send(self, bundle: list[BundleItem]):
+        if len(bundle) == 1:
+            await self._send_single(bundle[0])
+            return
+
+        labels = ", ".join(item.label for item in bundle)
+        rich.print(f"→ Bundling {len(bundle)} labels into one request: {labels}")
+        tokens = estimate_tokens(get_bundle_system_prompt(self.image_mode, self.cropped)) + sum(item.tokens for item in bundle)
+        try:
+            response = await self.scheduler.submit(
+                labels,
+                lambda: fetch_bundled_heuristics(
+                    [(item.label, item.schema, item.samples_data) for item in bundle],
+                    self.image_mode,
+                    self.cropped
+                ),
+                tokens
+            )
+        except Exception as e:
+            rich.print(f"[yellow]! Bundled request failed ({str(e) or type(e).__name__}), retrying labels one by one")
+            response = {}
+
+        # Only requested fields are kept; those the bundled answer did not
+        # cover are fetched on their own
+        fallbacks = []
+        for item in bundle:
+            heuristic = response.get(item.label)
+            found = {
+                name: commands for name, commands in heuristic.items() if name in item.schema
+            } if isinstance(heuristic, dict) else {}
+            if len(found) == len(item.schema):
+                item.future.set_result(found)
+            else:
+                fallbacks.append(self._send_single(item, found))
+        await asyncio.gather(*fallbacks)
@@ -0,0 +1,131 @@
+import threading
+import time
+from collections.abc import Mapping
+from typing import Callable, Iterable, Iterator
+from .models import Heuristics
+from .store import HeuristicsStore
+
+
+class HeuristicsCache(Mapping[str, dict[str, list[dict]]]):
+    """
+    In-memory view of a HeuristicsStore for long-running processes.
+
+    Labels are loaded lazily on first access. Reads check the store for
+    external writes at most every `check_interval` seconds: a stat of the
+    store files first, then the store generation, and only the labels
+    written since the last check are reloaded. Listeners registered with
+    `on_invalidate` are told which labels changed, so anything compiled
+    from their heuristics can be dropped.
+    """
+    def __init__(self, store: HeuristicsStore, check_interval: float = 1.0):
+        self.store = store
+        self.check_interval = check_interval
+        self._heuristics: Heuristics = {}
+        self._tracked: set[str] = set()
+        self._generation = 0
+        self._stamp: tuple = ()
+        self._last_check = 0.0
+        self._listeners: list[Callable[[set[str]], None]] = []
+        self._lock = threading.RLock()
+
+    def on_invalidate(self, callback: Callable[[set[str]], None]):
+        self._listeners.append(callback)
+
+    def _notify(self, labels: set[str]):
+        if not labels:
+            return
+        for callback in self._listeners:
+            callback(labels)
+
+    def track(self, labels: Iterable[str]) -> None:
+        """
+        Make sure the given labels are loaded (missing labels are cached as empty).
+        """
+        with self._lock:
+            if not self._tracked:
+                self._generation = self.store.generation()
+                self._stamp = self.store.stamp()
+                self._last_check = time.monotonic()
+            new_labels = set(labels) - self._tracked
+            if not new_labels:
+                return
+            loaded = self.store.load(new_labels)
+            for label in new_labels:
+                self._heuristics[label] = loaded.get(label, {})
+            self._tracked |= new_labels
+
+    def refresh(self, force: bool = False) -> set[str]:
+        """
+        Reload the tracked labels changed by other writers. Returns them.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._last_check < self.check_interval:
+                return set()
+            self._last_check = now
+            if not self._tracked:
+                return set()
+
+            stamp = self.store.stamp()
+            if not force and stamp == self._stamp:
+                return set()
+
+            generation = self.store.generation()
+            if generation == self._generation:
+                self._stamp = stamp
+                return set()
+
+            changed = self.store.changed_labels(self._generation)
+            candidates = self._tracked if changed is None else self._tracked & changed
+            loaded = self.store.load(candidates)
+            reloaded = set()
+            for label in candidates:
+                fields = loaded.get(label, {})
+                if self._heuristics.get(label) != fields:
+                    self._heuristics[label] = fields
+                    reloaded.add(label)
+
+            self._generation = generation
+            self._stamp = stamp
+
+        self._notify(reloaded)
+        return reloaded
+
+    def update(self, heuristics: Heuristics) -> None:
+        """
+        Upsert new heuristics into the store and into this view.
+        """
+        with self._lock:
+            self.track(heuristics)
+            replaced, generation = self.store.upsert(heuristics)
+            for label, fields in heuristics.items():
+                self._heuristics.setdefault(label, {}).update(fields)
+            if replaced == self._generation:
+                # Only our own write is new: the next refresh must not reload
+                # it. The stamp is reset rather than read, as a write made
+                # after ours would be in it.
+                self._generation = generation
+                self._stamp = ()
+            else:
+                # Another writer got in first: the next read catches up
+                self._last_check = 0.0
+        self._notify(set(heuristics))
+
+    def snapshot(self) -> Heuristics:
+        with self._lock:
+            return {label: dict(fields) for label, fields in self._heuristics.items()}
+
+    def __getitem__(self, label: str) -> dict[str, list[dict]]:
+        self.refresh()
+        if label not in self._tracked:
+            self.track([label])
+        fields = self._heuristics.get(label, {})
+        if not fields:
+            raise KeyError(label)
+        return fields
+
+    def __iter__(self) -> Iterator[str]:
+        return iter([label for label, fields in self._heuristics.items() if fields])
+
+    def __len__(self) -> int:
+        return sum(1 for fields in self._heuristics.values() if fields)
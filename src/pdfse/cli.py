@@ -1,13 +1,32 @@
 import typer
 import asyncio
+import json
 import rich
 from pathlib import Path
 from typing_extensions import Annotated
 from pdfse.core import run_extraction
-from pdfse.extract import clear_heuristics_cache
+from pdfse.extract import clear_heuristics_cache, clear_result_cache, configure_store
+from pdfse.results import configure_result_cache, results_path_for
+from pdfse.store import LEGACY_CACHE_FILE, migrate_json_cache
+from pdfse.scheduler import SchedulerConfig, configure_scheduler
+from pdfse.layout import ImageCrop, configure_layout_encoder
+from pdfse.llm import configure_client
+from pdfse.tracing import configure_tracer
+from pdfse.metrics import configure_metrics
+from pdfse.machine import ExecutionConfig, configure_execution
+from pdfse.pipeline import PipelineConfig, configure_pipeline
+from pdfse.distributed import WorkDir, run_coordinator, run_worker
+from pdfse.golden import compare_latency, run_golden, save_golden
+from pdfse.memory import configure_memory_budget, configure_memory_monitor
 
 app = typer.Typer()
 
+CacheOption = Annotated[Path | None, typer.Option(
+    "--cache",
+    "-c",
+    help="Path to the heuristics store (SQLite, or legacy .json). Defaults to $PDFSE_HEURISTICS or ~/.cache/pdfse/heuristics.db",
+)]
+
 @app.command()
 def extract(
     dataset: Annotated[Path, typer.Option(
@@ -33,6 +52,141 @@ def extract(
         "--image-mode",
         help="Use image-based (PNG) samples for the LLM instead of text.",
         is_flag=True,
+    )] = False,
+    image_crop: Annotated[ImageCrop, typer.Option(
+        "--image-crop",
+        help="Part of the page shown by image samples: the full page, the text's bounding box with empty bands collapsed, or only the rows near schema words.",
+        case_sensitive=False,
+    )] = ImageCrop.FULL,
+    cache: CacheOption = None,
+    max_in_flight: Annotated[int, typer.Option(
+        "--max-in-flight",
+        help="Maximum number of concurrent LLM requests.",
+        min=1,
+    )] = 4,
+    rpm: Annotated[int | None, typer.Option(
+        "--rpm",
+        help="LLM requests-per-minute budget.",
+        min=1,
+    )] = None,
+    tpm: Annotated[int | None, typer.Option(
+        "--tpm",
+        help="LLM (estimated) tokens-per-minute budget.",
+        min=1,
+    )] = None,
+    label_timeout: Annotated[float, typer.Option(
+        "--label-timeout",
+        help="Seconds allowed to generate one label's heuristic, shared by all of its requests and their retries.",
+        min=1,
+    )] = 900.0,
+    sample_tokens: Annotated[int, typer.Option(
+        "--sample-tokens",
+        help="Token budget of each text sample sent to the LLM. Lines far from schema-related text are dropped first. 0 disables the limit.",
+        min=0,
+    )] = 3000,
+    fields_per_request: Annotated[int, typer.Option(
+        "--fields-per-request",
+        help="Schemas with more fields are split across concurrent LLM requests.",
+        min=1,
+    )] = 15,
+    bundle: Annotated[bool, typer.Option(
+        "--bundle",
+        help="Pack labels with few missing fields into shared LLM requests.",
+        is_flag=True,
+    )] = False,
+    bundle_tokens: Annotated[int, typer.Option(
+        "--bundle-tokens",
+        help="Estimated token budget of one bundled LLM request.",
+        min=1,
+    )] = 12000,
+    variants: Annotated[bool, typer.Option(
+        "--variants",
+        help="Also generate a short straight-line plan per sample layout, dispatched by layout at execution time.",
+        is_flag=True,
+    )] = False,
+    llm_base_url: Annotated[str | None, typer.Option(
+        "--llm-base-url",
+        help="Base URL of an OpenAI-compatible API (e.g. a local 'pdfse fake-llm' server).",
+    )] = None,
+    trace: Annotated[Path | None, typer.Option(
+        "--trace",
+        help="Save per-label, per-field and per-command execution timings as JSON.",
+        writable=True,
+    )] = None,
+    chrome_trace: Annotated[Path | None, typer.Option(
+        "--chrome-trace",
+        help="Save every field and command execution in Chrome trace format.",
+        writable=True,
+    )] = None,
+    max_loop_iterations: Annotated[int, typer.Option(
+        "--max-loop-iterations",
+        help="Iteration cap of heuristic loops (loops that stop making progress exit earlier).",
+        min=1,
+    )] = 100,
+    document_timeout: Annotated[float | None, typer.Option(
+        "--document-timeout",
+        help="Seconds one document may spend executing heuristics; later fields are reported as timed out.",
+        min=0,
+    )] = None,
+    field_timeout: Annotated[float | None, typer.Option(
+        "--field-timeout",
+        help="Seconds one field may spend executing its heuristic.",
+        min=0,
+    )] = None,
+    readers: Annotated[int, typer.Option(
+        "--readers",
+        help="Concurrent PDF reads.",
+        min=1,
+    )] = 4,
+    parsers: Annotated[int, typer.Option(
+        "--parsers",
+        help="Concurrent PDF parses into word spaces.",
+        min=1,
+    )] = 2,
+    executors: Annotated[int, typer.Option(
+        "--executors",
+        help="Concurrent heuristic executions.",
+        min=1,
+    )] = 2,
+    queue_size: Annotated[int, typer.Option(
+        "--queue-size",
+        help="Documents waiting between two pipeline stages (bounds memory use).",
+        min=1,
+    )] = 16,
+    prefetch_mb: Annotated[int, typer.Option(
+        "--prefetch-mb",
+        help="Megabytes of PDFs read ahead of parsing.",
+        min=1,
+    )] = 256,
+    batch_size: Annotated[int, typer.Option(
+        "--batch-size",
+        help="Execute up to this many queued documents of the same label together.",
+        min=1,
+    )] = 1,
+    no_result_cache: Annotated[bool, typer.Option(
+        "--no-result-cache",
+        help="Execute every field, without reading or updating the extraction result cache.",
+        is_flag=True,
+    )] = False,
+    metrics: Annotated[Path | None, typer.Option(
+        "--metrics",
+        help="Save run metrics (throughput, phase latencies, cache hit rates, LLM usage, failures) as JSON.",
+        writable=True,
+    )] = None,
+    prometheus: Annotated[Path | None, typer.Option(
+        "--prometheus",
+        help="Save run metrics in the Prometheus text format (e.g. for the node_exporter textfile collector).",
+        writable=True,
+    )] = None,
+    memory_budget_mb: Annotated[int, typer.Option(
+        "--memory-budget-mb",
+        help="Megabytes that concurrent page renders and PDF parses may hold at once (estimated).",
+        min=1,
+    )] = 1024,
+    trace_allocations: Annotated[bool, typer.Option(
+        "--trace-allocations",
+        help="Also account Python allocations (tracemalloc) per phase in the memory report. Slows the run down.",
+        is_flag=True,
     )] = False
 ):
     """
@@ -41,7 +195,265 @@ def extract(
     It uses cached heuristics if available, or generates new ones
     via LLM if they are missing for a specific document label.
     """
+    store = configure_store(cache)
+    configure_result_cache(None if no_result_cache else results_path_for(store.path))
+    configure_scheduler(SchedulerConfig(
+        max_in_flight=max_in_flight,
+        requests_per_minute=rpm,
+        tokens_per_minute=tpm,
+        label_timeout=label_timeout,
+        fields_per_request=fields_per_request,
+        bundle_small_labels=bundle,
+        bundle_token_budget=bundle_tokens,
+        layout_variants=variants,
+    ))
+    configure_layout_encoder(token_budget=sample_tokens or None, image_crop=image_crop)
+    if llm_base_url:
+        configure_client(base_url=llm_base_url)
+    configure_execution(ExecutionConfig(
+        max_loop_iterations=max_loop_iterations,
+        document_timeout=document_timeout,
+        field_timeout=field_timeout,
+    ))
+    configure_pipeline(PipelineConfig(
+        readers=readers,
+        parsers=parsers,
+        executors=executors,
+        queue_size=queue_size,
+        prefetch_bytes=prefetch_mb * 1024 * 1024,
+        batch_size=batch_size,
+    ))
+    tracer = configure_tracer(enabled=bool(trace or chrome_trace), record_events=bool(chrome_trace))
+    run_metrics = configure_metrics(enabled=bool(metrics or prometheus))
+    configure_memory_budget(memory_budget_mb * 1024 * 1024)
+    monitor = configure_memory_monitor(
+        enabled=bool(run_metrics or trace_allocations),
+        trace_python=trace_allocations,
+    )
     asyncio.run(run_extraction(dataset, output, samples, image_mode))
+    if monitor:
+        configure_memory_monitor(enabled=False)
+        memory = monitor.as_dict()
+        phases = ", ".join(
+            f"{phase} {peaks['peak_rss_bytes'] / 1024 ** 2:.0f} MB" for phase, peaks in memory["phases"].items()
+        )
+        rich.print(f"‧ Peak RSS {memory['peak_rss_bytes'] / 1024 ** 2:.0f} MB ({phases or 'no phases ran'})")
+    if run_metrics:
+        run_metrics.export(metrics, prometheus)
+        rich.print(f"[green]✓ Run metrics saved to {', '.join(str(p) for p in (metrics, prometheus) if p)}")
+    if tracer:
+        tracer.export(trace, chrome_trace)
+        rich.print(f"[green]✓ Execution trace saved to {', '.join(str(p) for p in (trace, chrome_trace) if p)}")
+
+
+WorkDirOption = Annotated[Path, typer.Option(
+    "--workdir",
+    "-w",
+    help="Work directory shared by the coordinator and its workers (an NFS mount for workers on other hosts).",
+)]
+
+LLMBaseURLOption = Annotated[str | None, typer.Option(
+    "--llm-base-url",
+    help="Base URL of an OpenAI-compatible API (e.g. a local 'pdfse fake-llm' server).",
+)]
+
+PollIntervalOption = Annotated[float, typer.Option(
+    "--poll-interval",
+    help="Seconds between checks of the work directory.",
+    min=0.01,
+)]
+
+
+@app.command()
+def coordinate(
+    dataset: Annotated[Path, typer.Option(
+        "--dataset",
+        "-d",
+        help="Path to the dataset JSON file",
+        exists=True,
+        readable=True,
+    )],
+    output: Annotated[Path, typer.Option(
+        "--output",
+        "-o",
+        help="Path to save the results as JSON",
+        writable=True
+    )],
+    workdir: WorkDirOption,
+    samples: Annotated[int, typer.Option(
+        "--samples",
+        "-s",
+        help="Number of sample PDFs to send to the LLM for heuristic generation",
+        min=1,
+    )] = 3,
+    image_mode: Annotated[bool, typer.Option(
+        "--image-mode",
+        help="Use image-based (PNG) samples for the LLM instead of text.",
+        is_flag=True,
+    )] = False,
+    chunk_size: Annotated[int, typer.Option(
+        "--chunk-size",
+        help="Entries per chunk of work handed to a worker.",
+        min=1,
+    )] = 50,
+    local_workers: Annotated[int, typer.Option(
+        "--local-workers",
+        help="Worker processes started (and restarted if they die) on this host.",
+        min=0,
+    )] = 2,
+    max_attempts: Annotated[int, typer.Option(
+        "--max-attempts",
+        help="Times a chunk is claimed (its workers crashing) before its entries are reported as failed.",
+        min=1,
+    )] = 3,
+    cache: CacheOption = None,
+    llm_base_url: LLMBaseURLOption = None,
+    poll_interval: PollIntervalOption = 1.0
+):
+    """
+    Splits a dataset into chunks for 'pdfse worker' processes and merges their results.
+
+    Workers on other hosts join with 'pdfse worker --workdir' on the same
+    shared directory. PDF paths must resolve to the same files on every host.
+    """
+    worker_args = ["--poll-interval", str(poll_interval)]
+    if cache:
+        worker_args += ["--cache", str(cache)]
+    if llm_base_url:
+        worker_args += ["--llm-base-url", llm_base_url]
+    run_coordinator(
+        dataset,
+        output,
+        WorkDir(workdir),
+        samples,
+        image_mode,
+        chunk_size=chunk_size,
+        local_workers=local_workers,
+        worker_args=worker_args,
+        max_attempts=max_attempts,
+        poll_interval=poll_interval,
+    )
+
+
+@app.command()
+def worker(
+    workdir: WorkDirOption,
+    cache: CacheOption = None,
+    llm_base_url: LLMBaseURLOption = None,
+    max_in_flight: Annotated[int, typer.Option(
+        "--max-in-flight",
+        help="Maximum number of concurrent LLM requests.",
+        min=1,
+    )] = 4,
+    batch_size: Annotated[int, typer.Option(
+        "--batch-size",
+        help="Execute up to this many queued documents of the same label together.",
+        min=1,
+    )] = 1,
+    no_result_cache: Annotated[bool, typer.Option(
+        "--no-result-cache",
+        help="Execute every field, without reading or updating the extraction result cache.",
+        is_flag=True,
+    )] = False,
+    poll_interval: PollIntervalOption = 1.0
+):
+    """
+    Executes chunks posted by 'pdfse coordinate' until the job is done.
+
+    Heuristics and extraction results are cached in this worker's own store.
+    """
+    store = configure_store(cache)
+    configure_result_cache(None if no_result_cache else results_path_for(store.path))
+    configure_scheduler(SchedulerConfig(max_in_flight=max_in_flight))
+    if llm_base_url:
+        configure_client(base_url=llm_base_url)
+    configure_pipeline(PipelineConfig(batch_size=batch_size))
+    executed = asyncio.run(run_worker(WorkDir(workdir), poll_interval))
+    rich.print(f"[green]✓ Worker done, executed {executed} chunk(s)")
+
+
+@app.command()
+def golden(
+    corpus: Annotated[Path, typer.Option(
+        "--corpus",
+        help="Golden corpus directory, holding dataset.json, heuristics.json and golden.json.",
+        exists=True,
+        file_okay=False,
+    )],
+    repeat: Annotated[int, typer.Option(
+        "--repeat",
+        "-r",
+        help="Passes over the corpus used to measure latency.",
+        min=1,
+    )] = 3,
+    update: Annotated[bool, typer.Option(
+        "--update",
+        help="Save the current outputs as the new golden results.",
+        is_flag=True,
+    )] = False,
+    report: Annotated[Path | None, typer.Option(
+        "--report",
+        help="Save the report (accuracy, mismatches, latency percentiles, peak memory) as JSON.",
+        writable=True,
+    )] = None,
+    baseline: Annotated[Path | None, typer.Option(
+        "--baseline",
+        help="Report of an earlier run to check latency against.",
+        exists=True,
+        readable=True,
+    )] = None,
+    max_slowdown: Annotated[float, typer.Option(
+        "--max-slowdown",
+        help="Tolerated growth of p50/p95 latency over the baseline (0.2 = 20%).",
+        min=0,
+    )] = 0.2
+):
+    """
+    Runs a golden corpus through the extraction and checks outputs and speed.
+
+    Exits with code 1 if any field differs from the golden results, if a
+    PDF could not be read, or if a phase got slower than the baseline
+    report allows.
+    """
+    golden_report, outputs = run_golden(corpus, repeat)
+    if update:
+        save_golden(corpus, outputs)
+        rich.print(f"[green]✓ Saved golden results of {len(outputs)} documents to {corpus}")
+        return
+
+    for label, accuracy in sorted(golden_report.labels.items()):
+        color = "green" if accuracy.matched == accuracy.fields else "red"
+        rich.print(
+            f"[{color}]{label}: {accuracy.accuracy:.1%} of fields "
+            f"({accuracy.exact_documents}/{accuracy.documents} documents exact)"
+        )
+    for path, name, expected, got in golden_report.mismatches[:20]:
+        rich.print(f"  → {path} {name}: expected {expected!r}, got {got!r}")
+    if len(golden_report.mismatches) > 20:
+        rich.print(f"  → ... and {len(golden_report.mismatches) - 20} more")
+    for path, error in golden_report.failed:
+        rich.print(f"[red]✗ Could not read {path}: {error}")
+    for phase in ("read", "parse", "execute"):
+        stats = golden_report.latency(phase)
+        rich.print(
+            f"‧ {phase}: p50 {stats['p50'] * 1000:.2f}ms, p95 {stats['p95'] * 1000:.2f}ms, "
+            f"p99 {stats['p99'] * 1000:.2f}ms"
+        )
+    rich.print(
+        f"‧ Peak memory: {golden_report.peak_traced_bytes / 1024 ** 2:.1f} MB traced, "
+        f"{golden_report.peak_rss_bytes / 1024 ** 2:.1f} MB RSS"
+    )
+
+    regressions = compare_latency(golden_report, json.loads(baseline.read_text()), max_slowdown) if baseline else []
+    for regression in regressions:
+        rich.print(f"[red]✗ Slower than baseline: {regression}")
+    if report:
+        with open(report, "w") as f:
+            json.dump({**golden_report.as_dict(), "latency_regressions": regressions}, f, indent=2, ensure_ascii=False)
+        rich.print(f"[green]✓ Report saved to {report}")
+    if not golden_report.passed or regressions:
+        raise typer.Exit(code=1)
+    rich.print("[green]✓ Outputs match the golden results")
 
 
 @app.command()
@@ -55,20 +467,98 @@ def clear(
         "--label",
         "-l",
         help="Clear only the specified label(s) from the cache. Can be used multiple times.",
-    )] = []
+    )] = [],
+    cache: CacheOption = None
 ):
     """
-    Clears the saved heuristics cache file.
+    Clears the saved heuristics cache and the extraction results cached with them.
 
     Use --all to clear everything, or --label to clear specific entries.
     """
+    configure_store(cache)
     if all_flag:
         clear_heuristics_cache(all_flag=True)
+        clear_result_cache(all_flag=True)
     elif labels:
         clear_heuristics_cache(labels_to_clear=labels)
+        clear_result_cache(labels_to_clear=labels)
     else:
         rich.print("[yellow]! No action specified. Use --all to clear everything or --label <name> to clear specific labels.")
 
 
+@app.command()
+def migrate(
+    source: Annotated[Path, typer.Option(
+        "--source",
+        help="Legacy heuristics.json file to import.",
+        exists=True,
+        readable=True,
+    )] = LEGACY_CACHE_FILE,
+    cache: CacheOption = None
+):
+    """
+    Imports a legacy heuristics.json file into the heuristics store.
+
+    Existing (label, field) entries are overwritten by the imported ones.
+    """
+    store = configure_store(cache)
+    migrated = migrate_json_cache(source, store)
+    rich.print(f"[green]✓ Migrated {migrated} label(s) from {source} to {store.path}")
+
+
+@app.command("fake-llm")
+def fake_llm(
+    host: Annotated[str, typer.Option("--host", help="Interface to listen on.")] = "127.0.0.1",
+    port: Annotated[int, typer.Option("--port", "-p", help="Port to listen on.")] = 8765,
+    latency: Annotated[float, typer.Option(
+        "--latency",
+        help="Median response latency in seconds.",
+        min=0,
+    )] = 1.0,
+    latency_sigma: Annotated[float, typer.Option(
+        "--latency-sigma",
+        help="Sigma of the log-normal latency distribution (0 for a fixed latency).",
+        min=0,
+    )] = 0.5,
+    error_rate: Annotated[float, typer.Option(
+        "--error-rate",
+        help="Fraction of requests answered with a 429 or 500 error.",
+        min=0,
+        max=1,
+    )] = 0.0,
+    canned: Annotated[Path | None, typer.Option(
+        "--canned",
+        help="JSON file returned verbatim for every request, instead of heuristics derived from the schema.",
+        exists=True,
+        readable=True,
+    )] = None
+):
+    """
+    Runs a local stand-in for the OpenAI chat completions API.
+
+    Use it with 'pdfse extract --llm-base-url http://HOST:PORT/v1' for
+    offline throughput and latency benchmarks.
+    """
+    # Only needed by this command
+    from pdfse.fakeserver import FakeOpenAIServer, FakeServerConfig
+
+    config = FakeServerConfig(
+        latency=latency,
+        latency_sigma=latency_sigma,
+        error_rate=error_rate,
+        canned_response=json.loads(canned.read_text()) if canned else None,
+    )
+    server = FakeOpenAIServer(host, port, config)
+    rich.print(f"[green]✓ Fake LLM listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        latency = server.stats.latency
+        rich.print(
+            f"‧ Served {server.stats.requests} requests ({server.stats.errors} errors), "
+            f"latency p50 {latency.quantile(0.5):.2f}s, p95 {latency.quantile(0.95):.2f}s, p99 {latency.quantile(0.99):.2f}s"
+        )
+
+
 if __name__ == "__main__":
     app()
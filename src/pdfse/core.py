@@ -1,46 +1,264 @@
 import asyncio
 import json
+import sqlite3
+import time
 import rich
+from dataclasses import dataclass, field
 import rich.progress as rp
 from pathlib import Path
 
 from .models import Entry, Heuristics, ExtractionSchema, LLMTask
 from .dataset import load_dataset
 from .extract import (
+    get_store,
     load_heuristics_cache,
     separate_good_bad_entries,
     prepare_llm_tasks,
     save_heuristic_cache
 )
-from .pdf import render_pdf_text, get_pdf_wordspace, get_pdf_text_layout
-from .llm import fetch_heuristic
-from .machine import HeuristicMachine
+from .lock import heuristic_lock
+from .bundle import HeuristicBundler
+from .variants import VARIANT_SEPARATOR, build_variant, select_variant
+from .pdf import render_pdf_regions, render_pdf_text, get_pdf_wordspace, get_pdf_text_layout, page_size, read_pdf
+from .llm import fetch_heuristic, get_system_prompt
+from .scheduler import (
+    MemoryBudget,
+    get_scheduler,
+    IMAGE_SAMPLE_BYTES,
+    IMAGE_SAMPLE_TOKENS
+)
+from .machine import ExecutionConfig, HeuristicMachine, get_execution_config
+from .optimizer import optimize_heuristic
+from .batch import BatchExecutor
+from .tracing import get_tracer
+from . import metrics
+from .results import ResultCache, content_hash, field_heuristic_hash, get_result_cache
+from .pipeline import Stage, get_pipeline_config, run_pipeline
+from .memory import get_memory_budget, get_memory_monitor, memory_phase, parse_bytes, parse_bytes_of, render_bytes
+from .wordspace import WordSpace
+from .layout import ImageCrop, get_layout_encoder, mentions, schema_terms
+from .utils import estimate_image_tokens, estimate_tokens
+
+
+def split_schema(schema: ExtractionSchema, fields_per_request: int) -> list[ExtractionSchema]:
+    """
+    Split a schema into balanced groups of at most `fields_per_request`
+    fields, preserving field order (neighbouring fields tend to share anchors).
+    """
+    items = list(schema.items())
+    if len(items) <= fields_per_request:
+        return [schema]
+    group_count = -(-len(items) // fields_per_request)
+    base_size, remainder = divmod(len(items), group_count)
+    groups = []
+    start = 0
+    for i in range(group_count):
+        size = base_size + (1 if i < remainder else 0)
+        groups.append(dict(items[start:start + size]))
+        start += size
+    return groups
+
+async def _fetch_field_groups(
+    label: str,
+    groups: list[ExtractionSchema],
+    samples_data: list[bytes] | list[str],
+    image_mode: bool,
+    prompt_tokens: int,
+    fetch_kwargs: dict
+) -> dict:
+    """
+    Fetch the partial plans of each field group concurrently, sharing the
+    samples, and merge them. A failed group only loses its own fields.
+    """
+    results = await asyncio.gather(*[
+        get_scheduler().submit(
+            label,
+            lambda group=group: fetch_heuristic(group, samples_data, image_mode, **fetch_kwargs),
+            prompt_tokens + estimate_tokens(str(group))
+        )
+        for group in groups
+    ], return_exceptions=True)
+
+    merged = {}
+    errors = []
+    for group, result in zip(groups, results):
+        if isinstance(result, BaseException):
+            errors.append(result)
+            rich.print(f"[red]✗ Error fetching fields {', '.join(group)} for label {label}: {str(result) or type(result).__name__}")
+            continue
+        merged.update({field: commands for field, commands in result.items() if field in group})
+
+    if not merged and errors:
+        raise errors[0]
+    return merged
+
+def _render_estimate(pdf_path: Path) -> int:
+    try:
+        return render_bytes(*page_size(pdf_path))
+    except Exception:
+        return IMAGE_SAMPLE_BYTES
+
+
+async def _render_sample(pdf_path: Path, schema: ExtractionSchema) -> bytes:
+    # Cropped renders are smaller; the full page bounds them
+    size = await asyncio.to_thread(_render_estimate, pdf_path)
+    crop = get_layout_encoder().image_crop
+    if crop == ImageCrop.FULL:
+        return await get_memory_budget().run("render", size, render_pdf_text, pdf_path)
+    terms = schema_terms(schema) if crop == ImageCrop.ANCHORS else set()
+    is_anchor = (lambda text: mentions(text, terms)) if terms else None
+    return await get_memory_budget().run("render", size, render_pdf_regions, pdf_path, is_anchor)
+
+
+async def _parse_sample(pdf_path: Path) -> WordSpace:
+    size = await asyncio.to_thread(parse_bytes_of, pdf_path)
+    return await get_memory_budget().run("parse", size, get_pdf_wordspace, pdf_path)
+
+
+async def _layout_sample(pdf_path: Path) -> str:
+    size = await asyncio.to_thread(parse_bytes_of, pdf_path)
+    return await get_memory_budget().run("layout", size, get_pdf_text_layout, pdf_path)
+
+
+def _images_cropped(image_mode: bool) -> bool:
+    return image_mode and get_layout_encoder().image_crop != ImageCrop.FULL
 
 
 async def _fetch_heuristic_for_task(
     label: str,
     schema_to_fetch: ExtractionSchema,
     pdf_paths: list[Path],
-    image_mode: bool
+    image_mode: bool,
+    bundler: HeuristicBundler | None = None,
+    straight_line: bool = False
 ) -> tuple[str, dict]:
+    scheduler = get_scheduler()
+    cropped = _images_cropped(image_mode)
+    fetch_kwargs = {"straight_line": True} if straight_line else {}
+    if cropped:
+        fetch_kwargs["cropped"] = True
     try:
         if image_mode:
             # Use image samples
-            render_tasks = [asyncio.to_thread(render_pdf_text, pdf_path) for pdf_path in pdf_paths]
+            # Renders wait for room in the global memory budget
+            render_tasks = [_render_sample(pdf_path, schema_to_fetch) for pdf_path in pdf_paths]
             samples_data = await asyncio.gather(*render_tasks) # list[bytes]
+            sample_tokens = sum(estimate_image_tokens(image) or IMAGE_SAMPLE_TOKENS for image in samples_data)
         else:
             # Use text samples
-            text_tasks = [asyncio.to_thread(get_pdf_text_layout, pdf_path) for pdf_path in pdf_paths]
-            samples_data = await asyncio.gather(*text_tasks) # list[str]
+            text_tasks = [_layout_sample(pdf_path) for pdf_path in pdf_paths]
+            layouts = await asyncio.gather(*text_tasks) # list[str]
+            samples_data, report = get_layout_encoder().encode(layouts, schema_to_fetch)
+            sample_tokens = report.total_encoded
+            rich.print(f"‧ Label '{label}': {report.summary()}")
 
-        new_heuristic_for_label = await fetch_heuristic(
-            schema_to_fetch, samples_data, image_mode
-        )
+        prompt_tokens = estimate_tokens(get_system_prompt(image_mode, cropped)) + sample_tokens
+        groups = split_schema(schema_to_fetch, scheduler.config.fields_per_request)
+        if bundler and len(groups) == 1:
+            new_heuristic_for_label = await bundler.fetch(
+                label, schema_to_fetch, samples_data, sample_tokens
+            )
+        elif len(groups) == 1:
+            new_heuristic_for_label = await scheduler.submit(
+                label,
+                lambda: fetch_heuristic(schema_to_fetch, samples_data, image_mode, **fetch_kwargs),
+                prompt_tokens + estimate_tokens(str(schema_to_fetch))
+            )
+        else:
+            rich.print(f"→ Label '{label}': splitting {len(schema_to_fetch)} fields across {len(groups)} requests")
+            new_heuristic_for_label = await _fetch_field_groups(
+                label, groups, samples_data, image_mode, prompt_tokens, fetch_kwargs
+            )
         return label, new_heuristic_for_label
     except Exception as e:
-        rich.print(f"[red]✗ Error fetching heuristic for label {label}: {e}")
+        rich.print(f"[red]✗ Error fetching heuristic for label {label}: {str(e) or type(e).__name__}")
+        metrics.inc("pdfse_failures_total", stage="heuristic")
         return label, {}
 
+async def _generate_variants(
+    label: str,
+    schema_to_fetch: ExtractionSchema,
+    pdf_paths: list[Path],
+    image_mode: bool
+) -> dict:
+    """
+    Ask for one straight-line plan per sample layout and key each one by
+    the positions of its anchors in that sample (see variants.py).
+    """
+    async def variant_for(pdf_path: Path) -> dict:
+        _, fields = await _fetch_heuristic_for_task(
+            label, schema_to_fetch, [pdf_path], image_mode, straight_line=True
+        )
+        if not fields:
+            return {}
+        wordspace = await _parse_sample(pdf_path)
+        return build_variant(fields, wordspace)
+
+    variants = {}
+    for variant in await asyncio.gather(*[variant_for(pdf_path) for pdf_path in pdf_paths]):
+        variants.update(variant)
+    if variants:
+        count = sum(1 for name in variants if name.startswith(VARIANT_SEPARATOR))
+        rich.print(f"[green]✓ Label '{label}': {count} layout variant(s) generated")
+    return variants
+
+async def _optimize_for_samples(label: str, heuristic: dict, pdf_paths: list[Path]) -> dict:
+    """
+    Shorten the plans of a new heuristic, keeping only rewrites that
+    extract the same values from every sample.
+    """
+    try:
+        wordspaces = await asyncio.gather(*[_parse_sample(pdf_path) for pdf_path in pdf_paths])
+        config = ExecutionConfig(max_loop_iterations=get_execution_config().max_loop_iterations)
+        optimized, before, after = await asyncio.to_thread(optimize_heuristic, heuristic, wordspaces, config)
+    except Exception as e:
+        rich.print(f"[yellow]! Label '{label}': could not optimize heuristic ({str(e) or type(e).__name__})")
+        return heuristic
+    if after < before:
+        rich.print(f"‧ Label '{label}': optimizer reduced the plan from {before} to {after} commands")
+    return optimized
+
+async def _single_flight_fetch(
+    label: str,
+    schema_to_fetch: ExtractionSchema,
+    pdf_paths: list[Path],
+    image_mode: bool,
+    bundler: HeuristicBundler | None = None
+) -> tuple[str, dict]:
+    """
+    Generate and save the heuristic of `label` while holding an inter-process
+    lock keyed by (label, fields), so concurrent runs needing the same
+    heuristic wait for one LLM call and reuse its result.
+    """
+    store = get_store()
+    lock = heuristic_lock(store.path, label, set(schema_to_fetch))
+    if not lock.try_acquire():
+        rich.print(f"‧ Label '{label}': waiting for another process generating the same heuristic...")
+        await lock.acquire_async()
+    try:
+        # Whatever was saved while we waited does not need to be generated again
+        cached = (await asyncio.to_thread(store.load, [label])).get(label, {})
+        reused = {field: cached[field] for field in schema_to_fetch if field in cached}
+        missing = {field: desc for field, desc in schema_to_fetch.items() if field not in cached}
+        if not missing:
+            rich.print(f"[green]✓ Label '{label}': reusing heuristic generated by another process")
+            return label, reused
+
+        scheduler = get_scheduler()
+        # One label_timeout covers all of the label's requests
+        with scheduler.label_deadline(label):
+            label, new_heuristic = await _fetch_heuristic_for_task(label, missing, pdf_paths, image_mode, bundler)
+            if new_heuristic and scheduler.config.layout_variants:
+                new_heuristic.update(await _generate_variants(label, missing, pdf_paths, image_mode))
+        if new_heuristic:
+            new_heuristic = await _optimize_for_samples(label, new_heuristic, pdf_paths)
+            await asyncio.to_thread(save_heuristic_cache, {label: new_heuristic})
+        return label, {**reused, **new_heuristic}
+    finally:
+        if bundler:
+            bundler.skip(label)
+        lock.release()
+
 async def fetch_and_save_missing_heuristics(
     bad_entries: list[Entry],
     heuristics: Heuristics,
@@ -48,16 +266,31 @@ async def fetch_and_save_missing_heuristics(
     image_mode: bool
 ) -> Heuristics:
 
-    llm_tasks: list[LLMTask] = prepare_llm_tasks(bad_entries, heuristics, samples)
+    llm_tasks: list[LLMTask] = await prepare_llm_tasks(bad_entries, heuristics, samples)
 
     if not llm_tasks:
         return heuristics
 
+    config = get_scheduler().config
+    bundler = None
+    if config.bundle_small_labels:
+        small_labels = [
+            task.label for task in llm_tasks
+            if len(task.schema_to_fetch) <= config.bundle_max_fields
+        ]
+        if len(small_labels) > 1:
+            bundler = HeuristicBundler(
+                get_scheduler(), small_labels, image_mode,
+                config.bundle_token_budget, config.bundle_max_labels,
+                cropped=_images_cropped(image_mode)
+            )
+
     tasks = []
     for task in llm_tasks:
+        task_bundler = bundler if bundler and len(task.schema_to_fetch) <= config.bundle_max_fields else None
         tasks.append(
-            _fetch_heuristic_for_task(
-                task.label, task.schema_to_fetch, task.pdf_paths, image_mode
+            _single_flight_fetch(
+                task.label, task.schema_to_fetch, task.pdf_paths, image_mode, task_bundler
             )
         )
 
@@ -69,82 +302,354 @@ async def fetch_and_save_missing_heuristics(
         progress.add_task(description=f"Fetching {len(tasks)} new heuristics from LLM...", total=None)
         results = await asyncio.gather(*tasks)
 
-    updated_heuristics = heuristics.copy()
+    # Each result was already saved by its task, under its lock
+    updated_heuristics = {label: dict(fields) for label, fields in heuristics.items()}
     has_new_data = False
     for label, new_heuristic in results:
         if new_heuristic:
-            if label not in updated_heuristics:
-                updated_heuristics[label] = {}
-            updated_heuristics[label].update(new_heuristic)
+            updated_heuristics.setdefault(label, {}).update(new_heuristic)
             has_new_data = True
 
     if has_new_data:
-        save_heuristic_cache(updated_heuristics)
         rich.print("[green]✓ Heuristic cache updated.")
 
     return updated_heuristics
 
-def process_entry(entry: Entry, heuristics: Heuristics) -> dict[str, str | None]:
-    try:
-        wordspace = get_pdf_wordspace(entry.pdf_path)
-        machine = HeuristicMachine(wordspace)
+def heuristic_for_entry(entry: Entry, heuristics: Heuristics, wordspace: WordSpace) -> dict[str, list]:
+    """
+    The plan to run on `wordspace`: the label's commands for the fields of
+    the entry's schema, with those of a matching layout variant first.
+    """
+    label_heuristic = heuristics.get(entry.label, {})
+    schema_fields = set(entry.extraction_schema.keys())
 
-        label_heuristic = heuristics.get(entry.label, {})
-        schema_fields = set(entry.extraction_schema.keys())
+    # Fields of a variant matching this layout take precedence
+    variant = select_variant(label_heuristic, wordspace)
+    return {
+        field: variant.get(field, commands)
+        for field, commands in label_heuristic.items()
+        if field in schema_fields
+    }
 
-        heuristic_for_entry = {
-            field: commands
-            for field, commands in label_heuristic.items()
-            if field in schema_fields
-        }
 
-        missing_fields = schema_fields - set(heuristic_for_entry.keys())
+@dataclass
+class EntryResult:
+    """
+    Values extracted from an entry, and the fields cut short by a time
+    budget (None in `values`). `failed` is set when the entry could not be
+    executed at all: its Nones are not results and must not be cached.
+    """
+    values: dict[str, str | None]
+    timed_out: list[str] = field(default_factory=list)
+    failed: bool = False
+
+
+def process_entry(entry: Entry, heuristics: Heuristics, wordspace: WordSpace | None = None) -> EntryResult:
+    try:
+        if wordspace is None:
+            wordspace = get_pdf_wordspace(entry.pdf_path)
+        machine = HeuristicMachine(wordspace)
+        tracer = get_tracer()
+        if tracer:
+            machine.trace(tracer, entry.label)
+
+        plan = heuristic_for_entry(entry, heuristics, wordspace)
+        missing_fields = set(entry.extraction_schema.keys()) - set(plan.keys())
 
-        extracted_data = machine.run(heuristic_for_entry)
+        extracted_data = machine.run(plan)
 
         for field in missing_fields:
             extracted_data[field] = None
 
-        return extracted_data
+        return EntryResult(extracted_data, machine.timed_out)
 
     except Exception as e:
         rich.print(f"[red]✗ Error processing {entry.pdf_path.name}: {e}")
-        return {field: None for field in entry.extraction_schema}
+        metrics.inc("pdfse_failures_total", stage="execute")
+        return EntryResult({field: None for field in entry.extraction_schema}, failed=True)
 
 
-async def run_extraction(dataset: Path, output: Path, samples: int, image_mode: bool) -> None:
-    entries = load_dataset(dataset)
-    heuristics = load_heuristics_cache()
+def process_batch(entries: list[Entry], heuristics: Heuristics, wordspaces: list[WordSpace]) -> list[EntryResult]:
+    """
+    Extract many entries at once: entries sharing a plan (same label and
+    layout variant) run together through one BatchExecutor.
+    """
+    results: list[EntryResult] = [EntryResult({}) for _ in entries]
+    groups: dict[tuple, list[int]] = {}
+    plans: dict[tuple, dict[str, list]] = {}
+    for i, (entry, wordspace) in enumerate(zip(entries, wordspaces)):
+        try:
+            plan = heuristic_for_entry(entry, heuristics, wordspace)
+        except Exception as e:
+            rich.print(f"[red]✗ Error processing {entry.pdf_path.name}: {e}")
+            metrics.inc("pdfse_failures_total", stage="execute")
+            results[i] = EntryResult({field: None for field in entry.extraction_schema}, failed=True)
+            continue
+        key = (entry.label, *((field, id(commands)) for field, commands in plan.items()))
+        groups.setdefault(key, []).append(i)
+        plans[key] = plan
+
+    for key, indexes in groups.items():
+        executor = BatchExecutor(plans[key])
+        try:
+            extractions = executor.run([wordspaces[i] for i in indexes])
+        except Exception as e:
+            metrics.inc("pdfse_failures_total", len(indexes), stage="execute")
+            for i in indexes:
+                rich.print(f"[red]✗ Error processing {entries[i].pdf_path.name}: {e}")
+                results[i] = EntryResult({field: None for field in entries[i].extraction_schema}, failed=True)
+            continue
+        for i, extracted_data, fields in zip(indexes, extractions, executor.timed_out):
+            for field in entries[i].extraction_schema:
+                extracted_data.setdefault(field, None)
+            results[i] = EntryResult(extracted_data, fields)
+    return results
+
+
+def _result_record(entry: Entry, dataset: Path, result: EntryResult) -> dict:
+    record = {
+        "label": entry.label,
+        "pdf_path": str(entry.pdf_path.relative_to(dataset.parent)),
+        "extraction": result.values
+    }
+    if result.timed_out:
+        record["timed_out"] = result.timed_out
+        metrics.inc("pdfse_timed_out_fields_total", len(result.timed_out))
+        rich.print(f"[yellow]! Entry #{entry.id} ran out of time on: {', '.join(result.timed_out)}")
+    return record
+
+
+@dataclass
+class _Job:
+    entry: Entry
+    cached: bool
+    data: bytes | None = None
+    reserved: int = 0
+    wordspace: WordSpace | None = None
+    extraction: EntryResult | None = None
+    # Result cache state: values served from it, and the entry narrowed to
+    # the fields still to execute
+    pdf_hash: str | None = None
+    field_hashes: dict[str, str] = field(default_factory=dict)
+    served: dict[str, str | None] = field(default_factory=dict)
+    pending: Entry | None = None
+
+    def fail(self, stage: str, error: Exception):
+        rich.print(f"[red]✗ Error {stage} {self.entry.pdf_path.name}: {error}")
+        metrics.inc("pdfse_failures_total", stage=stage)
+        self.extraction = EntryResult({field: None for field in self.entry.extraction_schema}, failed=True)
+
+    async def lookup(self, cache: ResultCache, heuristics: Heuristics) -> bool:
+        """
+        Serve the fields the result cache has. True when nothing is left to execute.
+        """
+        if self.pdf_hash is None:
+            return False
+        schema = self.entry.extraction_schema
+        label_heuristic = heuristics.get(self.entry.label, {})
+        max_loop_iterations = get_execution_config().max_loop_iterations
+        self.field_hashes = {
+            field: field_heuristic_hash(label_heuristic, field, max_loop_iterations)
+            for field in schema
+            if field in label_heuristic
+        }
+        try:
+            self.served = await asyncio.to_thread(cache.get, self.pdf_hash, self.entry.label, self.field_hashes)
+        except sqlite3.Error as e:
+            rich.print(f"[yellow]! Could not read result cache: {e}")
+            self.served = {}
+
+        missing = {field: description for field, description in schema.items() if field not in self.served}
+        metrics.inc("pdfse_result_cache_fields_total", len(self.served), result="hit")
+        metrics.inc("pdfse_result_cache_fields_total", len(missing), result="miss")
+        if not missing:
+            self.extraction = EntryResult(dict(self.served))
+            return True
+        if self.served:
+            self.pending = self.entry.model_copy(update={"extraction_schema": missing})
+        return False
+
+    async def finish(self, extracted: EntryResult, cache: ResultCache | None):
+        # Only values the heuristics actually produced are cached
+        if cache is not None and self.pdf_hash is not None and self.field_hashes and not extracted.failed:
+            fresh = {
+                field: value
+                for field, value in extracted.values.items()
+                if field in self.field_hashes and field not in extracted.timed_out
+            }
+            try:
+                await asyncio.to_thread(cache.put, self.pdf_hash, self.entry.label, self.field_hashes, fresh)
+            except sqlite3.Error as e:
+                rich.print(f"[yellow]! Could not write result cache: {e}")
+
+        if not self.served:
+            self.extraction = extracted
+            return
+        self.extraction = EntryResult({
+            field: self.served[field] if field in self.served else extracted.values.get(field)
+            for field in self.entry.extraction_schema
+        }, extracted.timed_out, extracted.failed)
+
+
+async def extract_entries(entries: list[Entry], dataset: Path, samples: int, image_mode: bool) -> list[dict]:
+    """
+    Extract `entries` of the dataset at `dataset`, generating the missing
+    heuristics. Returns one result record per entry, in order.
+    """
+    heuristics = load_heuristics_cache({entry.label for entry in entries})
 
     good_entries, bad_entries = separate_good_bad_entries(entries, heuristics)
+    metrics.inc("pdfse_documents_total", len(entries))
+    metrics.inc("pdfse_heuristic_cache_entries_total", len(good_entries), result="hit")
+    metrics.inc("pdfse_heuristic_cache_entries_total", len(bad_entries), result="miss")
 
     results: list[dict | None] = [None] * len(entries)
+    positions = {entry.id: i for i, entry in enumerate(entries)}
 
     llm_task = asyncio.create_task(
         fetch_and_save_missing_heuristics(bad_entries, heuristics, samples, image_mode)
     )
 
-    for entry in good_entries:
-        extracted_data = await asyncio.to_thread(process_entry, entry, heuristics)
-        results[entry.id - 1] = {
-            "label": entry.label,
-            "pdf_path": str(entry.pdf_path.relative_to(dataset.parent)),
-            "extraction": extracted_data
-        }
-        rich.print(f"[green]✓ Entry #{entry.id} executed (cache)")
+    config = get_pipeline_config()
+    # Readers run ahead of the parsers by at most `prefetch_bytes`, plus the
+    # file each reader has in hand (sizing files first would cost a stat per
+    # file, a round trip on network filesystems)
+    prefetch = MemoryBudget(config.prefetch_bytes)
+    io_bytes = 0
+    io_seconds = 0.0
+    result_cache = get_result_cache()
 
-    updated_heuristics = await llm_task
+    async def read(job: _Job) -> _Job:
+        nonlocal io_bytes, io_seconds
+        try:
+            start = time.perf_counter()
+            with memory_phase("read"):
+                data = await asyncio.to_thread(read_pdf, job.entry.pdf_path)
+            elapsed = time.perf_counter() - start
+            io_seconds += elapsed
+            metrics.observe("pdfse_phase_seconds", elapsed, phase="read")
+            io_bytes += len(data)
+            if result_cache is not None:
+                job.pdf_hash = await asyncio.to_thread(content_hash, data)
+                # Fully served entries skip parsing and execution
+                if job.cached and await job.lookup(result_cache, heuristics):
+                    return job
+            await prefetch.acquire(len(data))
+            job.data = data
+            job.reserved = len(data)
+        except Exception as e:
+            job.fail("reading", e)
+        return job
 
-    for entry in bad_entries:
-        extracted_data = await asyncio.to_thread(process_entry, entry, updated_heuristics)
-        results[entry.id - 1] = {
-            "label": entry.label,
-            "pdf_path": str(entry.pdf_path.relative_to(dataset.parent)),
-            "extraction": extracted_data
-        }
-        rich.print(f"[green]✓ Entry #{entry.id} executed")
+    async def parse(job: _Job) -> _Job:
+        try:
+            if job.data is not None:
+                start = time.perf_counter()
+                job.wordspace = await get_memory_budget().run(
+                    "parse", parse_bytes(len(job.data)), get_pdf_wordspace, job.data
+                )
+                metrics.observe("pdfse_phase_seconds", time.perf_counter() - start, phase="parse")
+        except Exception as e:
+            job.fail("parsing", e)
+        finally:
+            job.data = None
+            await prefetch.release(job.reserved)
+            job.reserved = 0
+        return job
+
+    async def execute(job: _Job) -> _Job:
+        if job.wordspace is not None:
+            # Entries without cached heuristics wait for the LLM here, while
+            # the stages before keep at most a few queues of work ready
+            entry_heuristics = heuristics if job.cached else await llm_task
+            if result_cache is not None and not job.cached and await job.lookup(result_cache, entry_heuristics):
+                job.wordspace = None
+                return job
+            start = time.perf_counter()
+            with memory_phase("execute"):
+                extracted = await asyncio.to_thread(process_entry, job.pending or job.entry, entry_heuristics, job.wordspace)
+            metrics.observe("pdfse_phase_seconds", time.perf_counter() - start, phase="execute")
+            await job.finish(extracted, result_cache)
+            job.wordspace = None
+        return job
+
+    async def execute_batch(batch: list[_Job]) -> list[_Job]:
+        if get_tracer():
+            # Tracing reports per document, which only the machine does
+            return [await execute(job) for job in batch]
+        for cached in (True, False):
+            jobs = [job for job in batch if job.cached == cached and job.wordspace is not None]
+            if not jobs:
+                continue
+            entry_heuristics = heuristics if cached else await llm_task
+            if result_cache is not None and not cached:
+                for job in jobs:
+                    if await job.lookup(result_cache, entry_heuristics):
+                        job.wordspace = None
+                jobs = [job for job in jobs if job.wordspace is not None]
+            start = time.perf_counter()
+            with memory_phase("execute"):
+                extractions = await asyncio.to_thread(
+                    process_batch,
+                    [job.pending or job.entry for job in jobs],
+                    entry_heuristics,
+                    [job.wordspace for job in jobs]
+                )
+            # Documents of a batch share its latency
+            elapsed = (time.perf_counter() - start) / max(1, len(jobs))
+            for _ in jobs:
+                metrics.observe("pdfse_phase_seconds", elapsed, phase="execute")
+            for job, extraction in zip(jobs, extractions):
+                await job.finish(extraction, result_cache)
+                job.wordspace = None
+        return batch
+
+    async def write(job: _Job) -> None:
+        entry = job.entry
+        results[positions[entry.id]] = _result_record(entry, dataset, job.extraction or EntryResult({}))
+        if job.served and job.pending is None:
+            rich.print(f"[green]✓ Entry #{entry.id} served from result cache")
+        else:
+            rich.print(f"[green]✓ Entry #{entry.id} executed{' (cache)' if job.cached else ''}")
+
+    jobs = [_Job(entry, True) for entry in good_entries] + [_Job(entry, False) for entry in bad_entries]
+    stats = await run_pipeline(jobs, [
+        Stage("read", read, config.readers),
+        Stage("parse", parse, config.parsers),
+        Stage("execute", execute_batch, config.executors, config.batch_size)
+        if config.batch_size > 1 else Stage("execute", execute, config.executors),
+        Stage("write", write),
+    ], config.queue_size)
+
+    rich.print(
+        f"‧ Read {stats['read'].items} PDFs ({io_bytes / 1024 ** 2:.1f} MB) in {io_seconds:.2f}s of I/O; "
+        f"parsing waited {stats['parse'].waiting:.2f}s for reads and took {stats['parse'].busy:.2f}s"
+    )
+
+    await llm_task
+    return results  # type: ignore
+
+
+async def run_extraction(dataset: Path, output: Path, samples: int, image_mode: bool) -> None:
+    run_start = time.perf_counter()
+    entries = load_dataset(dataset)
+    results = await extract_entries(entries, dataset, samples, image_mode)
 
     with open(output, "w") as f:
         json.dump(results, f, indent=2, ensure_ascii=False)
 
+    run_seconds = time.perf_counter() - run_start
+    run_metrics = metrics.get_metrics()
+    if run_metrics:
+        run_metrics.set("pdfse_run_seconds", run_seconds)
+        run_metrics.set("pdfse_documents_per_second", len(entries) / run_seconds if run_seconds else 0.0)
+        if monitor := get_memory_monitor():
+            monitor.sample()
+            memory = monitor.as_dict()
+            run_metrics.set("pdfse_peak_rss_bytes", memory["peak_rss_bytes"])
+            for phase, peaks in memory["phases"].items():
+                run_metrics.set("pdfse_phase_peak_rss_bytes", peaks["peak_rss_bytes"], phase=phase)
+                if peaks["peak_traced_bytes"]:
+                    run_metrics.set("pdfse_phase_peak_traced_bytes", peaks["peak_traced_bytes"], phase=phase)
+
     rich.print(f"[green]✓ Extraction complete. Results saved to {output}")
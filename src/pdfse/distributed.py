@@ -0,0 +1,272 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+import uuid
+import rich
+from itertools import groupby
+from pathlib import Path
+from typing import Any
+
+from .core import EntryResult, _result_record, extract_entries
+from .dataset import load_dataset
+from .lock import FileLock
+from .models import Entry
+
+# A distributed run shares one work directory (a local path, or an NFS
+# mount when workers live on other hosts):
+#   job.json              the job: dataset, options and number of chunks
+#   chunks/NNNNN.json     the entries of each chunk
+#   claims/NNNNN.lock     held by the worker executing the chunk
+#   attempts/NNNNN        how many times the chunk was claimed
+#   results/NNNNN.json    the chunk's result records, written atomically
+# A claim is an OS file lock, so a worker that dies releases its chunk
+# and another worker retries it.
+
+
+class WorkDir:
+    def __init__(self, root: Path):
+        self.root = root
+
+    @property
+    def job_path(self) -> Path:
+        return self.root / "job.json"
+
+    def chunk_path(self, chunk: int) -> Path:
+        return self.root / "chunks" / f"{chunk:05d}.json"
+
+    def claim_lock(self, chunk: int) -> FileLock:
+        return FileLock(self.root / "claims" / f"{chunk:05d}.lock")
+
+    def attempts_path(self, chunk: int) -> Path:
+        return self.root / "attempts" / f"{chunk:05d}"
+
+    def result_path(self, chunk: int) -> Path:
+        return self.root / "results" / f"{chunk:05d}.json"
+
+    def read_job(self) -> dict | None:
+        return _read_json(self.job_path)
+
+    def result(self, job: dict, chunk: int) -> list[dict] | None:
+        """
+        Result records of `chunk`, if a worker finished it for this job.
+        """
+        result = _read_json(self.result_path(chunk))
+        if not isinstance(result, dict) or result.get("job") != job["id"]:
+            return None
+        return result["records"]
+
+    def finished(self, job: dict) -> int:
+        return sum(self.result(job, chunk) is not None for chunk in range(job["chunks"]))
+
+
+def _read_json(path: Path) -> Any:
+    try:
+        return json.loads(path.read_text())
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _write_json(path: Path, data: Any):
+    """
+    Write through a temporary file and rename, so readers on any host
+    never see a partial file.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "w") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def split_chunks(entries: list[Entry], chunk_size: int) -> list[list[Entry]]:
+    """
+    Chunks of at most `chunk_size` entries. Entries of a label are kept
+    next to each other, so a label's heuristic is generated and cached by
+    as few workers as possible.
+    """
+    chunks = []
+    ordered = sorted(entries, key=lambda entry: entry.label)
+    for _, group in groupby(ordered, key=lambda entry: entry.label):
+        group = list(group)
+        chunks.extend(group[i:i + chunk_size] for i in range(0, len(group), chunk_size))
+    return chunks
+
+
+def post_job(
+    workdir: WorkDir,
+    dataset: Path,
+    entries: list[Entry],
+    samples: int,
+    image_mode: bool,
+    chunk_size: int,
+    max_attempts: int
+) -> dict:
+    """
+    Write the chunks of a new job, then the job file workers wait for.
+    Results of a previous job in the same directory are ignored.
+    """
+    job = {
+        "id": uuid.uuid4().hex,
+        "dataset": str(dataset),
+        "samples": samples,
+        "image_mode": image_mode,
+        "max_attempts": max_attempts,
+    }
+    chunks = split_chunks(entries, chunk_size)
+    for i, chunk in enumerate(chunks):
+        _write_json(workdir.chunk_path(i), {
+            "job": job["id"],
+            "entries": [entry.model_dump(mode="json") for entry in chunk],
+        })
+        workdir.attempts_path(i).unlink(missing_ok=True)
+    job["chunks"] = len(chunks)
+    _write_json(workdir.job_path, job)
+    return job
+
+
+def _claim(workdir: WorkDir, job: dict) -> tuple[int, FileLock] | None:
+    for chunk in range(job["chunks"]):
+        if workdir.result(job, chunk) is not None:
+            continue
+        lock = workdir.claim_lock(chunk)
+        if not lock.try_acquire():
+            continue
+        # Finished while we were looking
+        if workdir.result(job, chunk) is not None:
+            lock.release()
+            continue
+        return chunk, lock
+    return None
+
+
+def _count_attempt(workdir: WorkDir, chunk: int) -> int:
+    path = workdir.attempts_path(chunk)
+    try:
+        attempts = int(path.read_text()) + 1
+    except (FileNotFoundError, ValueError):
+        attempts = 1
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(str(attempts))
+    return attempts
+
+
+async def _run_chunk(workdir: WorkDir, job: dict, chunk: int):
+    dataset = Path(job["dataset"])
+    data = _read_json(workdir.chunk_path(chunk))
+    entries = [Entry.model_validate(entry) for entry in data["entries"]]
+
+    attempts = _count_attempt(workdir, chunk)
+    if attempts > job["max_attempts"]:
+        # Likely takes its worker down with it: give up on its entries
+        rich.print(f"[red]✗ Chunk {chunk} failed {attempts - 1} times, giving up on its {len(entries)} entries")
+        records = [
+            _result_record(entry, dataset, EntryResult({field: None for field in entry.extraction_schema}, failed=True))
+            for entry in entries
+        ]
+    else:
+        rich.print(f"‧ Chunk {chunk}: {len(entries)} entries (attempt {attempts})")
+        records = await extract_entries(entries, dataset, job["samples"], job["image_mode"])
+    _write_json(workdir.result_path(chunk), {"job": job["id"], "records": records})
+
+
+async def run_worker(workdir: WorkDir, poll_interval: float = 1.0) -> int:
+    """
+    Claim and execute chunks until every chunk of the job has a result,
+    waiting for a job to be posted if there is none yet. A chunk that
+    fails is released for another attempt (entries that fail to extract
+    do not fail their chunk: they get None fields). Returns the chunks
+    executed.
+    """
+    executed = 0
+    while (job := workdir.read_job()) is None:
+        await asyncio.sleep(poll_interval)
+    while workdir.finished(job) < job["chunks"]:
+        claim = _claim(workdir, job)
+        if claim is None:
+            # Everything left is claimed: wait in case its worker dies
+            await asyncio.sleep(poll_interval)
+            continue
+        chunk, lock = claim
+        try:
+            await _run_chunk(workdir, job, chunk)
+            executed += 1
+            continue
+        except Exception as e:
+            rich.print(f"[red]✗ Chunk {chunk} failed: {e}")
+        finally:
+            lock.release()
+        # Back off, with the chunk released for the other workers
+        await asyncio.sleep(poll_interval)
+    return executed
+
+
+def _spawn_worker(workdir: WorkDir, worker_args: list[str]) -> subprocess.Popen:
+    command = [sys.executable, "-m", "pdfse.cli", "worker", "--workdir", str(workdir.root), *worker_args]
+    return subprocess.Popen(command)
+
+
+def run_coordinator(
+    dataset: Path,
+    output: Path,
+    workdir: WorkDir,
+    samples: int,
+    image_mode: bool,
+    chunk_size: int = 50,
+    local_workers: int = 0,
+    worker_args: list[str] | None = None,
+    max_attempts: int = 3,
+    poll_interval: float = 1.0
+) -> None:
+    """
+    Split the dataset into chunks, wait for workers to execute them and
+    merge their results into `output`, in dataset order.
+
+    Workers are `pdfse worker` processes pointed at the same work
+    directory. `local_workers` of them are started here and restarted if
+    they die while chunks are left; others may join from any host.
+    """
+    dataset = dataset.resolve()
+    entries = load_dataset(dataset)
+    job = post_job(workdir, dataset, entries, samples, image_mode, chunk_size, max_attempts)
+    rich.print(f"[green]✓ Posted {job['chunks']} chunks to {workdir.root}")
+
+    worker_args = worker_args or []
+    workers = [_spawn_worker(workdir, worker_args) for _ in range(local_workers)]
+    # Every death costs some chunk an attempt, so this bounds the restarts
+    # a chunk that crashes its workers can cause
+    restarts = job["chunks"] * max_attempts + local_workers
+    finished = -1
+    try:
+        while (done := workdir.finished(job)) < job["chunks"]:
+            if done != finished:
+                rich.print(f"‧ {done}/{job['chunks']} chunks done")
+                finished = done
+            for i, worker in enumerate(workers):
+                code = worker.poll()
+                if code is None or code == 0:
+                    continue
+                if restarts <= 0:
+                    raise RuntimeError(f"Local workers keep exiting (last exit code {code})")
+                rich.print(f"[yellow]! Worker {worker.pid} exited with code {code}, restarting it")
+                restarts -= 1
+                workers[i] = _spawn_worker(workdir, worker_args)
+            time.sleep(poll_interval)
+    finally:
+        for worker in workers:
+            try:
+                worker.wait(timeout=max(5.0, poll_interval * 2))
+            except subprocess.TimeoutExpired:
+                worker.terminate()
+                worker.wait()
+
+    records: dict[int, dict] = {}
+    for chunk in range(job["chunks"]):
+        data = _read_json(workdir.chunk_path(chunk))
+        for entry, record in zip(data["entries"], workdir.result(job, chunk) or []):
+            records[entry["id"]] = record
+    with open(output, "w") as f:
+        json.dump([records.get(entry.id) for entry in entries], f, indent=2, ensure_ascii=False)
+    rich.print(f"[green]✓ Extraction complete. Results saved to {output}")
@@ -1,73 +1,148 @@
+import asyncio
 import random
-import json
+import sqlite3
 import rich
 from pathlib import Path
-from pydantic import TypeAdapter, ValidationError
+from typing import Iterable
+from pydantic import ValidationError
 from .models import Heuristics, ExtractionSchema, Entry, LLMTask
-
-CACHE_FILE = Path(__file__).parent / "heuristics.json"
-
-heuristics_adapter = TypeAdapter(Heuristics)
-
-def load_heuristics_cache() -> Heuristics:
-    if not CACHE_FILE.exists():
+from .cache import HeuristicsCache
+from .fingerprint import Fingerprint, layout_fingerprint, select_diverse
+from .memory import get_memory_budget, parse_bytes_of
+from .pdf import get_pdf_wordspace
+from .results import ResultCache, results_path_for
+from .store import (
+    HeuristicsStore,
+    SqliteHeuristicsStore,
+    LEGACY_CACHE_FILE,
+    open_store,
+    migrate_json_cache
+)
+
+# Upper bound on the PDFs parsed to pick diverse samples for one label
+MAX_SAMPLE_CANDIDATES = 50
+
+_store: HeuristicsStore | None = None
+
+def configure_store(path: Path | None = None) -> HeuristicsStore:
+    global _store
+    _store = open_store(path)
+    _maybe_migrate_legacy_cache(_store)
+    return _store
+
+def get_store() -> HeuristicsStore:
+    if not _store:
+        return configure_store()
+    return _store
+
+def _maybe_migrate_legacy_cache(store: HeuristicsStore, legacy: Path = LEGACY_CACHE_FILE):
+    """
+    Import the legacy heuristics.json into a new store, once: the store
+    remembers it, so a cleared store stays empty.
+    """
+    if not isinstance(store, SqliteHeuristicsStore) or not legacy.exists():
+        return
+    if store.legacy_migrated():
+        return
+    if store.exists() and not store.is_empty():
+        # Filled before migrations were recorded
+        store.mark_legacy_migrated()
+        return
+    try:
+        migrated = migrate_json_cache(legacy, store)
+        store.mark_legacy_migrated()
+        rich.print(f"[green]✓ Migrated {migrated} label(s) from {legacy} to {store.path}")
+    except (ValidationError, IOError) as e:
+        rich.print(f"[yellow]! Could not migrate legacy heuristics cache: {e}")
+
+def open_heuristics_cache(check_interval: float = 1.0) -> HeuristicsCache:
+    """
+    Live, lazily loaded view of the store for long-running processes.
+    """
+    return HeuristicsCache(get_store(), check_interval)
+
+def load_heuristics_cache(labels: Iterable[str] | None = None) -> Heuristics:
+    store = get_store()
+    if not store.exists():
         rich.print("[yellow]! Heuristics cache file not found. Skipping...")
+        return {}
+    try:
+        heuristics_cache = store.load(labels)
+        rich.print(f"[green]✓ Loaded heuristics cache")
+    except ValidationError:
+        rich.print("[yellow]! Invalid heuristics cache file. Skipping...")
         heuristics_cache = {}
-    else:
-        try:
-            with open(CACHE_FILE, "r") as f:
-                rich.print(f"[green]✓ Loaded heuristics cache")
-                heuristics_cache = heuristics_adapter.validate_json(f.read())
-        except ValidationError:
-            rich.print("[yellow]! Invalid heuristics cache file. Skipping...")
-            heuristics_cache = {}
 
     return heuristics_cache
 
 def save_heuristic_cache(heuristics: Heuristics):
+    """
+    Upsert the given (label, field) heuristics into the store.
+    Fields that are not part of `heuristics` are kept as they are.
+    """
     try:
-        with open(CACHE_FILE, "w") as f:
-            json.dump(heuristics, f, ensure_ascii=False)
-    except IOError as e:
+        get_store().upsert(heuristics)
+    except (OSError, sqlite3.Error) as e:
         rich.print(f"[red]✗ Could not write to heuristics cache: {e}")
 
 def clear_heuristics_cache(
     all_flag: bool = False,
     labels_to_clear: list[str] | None = None
 ):
-    if not CACHE_FILE.exists():
+    store = get_store()
+    if not store.exists():
         rich.print("[yellow]! Heuristics cache file not found. Nothing to clear.")
         return
 
     if all_flag:
         try:
-            CACHE_FILE.unlink()
-            rich.print(f"[green]✓ Heuristics cache file deleted: {CACHE_FILE}")
+            store.clear()
+            rich.print(f"[green]✓ Heuristics cache cleared: {store.path}")
         except Exception as e:
             rich.print(f"[red]✗ Could not delete heuristics cache: {e}")
         return
 
     if labels_to_clear:
-        heuristics = load_heuristics_cache()
-        if not heuristics:
-            rich.print("[yellow]! Heuristics cache is empty. Nothing to clear.")
+        try:
+            removed = store.delete(labels_to_clear)
+        except Exception as e:
+            rich.print(f"[red]✗ Could not update heuristics cache: {e}")
             return
 
-        labels_removed_count = 0
         for label in labels_to_clear:
-            if label in heuristics:
-                heuristics.pop(label)
+            if label in removed:
                 rich.print(f"[green]✓ Removed heuristic for label: '{label}'")
-                labels_removed_count += 1
             else:
                 rich.print(f"[yellow]! Heuristic for label '{label}' not found. Skipping.")
 
-        if labels_removed_count > 0:
-            save_heuristic_cache(heuristics)
-            rich.print(f"[green]✓ Heuristics cache updated. Removed {labels_removed_count} label(s).")
+        if removed:
+            rich.print(f"[green]✓ Heuristics cache updated. Removed {len(removed)} label(s).")
         else:
             rich.print("‧ No matching heuristics found to remove.")
 
+def clear_result_cache(
+    all_flag: bool = False,
+    labels_to_clear: list[str] | None = None
+):
+    """
+    Drop cached extraction results, all of them or those of some labels.
+    """
+    path = results_path_for(get_store().path)
+    if not path.exists():
+        return
+    results = ResultCache(path)
+    try:
+        if all_flag:
+            results.clear()
+            rich.print(f"[green]✓ Result cache cleared: {path}")
+        elif labels_to_clear:
+            removed = results.delete(labels_to_clear)
+            rich.print(f"[green]✓ Removed {removed} cached result(s)")
+    except sqlite3.Error as e:
+        rich.print(f"[red]✗ Could not update result cache: {e}")
+    finally:
+        results.close()
+
 def separate_good_bad_entries(entries: list[Entry], heuristics: Heuristics) -> tuple[list[Entry], list[Entry]]:
     good_entries = []
     bad_entries = []
@@ -83,7 +158,7 @@ def separate_good_bad_entries(entries: list[Entry], heuristics: Heuristics) -> t
         rich.print(f"‧ Need heuristics for {len(bad_entries)} entries")
     return good_entries, bad_entries
 
-def prepare_llm_tasks(bad_entries: list[Entry], heuristics: Heuristics, samples: int) -> list[LLMTask]:
+async def prepare_llm_tasks(bad_entries: list[Entry], heuristics: Heuristics, samples: int) -> list[LLMTask]:
     unknown_label_fields: dict[str, ExtractionSchema] = get_unknown_label_fields(bad_entries, heuristics)
     tasks = []
 
@@ -98,7 +173,7 @@ def prepare_llm_tasks(bad_entries: list[Entry], heuristics: Heuristics, samples:
             all_paths_for_label = list(set(entry.pdf_path for entry in label_to_entries_map[label]))
 
             k = min(len(all_paths_for_label), samples)
-            selected_paths = random.sample(all_paths_for_label, k)
+            selected_paths = await select_sample_paths(all_paths_for_label, k)
 
             tasks.append(LLMTask(
                 label=label,
@@ -111,6 +186,37 @@ def prepare_llm_tasks(bad_entries: list[Entry], heuristics: Heuristics, samples:
 
     return tasks
 
+def _fingerprint_pdf(pdf_path: Path) -> Fingerprint:
+    return layout_fingerprint(get_pdf_wordspace(pdf_path))
+
+async def select_sample_paths(pdf_paths: list[Path], k: int) -> list[Path]:
+    """
+    Pick the k PDFs with the most diverse layouts, so a single LLM round
+    sees as many layout variants as possible. Candidates are parsed in
+    worker threads, within the memory budget.
+    """
+    if len(pdf_paths) <= k:
+        return list(pdf_paths)
+
+    candidates = random.sample(pdf_paths, min(len(pdf_paths), MAX_SAMPLE_CANDIDATES))
+
+    async def fingerprint(pdf_path: Path) -> Fingerprint | None:
+        try:
+            size = await asyncio.to_thread(parse_bytes_of, pdf_path)
+            return await get_memory_budget().run("parse", size, _fingerprint_pdf, pdf_path)
+        except Exception:
+            return None  # Unreadable PDFs make poor samples anyway
+
+    results = await asyncio.gather(*[fingerprint(pdf_path) for pdf_path in candidates])
+    fingerprints = {
+        pdf_path: fingerprint for pdf_path, fingerprint in zip(candidates, results)
+        if fingerprint is not None
+    }
+
+    if len(fingerprints) < k:
+        return candidates[:k]
+    return select_diverse(fingerprints, k)
+
 def is_entry_good(entry: Entry, heuristics: Heuristics):
     return all(field in heuristics.get(entry.label, {}) for field in entry.extraction_schema)
 
@@ -0,0 +1,314 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+import rich
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from itertools import islice
+from pathlib import Path
+from typing import AsyncIterator, Iterable, Iterator
+
+from . import metrics
+from .batch import BatchExecutor
+from .core import fetch_and_save_missing_heuristics, heuristic_for_entry, process_entry
+from .extract import configure_store, get_store, is_entry_good, open_heuristics_cache
+from .machine import ExecutionConfig, get_execution_config
+from .models import DatasetEntry, Entry
+from .pdf import get_pdf_wordspace, read_pdf
+from .tracing import get_tracer
+from .wordspace import Word, WordSpace
+
+Extraction = dict[str, str | None]
+
+
+class Extractor:
+    """
+    Extraction API for long-running processes. It keeps warm across calls:
+
+    - heuristics, in a HeuristicsCache that picks up writes by other processes
+    - compiled plans (one BatchExecutor per label and layout variant),
+      dropped when their label's heuristic changes
+    - parsed documents, in an LRU keyed by file identity or content hash
+
+    Entries whose label lacks heuristics for some fields get them generated,
+    which needs `pdf_path` to point to the PDF. Calls needing a generation
+    already in flight wait for it. A generation that fails or leaves fields
+    missing is retried `retry_after` seconds later at the earliest.
+    """
+    def __init__(
+        self,
+        cache: Path | None = None,
+        samples: int = 3,
+        image_mode: bool = False,
+        generate_missing: bool = True,
+        max_workers: int | None = None,
+        parse_cache_size: int = 256,
+        config: ExecutionConfig | None = None,
+        check_interval: float = 1.0,
+        retry_after: float = 60.0
+    ):
+        if cache is not None:
+            configure_store(cache)
+        self.store = get_store()
+        self.heuristics = open_heuristics_cache(check_interval)
+        self.heuristics.on_invalidate(self._invalidate)
+        self.samples = samples
+        self.image_mode = image_mode
+        self.generate_missing = generate_missing
+        self.max_workers = max_workers or min(32, (os.cpu_count() or 1) + 4)
+        self.parse_cache_size = parse_cache_size
+        self.config = config or get_execution_config()
+        self.retry_after = retry_after
+
+        self._plans: dict[str, dict[str, BatchExecutor]] = {}
+        self._parsed: OrderedDict[tuple, tuple[list[Word], float, float]] = OrderedDict()
+        # (label, fields) being generated -> resolved when that is over
+        self._generating: dict[tuple[str, frozenset[str]], Future] = {}
+        # (label, fields) whose generation failed -> when to retry
+        self._attempted: dict[tuple[str, frozenset[str]], float] = {}
+        self._lock = threading.Lock()
+        self._pool: ThreadPoolExecutor | None = None
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+    def __enter__(self) -> "Extractor":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _executor_pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(self.max_workers, thread_name_prefix="pdfse-extract")
+            return self._pool
+
+    def _invalidate(self, labels: set[str]):
+        with self._lock:
+            for label in labels:
+                self._plans.pop(label, None)
+
+    # Heuristics
+
+    def _missing(self, entries: list[DatasetEntry]) -> tuple[list[Entry], list[Future]]:
+        """
+        Entries still lacking heuristics that this call must generate, and
+        the generations of other calls it must wait for. Entries waiting for
+        a retry are in neither.
+        """
+        if not self.generate_missing:
+            return [], []
+        self.heuristics.track({entry.label for entry in entries})
+        # Checked outside the lock: reading the cache may invalidate plans
+        lacking = [
+            (i, entry) for i, entry in enumerate(entries)
+            if not is_entry_good(entry, self.heuristics)  # type: ignore
+        ]
+        missing = []
+        pending: dict[tuple[str, frozenset[str]], Future] = {}
+        claimed = set()
+        now = time.monotonic()
+        with self._lock:
+            for i, entry in lacking:
+                key = (entry.label, frozenset(entry.extraction_schema))
+                # Every entry of a claimed key is a candidate sample
+                if key not in claimed:
+                    if key in self._generating:
+                        pending[key] = self._generating[key]
+                        continue
+                    if now < self._attempted.get(key, 0.0):
+                        continue
+                    future: Future = Future()
+                    # Running futures can't be cancelled by one of their waiters
+                    future.set_running_or_notify_cancel()
+                    self._generating[key] = future
+                    claimed.add(key)
+                missing.append(entry if isinstance(entry, Entry) else Entry(id=i + 1, **entry.model_dump()))
+        return missing, list(pending.values())
+
+    async def _generate(self, entries: list[Entry]):
+        try:
+            await fetch_and_save_missing_heuristics(entries, self.heuristics.snapshot(), self.samples, self.image_mode)
+            # Saved to the store: reload the labels and drop their compiled plans
+            await asyncio.to_thread(self.heuristics.refresh, True)
+        except Exception as e:
+            rich.print(f"[red]✗ Could not generate heuristics: {e}")
+            metrics.inc("pdfse_failures_total", stage="generate")
+        finally:
+            self._settle(entries)
+
+    def _settle(self, entries: list[Entry]):
+        """
+        Forget the generations that succeeded; schedule a retry of the
+        others. Either way, release the calls waiting for them.
+        """
+        done = {
+            (entry.label, frozenset(entry.extraction_schema)): is_entry_good(entry, self.heuristics)  # type: ignore
+            for entry in entries
+        }
+        retry_at = time.monotonic() + self.retry_after
+        finished = []
+        with self._lock:
+            for key, good in done.items():
+                if good:
+                    self._attempted.pop(key, None)
+                else:
+                    self._attempted[key] = retry_at
+                if (future := self._generating.pop(key, None)) is not None:
+                    finished.append(future)
+        for future in finished:
+            future.set_result(None)
+
+    def _prepare(self, entries: list[DatasetEntry]):
+        missing, pending = self._missing(entries)
+        if missing:
+            asyncio.run(self._generate(missing))
+        wait(pending)
+
+    async def _prepare_async(self, entries: list[DatasetEntry]):
+        missing, pending = self._missing(entries)
+        if missing:
+            await self._generate(missing)
+        if pending:
+            await asyncio.wait([asyncio.wrap_future(future) for future in pending])
+
+    # Execution
+
+    def _wordspace(self, entry: DatasetEntry, pdf: bytes | None) -> WordSpace:
+        if pdf is not None:
+            key: tuple = ("sha1", hashlib.sha1(pdf).hexdigest())
+        else:
+            stat = entry.pdf_path.stat()
+            key = ("path", str(entry.pdf_path.resolve()), stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            parsed = self._parsed.get(key)
+            if parsed is not None:
+                self._parsed.move_to_end(key)
+        if parsed is None:
+            wordspace = get_pdf_wordspace(pdf if pdf is not None else read_pdf(entry.pdf_path))
+            parsed = (wordspace.words, wordspace.max_x, wordspace.max_y)
+            with self._lock:
+                self._parsed[key] = parsed
+                while len(self._parsed) > self.parse_cache_size:
+                    self._parsed.popitem(last=False)
+        # Words are never mutated: only the cursor and buffer are per call
+        words, max_x, max_y = parsed
+        return WordSpace(words, max_x, max_y)
+
+    def _plan(self, label: str, plan: dict[str, list]) -> BatchExecutor:
+        # By content: a reloaded heuristic gets new lists, whose ids may be
+        # those of freed ones
+        key = hashlib.sha1(json.dumps(plan, sort_keys=True).encode("utf-8")).hexdigest()
+        with self._lock:
+            executor = self._plans.setdefault(label, {}).get(key)
+            if executor is None:
+                executor = BatchExecutor(plan, self.config)
+                self._plans[label][key] = executor
+        # run() keeps per-call state on the executor: share only the compiled plan
+        return executor.fork()
+
+    def _execute(self, entry: DatasetEntry, pdf: bytes | None = None) -> Extraction:
+        try:
+            wordspace = self._wordspace(entry, pdf)
+            heuristics = {entry.label: self.heuristics.get(entry.label, {})}
+            if get_tracer():
+                # Tracing reports per document, which only the machine does
+                result = process_entry(entry, heuristics, wordspace)  # type: ignore
+                extracted, timed_out = result.values, result.timed_out
+            else:
+                plan = heuristic_for_entry(entry, heuristics, wordspace)  # type: ignore
+                executor = self._plan(entry.label, plan)
+                extracted, timed_out = executor.run([wordspace])[0], executor.timed_out[0]
+                for field in entry.extraction_schema:
+                    extracted.setdefault(field, None)
+            if timed_out:
+                metrics.inc("pdfse_timed_out_fields_total", len(timed_out))
+                rich.print(f"[yellow]! {entry.pdf_path.name} ran out of time on: {', '.join(timed_out)}")
+            return extracted
+        except Exception as e:
+            rich.print(f"[red]✗ Error processing {entry.pdf_path.name}: {e}")
+            metrics.inc("pdfse_failures_total", stage="execute")
+            return {field: None for field in entry.extraction_schema}
+
+    # Public API
+
+    def extract(self, entry: DatasetEntry, pdf: bytes | None = None) -> Extraction:
+        """
+        Extract one entry, from `pdf` if given (else from its `pdf_path`).
+        Generating missing heuristics runs an event loop: from async code,
+        use extract_async instead.
+        """
+        self._prepare([entry])
+        return self._execute(entry, pdf)
+
+    async def extract_async(self, entry: DatasetEntry, pdf: bytes | None = None) -> Extraction:
+        await self._prepare_async([entry])
+        return await asyncio.wrap_future(self._executor_pool().submit(self._execute, entry, pdf))
+
+    def extract_many(
+        self,
+        entries: Iterable[DatasetEntry],
+        ordered: bool = True,
+        window: int | None = None
+    ) -> Iterator[tuple[DatasetEntry, Extraction]]:
+        """
+        Yield (entry, extraction) pairs in input order, or as they complete
+        with `ordered=False`. Entries are consumed `window` at a time (by
+        default four per worker), so any iterable can be streamed through.
+        """
+        window = window or self.max_workers * 4
+        pool = self._executor_pool()
+        pending: deque[tuple[DatasetEntry, Future]] = deque()
+        iterator = iter(entries)
+        try:
+            while batch := list(islice(iterator, window)):
+                self._prepare(batch)
+                for entry in batch:
+                    pending.append((entry, pool.submit(self._execute, entry)))
+                while len(pending) > window:
+                    yield from self._take(pending, ordered)
+            while pending:
+                yield from self._take(pending, ordered)
+        finally:
+            for _, future in pending:
+                future.cancel()
+
+    def _take(self, pending: deque[tuple[DatasetEntry, Future]], ordered: bool) -> Iterator[tuple[DatasetEntry, Extraction]]:
+        if ordered:
+            entry, future = pending.popleft()
+            yield entry, future.result()
+            return
+        done, _ = wait([future for _, future in pending], return_when=FIRST_COMPLETED)
+        for item in [item for item in pending if item[1] in done]:
+            pending.remove(item)
+            yield item[0], item[1].result()
+
+    async def extract_many_async(
+        self,
+        entries: Iterable[DatasetEntry],
+        ordered: bool = True
+    ) -> AsyncIterator[tuple[DatasetEntry, Extraction]]:
+        """
+        Async counterpart of extract_many, generating the missing heuristics
+        of all entries up front.
+        """
+        entries = list(entries)
+        await self._prepare_async(entries)
+        pool = self._executor_pool()
+
+        async def run(entry: DatasetEntry) -> tuple[DatasetEntry, Extraction]:
+            return entry, await asyncio.wrap_future(pool.submit(self._execute, entry))
+
+        tasks = [asyncio.ensure_future(run(entry)) for entry in entries]
+        try:
+            for next_result in (tasks if ordered else asyncio.as_completed(tasks)):
+                yield await next_result
+        finally:
+            for task in tasks:
+                task.cancel()
@@ -0,0 +1,229 @@
+import json
+import math
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from .metrics import Histogram
+from .utils import estimate_tokens
+
+_LABEL_HEADER = re.compile(r'LABEL "(.+?)"')
+
+
+@dataclass
+class FakeServerConfig:
+    # Response latency is log-normal around `latency` seconds (fixed if sigma is 0)
+    latency: float = 0.0
+    latency_sigma: float = 0.0
+    # Probability of answering with a 429 (half the time) or a 500
+    error_rate: float = 0.0
+    retry_after: float = 1.0
+    # Returned verbatim for every request instead of a schema-derived heuristic
+    canned_response: dict | None = None
+    seed: int | None = None
+
+
+@dataclass
+class FakeServerStats:
+    requests: int = 0
+    errors: int = 0
+    bytes_received: int = 0
+    # Bucketed, so a long load test does not grow the server's memory
+    latency: Histogram = field(default_factory=Histogram)
+
+    def as_dict(self) -> dict:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "bytes_received": self.bytes_received,
+            "mean_latency": self.latency.sum / self.latency.count if self.latency.count else 0.0,
+            "latency": self.latency.as_dict(),
+        }
+
+
+def heuristic_for_schema(schema: dict[str, str]) -> dict[str, list]:
+    """
+    A plausible plan for every field: anchor to the field name, then
+    collect what follows it on the same line.
+    """
+    return {
+        field_name: [
+            {"type": "command", "name": "anchor_to_text", "args": {"text": field_name.replace("_", " ")}},
+            {"type": "command", "name": "move_right", "args": {}},
+            {"type": "command", "name": "collect_trailing_sentence", "args": {}},
+        ]
+        for field_name in schema
+    }
+
+
+def _first_json_object(text: str) -> dict | None:
+    start = text.find("{")
+    while start != -1:
+        try:
+            value, _ = json.JSONDecoder().raw_decode(text, start)
+            if isinstance(value, dict):
+                return value
+        except json.JSONDecodeError:
+            pass
+        start = text.find("{", start + 1)
+    return None
+
+
+def response_for_request(body: dict) -> dict:
+    """
+    Derive a heuristic (or bundled heuristics) from the schemas embedded
+    in a chat completion request built by pdfse.llm.
+    """
+    user_messages = [m for m in body.get("messages", []) if m.get("role") == "user"]
+    parts = user_messages[-1]["content"] if user_messages else []
+    if isinstance(parts, str):
+        parts = [{"type": "text", "text": parts}]
+
+    single_schema: dict = {}
+    bundled: dict[str, dict] = {}
+    for part in parts:
+        if part.get("type") != "text":
+            continue
+        text = part["text"]
+        if "SAMPLE" in text and "extraction schema" not in text.lower():
+            continue
+        schema = _first_json_object(text)
+        if schema is None:
+            continue
+        header = _LABEL_HEADER.search(text)
+        if header:
+            bundled[header.group(1)] = heuristic_for_schema(schema)
+        elif not single_schema:
+            single_schema = schema
+
+    if bundled:
+        return bundled
+    return heuristic_for_schema(single_schema)
+
+
+class FakeOpenAIServer:
+    """
+    Local stand-in for the OpenAI chat completions endpoint, for offline
+    end-to-end and load tests. Point the client at `base_url`.
+    """
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, config: FakeServerConfig | None = None):
+        self.config = config or FakeServerConfig()
+        self.stats = FakeServerStats()
+        self._random = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def _sample_latency(self) -> float:
+        with self._lock:
+            if self.config.latency <= 0:
+                return 0.0
+            if self.config.latency_sigma <= 0:
+                return self.config.latency
+            return self._random.lognormvariate(math.log(self.config.latency), self.config.latency_sigma)
+
+    def _sample_error(self) -> int | None:
+        with self._lock:
+            if self._random.random() >= self.config.error_rate:
+                return None
+            return self._random.choice([429, 500])
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status: int, payload: dict, headers: dict | None = None):
+                data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if self.path.rstrip("/").endswith("/stats"):
+                    with server._lock:
+                        self._send_json(200, server.stats.as_dict())
+                else:
+                    self._send_json(404, {"error": {"message": "not found"}})
+
+            def do_POST(self):
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self._send_json(404, {"error": {"message": "not found"}})
+                    return
+
+                raw = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                latency = server._sample_latency()
+                time.sleep(latency)
+                status = server._sample_error()
+                with server._lock:
+                    server.stats.requests += 1
+                    server.stats.bytes_received += len(raw)
+                    server.stats.latency.observe(latency)
+                    if status:
+                        server.stats.errors += 1
+
+                if status == 429:
+                    self._send_json(429, {"error": {"message": "Rate limit reached", "type": "rate_limit"}},
+                                    {"Retry-After": str(server.config.retry_after)})
+                    return
+                if status:
+                    self._send_json(status, {"error": {"message": "Internal server error", "type": "server_error"}})
+                    return
+
+                body = json.loads(raw)
+                content = server.config.canned_response or response_for_request(body)
+                content_text = json.dumps(content, ensure_ascii=False)
+                prompt_tokens = estimate_tokens(raw.decode("utf-8", errors="ignore"))
+                completion_tokens = estimate_tokens(content_text)
+                self._send_json(200, {
+                    "id": "chatcmpl-fake",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body.get("model", "fake"),
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content_text},
+                        "finish_reason": "stop",
+                    }],
+                    "usage": {
+                        "prompt_tokens": prompt_tokens,
+                        "completion_tokens": completion_tokens,
+                        "total_tokens": prompt_tokens + completion_tokens,
+                    },
+                })
+
+        return Handler
+
+    def start(self) -> "FakeOpenAIServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self._httpd.serve_forever()
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self) -> "FakeOpenAIServer":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
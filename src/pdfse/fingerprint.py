@@ -0,0 +1,70 @@
+from typing import Hashable, TypeVar
+from pdfse.wordspace import Word, WordSpace
+
+K = TypeVar("K", bound=Hashable)
+
+GRID_ROWS = 8
+GRID_COLS = 8
+
+Fingerprint = tuple[float, ...]
+
+
+def _is_anchor_word(word: Word) -> bool:
+    # Words that look like field labels ("Nome:", "CPF", "INSCRIÇÃO") move with
+    # the layout, so their positions say more about it than the values do.
+    text = word.text
+    return text.endswith(":") or (text.isalpha() and text.isupper() and len(text) >= 3)
+
+
+def _grid_histogram(words: list[Word], max_x: float, max_y: float) -> list[float]:
+    histogram = [0.0] * (GRID_ROWS * GRID_COLS)
+    if not words or max_x <= 0 or max_y <= 0:
+        return histogram
+    for word in words:
+        x0, y0, x1, y1 = word.bbox
+        col = min(GRID_COLS - 1, max(0, int((x0 + x1) / 2 / max_x * GRID_COLS)))
+        row = min(GRID_ROWS - 1, max(0, int((y0 + y1) / 2 / max_y * GRID_ROWS)))
+        histogram[row * GRID_COLS + col] += 1
+    total = len(words)
+    return [count / total for count in histogram]
+
+
+def layout_fingerprint(wordspace: WordSpace) -> Fingerprint:
+    """
+    Coarse description of a page layout: where the words are (normalized
+    word-center histogram over a grid) and where the label-like words are.
+    """
+    anchors = [word for word in wordspace.words if _is_anchor_word(word)]
+    return tuple(
+        _grid_histogram(wordspace.words, wordspace.max_x, wordspace.max_y)
+        + _grid_histogram(anchors, wordspace.max_x, wordspace.max_y)
+    )
+
+
+def fingerprint_distance(a: Fingerprint, b: Fingerprint) -> float:
+    return sum(abs(x - y) for x, y in zip(a, b))
+
+
+def select_diverse(fingerprints: dict[K, Fingerprint], k: int) -> list[K]:
+    """
+    Pick k keys whose layouts are as different as possible (greedy
+    farthest-point selection). The first pick is the most typical layout,
+    closest to the mean of all fingerprints.
+    """
+    keys = list(fingerprints)
+    if k >= len(keys):
+        return keys
+    if k <= 0:
+        return []
+
+    dims = len(next(iter(fingerprints.values())))
+    mean = tuple(sum(fp[i] for fp in fingerprints.values()) / len(keys) for i in range(dims))
+    selected = [min(keys, key=lambda key: fingerprint_distance(fingerprints[key], mean))]
+
+    nearest = {key: fingerprint_distance(fingerprints[key], fingerprints[selected[0]]) for key in keys}
+    while len(selected) < k:
+        candidate = max((key for key in keys if key not in selected), key=lambda key: nearest[key])
+        selected.append(candidate)
+        for key in keys:
+            nearest[key] = min(nearest[key], fingerprint_distance(fingerprints[key], fingerprints[candidate]))
+    return selected
@@ -0,0 +1,216 @@
+import json
+import math
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from .core import process_entry
+from .dataset import load_dataset
+from .models import Entry, Heuristics
+from .memory import peak_rss
+from .pdf import get_pdf_wordspace, read_pdf
+
+# A golden corpus is a directory holding:
+#   dataset.json     entries in the usual dataset format
+#   heuristics.json  the fixed heuristics to run, by label
+#   golden.json      expected extraction of each entry, by "<label>:<PDF path>"
+DATASET_FILE = "dataset.json"
+HEURISTICS_FILE = "heuristics.json"
+GOLDEN_FILE = "golden.json"
+
+PHASES = ("read", "parse", "execute")
+# What reading or parsing a bad PDF raises (MuPDF's errors are RuntimeErrors)
+READ_ERRORS = (OSError, RuntimeError, ValueError)
+
+
+def percentile(values: list[float], q: float) -> float:
+    """
+    Nearest-rank percentile (q in [0, 1]) of `values`.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = math.ceil(round(q * len(ordered), 9))
+    return ordered[min(max(rank, 1), len(ordered)) - 1]
+
+
+@dataclass
+class LabelAccuracy:
+    fields: int = 0
+    matched: int = 0
+    documents: int = 0
+    exact_documents: int = 0
+
+    @property
+    def accuracy(self) -> float:
+        return self.matched / self.fields if self.fields else 1.0
+
+    def as_dict(self) -> dict:
+        return {
+            "documents": self.documents,
+            "exact_documents": self.exact_documents,
+            "fields": self.fields,
+            "matched": self.matched,
+            "accuracy": round(self.accuracy, 4),
+        }
+
+
+@dataclass
+class GoldenReport:
+    labels: dict[str, LabelAccuracy] = field(default_factory=dict)
+    # (golden key, field, expected, got) of every field that differs
+    mismatches: list[tuple[str, str, str | None, str | None]] = field(default_factory=list)
+    # (golden key, error) of every document that could not be read or
+    # parsed; its fields count as None
+    failed: list[tuple[str, str]] = field(default_factory=list)
+    # Per-document seconds of each phase, over every repetition
+    latencies: dict[str, list[float]] = field(default_factory=lambda: {phase: [] for phase in PHASES})
+    # Peak of Python allocations during one pass, and of the process RSS
+    peak_traced_bytes: int = 0
+    peak_rss_bytes: int = 0
+
+    @property
+    def passed(self) -> bool:
+        return not self.mismatches and not self.failed
+
+    def latency(self, phase: str) -> dict:
+        values = self.latencies[phase]
+        return {
+            "count": len(values),
+            "mean": round(sum(values) / len(values), 6) if values else 0.0,
+            "p50": round(percentile(values, 0.5), 6),
+            "p95": round(percentile(values, 0.95), 6),
+            "p99": round(percentile(values, 0.99), 6),
+            "max": round(max(values, default=0.0), 6),
+        }
+
+    def as_dict(self) -> dict:
+        return {
+            "passed": self.passed,
+            "labels": {label: accuracy.as_dict() for label, accuracy in sorted(self.labels.items())},
+            "mismatches": [
+                {"entry": key, "field": name, "expected": expected, "got": got}
+                for key, name, expected, got in self.mismatches
+            ],
+            "failed": [{"entry": key, "error": error} for key, error in self.failed],
+            "latency": {phase: self.latency(phase) for phase in PHASES},
+            "peak_traced_bytes": self.peak_traced_bytes,
+            "peak_rss_bytes": self.peak_rss_bytes,
+        }
+
+
+def load_corpus(corpus: Path) -> tuple[list[Entry], Heuristics, dict[str, dict]]:
+    entries = load_dataset(corpus / DATASET_FILE)
+    heuristics = json.loads((corpus / HEURISTICS_FILE).read_text())
+    golden_path = corpus / GOLDEN_FILE
+    golden = json.loads(golden_path.read_text()) if golden_path.exists() else {}
+    return entries, heuristics, golden
+
+
+def _golden_key(corpus: Path, entry: Entry) -> str:
+    """
+    Entries are told apart by label and PDF, as one PDF may be in the
+    corpus under several labels. The path is relative to the corpus, or
+    as written in the dataset if it points outside of it.
+    """
+    path = entry.pdf_path
+    if path.is_relative_to(corpus):
+        path = path.relative_to(corpus)
+    return f"{entry.label}:{path.as_posix()}"
+
+
+def _extract(entry: Entry, heuristics: Heuristics, latencies: dict[str, list[float]] | None) -> dict:
+    """
+    Raises one of READ_ERRORS if the PDF cannot be read or parsed.
+    """
+    start = time.perf_counter()
+    data = read_pdf(entry.pdf_path)
+    read = time.perf_counter()
+    wordspace = get_pdf_wordspace(data)
+    parsed = time.perf_counter()
+    extracted = process_entry(entry, heuristics, wordspace).values
+    executed = time.perf_counter()
+    if latencies is not None:
+        latencies["read"].append(read - start)
+        latencies["parse"].append(parsed - read)
+        latencies["execute"].append(executed - parsed)
+    return extracted
+
+
+def run_golden(corpus: Path, repeat: int = 1, measure_memory: bool = True) -> tuple[GoldenReport, dict[str, dict]]:
+    """
+    Run every corpus entry through process_entry with the corpus
+    heuristics, `repeat` times for latency, and compare the outputs of the
+    first pass with the golden results. Memory is measured in a separate
+    pass, as tracing allocations slows execution down.
+    Returns the report and the outputs (the golden file they would make).
+    """
+    entries, heuristics, golden = load_corpus(corpus)
+    report = GoldenReport()
+    outputs: dict[str, dict] = {}
+
+    for i in range(max(1, repeat)):
+        for entry in entries:
+            try:
+                extracted = _extract(entry, heuristics, report.latencies)
+            except READ_ERRORS as e:
+                # One bad PDF must not stop the run: it is a failure, and
+                # its fields mismatch wherever a value was expected
+                extracted = {name: None for name in entry.extraction_schema}
+                if i == 0:
+                    report.failed.append((_golden_key(corpus, entry), str(e) or type(e).__name__))
+            if i == 0:
+                # Entries of the same label and PDF only differ by their fields
+                outputs.setdefault(_golden_key(corpus, entry), {}).update(extracted)
+
+    for entry in entries:
+        key = _golden_key(corpus, entry)
+        expected = golden.get(key, {})
+        got = outputs[key]
+        accuracy = report.labels.setdefault(entry.label, LabelAccuracy())
+        accuracy.documents += 1
+        exact = True
+        for name in entry.extraction_schema:
+            accuracy.fields += 1
+            if name in expected and expected[name] == got.get(name):
+                accuracy.matched += 1
+            else:
+                exact = False
+                report.mismatches.append((key, name, expected.get(name), got.get(name)))
+        accuracy.exact_documents += exact
+
+    if measure_memory:
+        tracemalloc.start()
+        try:
+            for entry in entries:
+                try:
+                    _extract(entry, heuristics, None)
+                except READ_ERRORS:
+                    pass
+            _, report.peak_traced_bytes = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    report.peak_rss_bytes = peak_rss()
+    return report, outputs
+
+
+def save_golden(corpus: Path, outputs: dict[str, dict]):
+    with open(corpus / GOLDEN_FILE, "w") as f:
+        json.dump(outputs, f, indent=2, ensure_ascii=False, sort_keys=True)
+
+
+def compare_latency(report: GoldenReport, baseline: dict, max_slowdown: float) -> list[str]:
+    """
+    Phases whose p50 or p95 grew by more than `max_slowdown` (0.2 = 20%)
+    over a baseline report.
+    """
+    regressions = []
+    for phase in PHASES:
+        current = report.latency(phase)
+        previous = baseline.get("latency", {}).get(phase, {})
+        for stat in ("p50", "p95"):
+            before = previous.get(stat)
+            if before and current[stat] > before * (1 + max_slowdown):
+                regressions.append(f"{phase} {stat}: {before:.6f}s → {current[stat]:.6f}s")
+    return regressions
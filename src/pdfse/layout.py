@@ -0,0 +1,185 @@
+import re
+from dataclasses import dataclass, field
+from enum import Enum
+from pdfse.utils import normalize_text, estimate_tokens
+
+# Runs of this many spaces or more separate columns
+_COLUMN_GAP = re.compile(r" {3,}")
+_WORD = re.compile(r"\w{3,}")
+
+COLUMN_MARKER = " | "
+
+
+@dataclass
+class LayoutReport:
+    raw_tokens: list[int] = field(default_factory=list)
+    encoded_tokens: list[int] = field(default_factory=list)
+
+    @property
+    def total_raw(self) -> int:
+        return sum(self.raw_tokens)
+
+    @property
+    def total_encoded(self) -> int:
+        return sum(self.encoded_tokens)
+
+    def summary(self) -> str:
+        saved = 1 - self.total_encoded / self.total_raw if self.total_raw else 0.0
+        return f"~{self.total_encoded} sample tokens (raw ~{self.total_raw}, -{saved:.0%})"
+
+
+def compact_line(line: str) -> str:
+    """
+    Collapse the whitespace of one layout line: wide gaps become column
+    markers and the indentation is kept at a quarter of its width.
+    """
+    stripped = line.strip()
+    if not stripped:
+        return ""
+    indent = (len(line) - len(line.lstrip(" ")) + 3) // 4
+    return " " * indent + _COLUMN_GAP.sub(COLUMN_MARKER, stripped)
+
+
+def compact_layout(text: str) -> list[str]:
+    lines = []
+    for line in text.splitlines():
+        line = compact_line(line)
+        if line or (lines and lines[-1]):  # Keep at most one blank line in a row
+            lines.append(line)
+    while lines and not lines[-1]:
+        lines.pop()
+    return lines
+
+
+class ImageCrop(str, Enum):
+    # The whole page
+    FULL = "full"
+    # The text's bounding box, with wide empty bands collapsed
+    TEXT = "text"
+    # Only the rows near words of the schema (the text box if none match)
+    ANCHORS = "anchors"
+
+
+def schema_terms(schema: dict[str, str]) -> set[str]:
+    terms = set()
+    for name, description in schema.items():
+        for source in (name.replace("_", " "), description):
+            terms.update(_WORD.findall(normalize_text(source)))
+    return terms
+
+
+def mentions(text: str, terms: set[str]) -> bool:
+    return bool(terms & set(_WORD.findall(normalize_text(text))))
+
+
+def _truncate_to_budget(lines: list[str], terms: set[str], budget: int) -> list[str]:
+    """
+    Keep the lines closest to schema-relevant lines until the token budget
+    is spent; dropped runs are replaced by a single omission marker.
+    """
+    if estimate_tokens("\n".join(lines)) <= budget:
+        return lines
+
+    relevant = [
+        i for i, line in enumerate(lines)
+        if mentions(line, terms)
+    ]
+    if not relevant:
+        relevant = [0]  # Nothing matched: keep the top of the page
+
+    distance = [min(abs(i - r) for r in relevant) for i in range(len(lines))]
+    keep: set[int] = set()
+    spent = 0
+    for i in sorted(range(len(lines)), key=lambda i: (distance[i], i)):
+        cost = estimate_tokens(lines[i])
+        if spent + cost > budget:
+            break
+        keep.add(i)
+        spent += cost
+
+    result = []
+    omitted = 0
+    for i, line in enumerate(lines):
+        if i in keep:
+            if omitted:
+                result.append(f"[... {omitted} lines omitted ...]")
+                omitted = 0
+            result.append(line)
+        else:
+            omitted += 1
+    if omitted:
+        result.append(f"[... {omitted} lines omitted ...]")
+    return result
+
+
+def _dedupe_against_previous(lines: list[str], seen: set[str]) -> list[str]:
+    """
+    Replace runs of lines already shown in an earlier sample by a marker,
+    when the marker is shorter than the lines it stands for.
+    """
+    result = []
+    repeated: list[str] = []
+
+    def flush():
+        marker = f"[= {len(repeated)} line(s) identical to an earlier sample]"
+        if sum(len(line) + 1 for line in repeated) > len(marker):
+            result.append(marker)
+        else:
+            result.extend(repeated)
+        repeated.clear()
+
+    for line in lines:
+        if line and line in seen:
+            repeated.append(line)
+            continue
+        if repeated:
+            flush()
+        result.append(line)
+    if repeated:
+        flush()
+    return result
+
+
+class LayoutEncoder:
+    """
+    Turns raw `get_text("text", sort=True)` layouts into compact prompt
+    text, and says how much of the page image samples show.
+    """
+    def __init__(self, token_budget: int | None = 3000, dedupe: bool = True, image_crop: ImageCrop = ImageCrop.FULL):
+        self.token_budget = token_budget
+        self.dedupe = dedupe
+        self.image_crop = image_crop
+
+    def encode(self, layouts: list[str], schema: dict[str, str]) -> tuple[list[str], LayoutReport]:
+        report = LayoutReport()
+        terms = schema_terms(schema)
+        seen: set[str] = set()
+        encoded = []
+        for layout in layouts:
+            lines = compact_layout(layout)
+            if self.token_budget is not None:
+                lines = _truncate_to_budget(lines, terms, self.token_budget)
+            shown = _dedupe_against_previous(lines, seen) if self.dedupe else lines
+            seen.update(lines)
+            text = "\n".join(shown)
+            encoded.append(text)
+            report.raw_tokens.append(estimate_tokens(layout))
+            report.encoded_tokens.append(estimate_tokens(text))
+        return encoded, report
+
+
+_encoder: LayoutEncoder | None = None
+
+def configure_layout_encoder(
+    token_budget: int | None = 3000,
+    dedupe: bool = True,
+    image_crop: ImageCrop = ImageCrop.FULL
+) -> LayoutEncoder:
+    global _encoder
+    _encoder = LayoutEncoder(token_budget, dedupe, image_crop)
+    return _encoder
+
+def get_layout_encoder() -> LayoutEncoder:
+    if not _encoder:
+        return configure_layout_encoder()
+    return _encoder
@@ -1,18 +1,32 @@
+import os
 import json
+import time
 import base64
 import openai
 from dotenv import load_dotenv
 from typing import Union
+from . import metrics
 
 
 load_dotenv()
 
 
 _client: openai.AsyncOpenAI | None = None
-def get_client() -> openai.AsyncOpenAI:
+def configure_client(base_url: str | None = None, api_key: str | None = None) -> openai.AsyncOpenAI:
+    """
+    (Re)create the client, e.g. to target a local stand-in server.
+    Without arguments, OPENAI_API_KEY / OPENAI_BASE_URL are used.
+    """
     global _client
+    if base_url and not api_key and not os.environ.get("OPENAI_API_KEY"):
+        api_key = "unused"  # Local servers do not check it
+    # Retries are handled by the scheduler, which knows about rate limits
+    _client = openai.AsyncOpenAI(base_url=base_url, api_key=api_key, timeout=600.0, max_retries=0)
+    return _client
+
+def get_client() -> openai.AsyncOpenAI:
     if not _client:
-        _client = openai.AsyncOpenAI(timeout=600.0)
+        return configure_client()
     return _client
 
 
@@ -21,25 +35,9 @@ def _encode_image_to_base64(imageb: bytes) -> str:
     return f"data:image/png;base64,{base64_string}"
 
 
-async def fetch_heuristic(
-    extraction_schema: dict,
-    samples_data: Union[list[bytes], list[str]],
-    image_mode: bool
-) -> dict[str, list]:
-    client = get_client()
-
-    schema_prompt = {
-        "type": "text",
-        "text": f"""
-        Here is the extraction schema for this task. Please generate the JSON heuristic based on this schema and the provided samples:
-
-        {json.dumps(extraction_schema, indent=2, ensure_ascii=False)}
-        """
-    }
-
-    sample_content = []
+def _build_sample_content(samples_data: Union[list[bytes], list[str]], image_mode: bool) -> list[dict]:
     if image_mode:
-        sample_content = [
+        return [
             {
                 "type": "image_url",
                 "image_url": {
@@ -49,39 +47,104 @@ async def fetch_heuristic(
             }
             for imageb in samples_data
         ]
-    else:
-        sample_content = [
-            {
-                "type": "text",
-                "text": f"""
-                ---
-                SAMPLE {i+1} (Text Content Layout)
-                ---
-                {text_content}
-                """
-            }
-            for i, text_content in enumerate(samples_data)
-        ]
+    return [
+        {
+            "type": "text",
+            "text": f"""
+            ---
+            SAMPLE {i+1} (Text Content Layout)
+            ---
+            {text_content}
+            """
+        }
+        for i, text_content in enumerate(samples_data)
+    ]
+
 
-    user_content = [schema_prompt] + sample_content
-
-    system_prompt = get_system_prompt(image_mode)
-    response = await client.chat.completions.create(
-        model="gpt-5-mini",
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_content} # type: ignore
-        ],
-        response_format={"type": "json_object"},
-    )
+async def _request_json(system_prompt: str, user_content: list[dict]) -> dict:
+    client = get_client()
+    start = time.perf_counter()
+    try:
+        response = await client.chat.completions.create(
+            model="gpt-5-mini",
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_content} # type: ignore
+            ],
+            response_format={"type": "json_object"},
+        )
+    except Exception as e:
+        metrics.inc("pdfse_llm_requests_total", status=type(e).__name__)
+        raise
+    finally:
+        metrics.observe("pdfse_llm_request_seconds", time.perf_counter() - start)
+    metrics.inc("pdfse_llm_requests_total", status="ok")
+    if response.usage:
+        metrics.inc("pdfse_llm_tokens_total", response.usage.prompt_tokens, kind="prompt")
+        metrics.inc("pdfse_llm_tokens_total", response.usage.completion_tokens, kind="completion")
     response_content = response.choices[0].message.content
     if not response_content:
         raise ValueError("LLM response was empty")
 
-    heuristic = json.loads(response_content)
+    return json.loads(response_content)
+
+
+async def fetch_heuristic(
+    extraction_schema: dict,
+    samples_data: Union[list[bytes], list[str]],
+    image_mode: bool,
+    straight_line: bool = False,
+    cropped: bool = False
+) -> dict[str, list]:
+    schema_prompt = {
+        "type": "text",
+        "text": f"""
+        Here is the extraction schema for this task. Please generate the JSON heuristic based on this schema and the provided samples:
+
+        {json.dumps(extraction_schema, indent=2, ensure_ascii=False)}
+        """
+    }
+
+    user_content = [schema_prompt] + _build_sample_content(samples_data, image_mode)
+
+    system_prompt = get_system_prompt(image_mode, cropped)
+    if straight_line:
+        system_prompt = f"{system_prompt}\n{_STRAIGHT_LINE_PROMPT}"
+    heuristic = await _request_json(system_prompt, user_content)
     return heuristic
 
 
+async def fetch_bundled_heuristics(
+    bundle: list[tuple[str, dict, Union[list[bytes], list[str]]]],
+    image_mode: bool,
+    cropped: bool = False
+) -> dict[str, dict[str, list]]:
+    """
+    Generate the heuristics of several labels in one request.
+    `bundle` holds (label, extraction_schema, samples_data) tuples; the
+    response maps each label to its heuristic.
+    """
+    user_content = []
+    for label, extraction_schema, samples_data in bundle:
+        user_content.append({
+            "type": "text",
+            "text": f"""
+            ===
+            LABEL "{label}"
+            ===
+            Extraction schema for this label:
+
+            {json.dumps(extraction_schema, indent=2, ensure_ascii=False)}
+
+            Samples of this label follow.
+            """
+        })
+        user_content.extend(_build_sample_content(samples_data, image_mode))
+
+    heuristics = await _request_json(get_bundle_system_prompt(image_mode, cropped), user_content)
+    return heuristics
+
+
 # --- System Prompt Templates ---
 
 _COMMON_PROMPT_HEADER = """You are an expert AI assistant specializing in PDF data extraction. Your task is to act as a 'heuristic generator' for a navigation robot.
@@ -100,6 +163,9 @@ Your mission is to generate a **JSON command plan** that uses the `WordSpace` cl
 **PROVIDED CONTEXT (INPUTS)**
 
 1.  **Text Samples (Layout Context):** Blocks of text (e.g., `SAMPLE 1`, `SAMPLE 2`). The order of words and lines in this text *directly corresponds* to the layout and reading order. Use this to understand *proximity* and *relative positioning* of words.
+    * The layout is compacted: ` | ` marks a wide horizontal gap between columns and indentation is shrunk to a quarter of its width.
+    * `[= N line(s) identical to an earlier sample]` stands for lines that already appeared, verbatim, in a previous sample.
+    * `[... N lines omitted ...]` stands for lines far from any schema-related text that were left out.
 2.  **Schema (Objective):** A JSON `extraction_schema` (e.g., `{"name": "Name of the person", "cpf": "Tax ID number"}`).
 """
 
@@ -389,7 +455,53 @@ _IMAGE_MODE_EXAMPLE = """
     ```
 """
 
-def get_system_prompt(image_mode: bool) -> str:
+def get_system_prompt(image_mode: bool, cropped: bool = False) -> str:
+    """
+    `cropped` tells the model the images were cropped (any --image-crop
+    other than full); it has no effect in text mode.
+    """
     context_part = _IMAGE_MODE_CONTEXT if image_mode else _TEXT_MODE_CONTEXT
     example_part = _IMAGE_MODE_EXAMPLE if image_mode else _TEXT_MODE_EXAMPLE
-    return f"{_COMMON_PROMPT_HEADER}\n{context_part}\n{_COMMON_PROMPT_FOOTER}\n{example_part}"
+    prompt = f"{_COMMON_PROMPT_HEADER}\n{context_part}\n{_COMMON_PROMPT_FOOTER}\n{example_part}"
+    if image_mode and cropped:
+        prompt = f"{prompt}\n{_IMAGE_CROP_PROMPT}"
+    return prompt
+
+
+_STRAIGHT_LINE_PROMPT = """
+---
+
+**LAYOUT VARIANT (OVERRIDES PRINCIPLES 1, 2 AND 4)**
+
+This heuristic is a *layout variant*: it will only ever run on documents whose layout is identical to the single sample provided (this is verified beforehand). Optimize for speed:
+* Prefer short, straight-line command lists: one text anchor followed by a few relative moves and a collect.
+* Avoid `loop` and `if` unless the value itself has variable length (e.g. multi-line addresses).
+* Still anchor every field with `anchor_to_text` on a constant label, never with `move_first`/`move_last` alone.
+"""
+
+_IMAGE_CROP_PROMPT = """
+---
+
+**CROPPED IMAGES (OVERRIDES THE EXAMPLE)**
+
+The images are cropped to the text: a dashed gray line marks where part of the page was cut out. That part was either empty, or held **rows of text you cannot see** (unrelated to the schema), yet your plan runs on the full page.
+* Words on either side of a dashed line can be further apart, with hidden words between them, on the real page.
+* Do not rely on counts or positions a cut can change: no `occurrence` other than 0, no `move_first`/`move_last`, and no `move_next`/`move_previous`/`move_down`/`move_up` across a dashed line. Anchor to a label next to the value instead.
+"""
+
+_BUNDLE_PROMPT = """
+---
+
+**BUNDLED REQUESTS (SEVERAL LABELS AT ONCE)**
+
+This request contains **several independent tasks**. Each task starts with a `LABEL "<name>"` header, followed by its own extraction schema and its own samples. Samples only belong to the label whose header precedes them.
+
+Generate one heuristic per label, exactly as you would for a single task, and wrap them in an object keyed by label name:
+{
+  "<label_1>": {"schema_field_1": [command_list], ...},
+  "<label_2>": {"schema_field_1": [command_list], ...}
+}
+"""
+
+def get_bundle_system_prompt(image_mode: bool, cropped: bool = False) -> str:
+    return f"{get_system_prompt(image_mode, cropped)}\n{_BUNDLE_PROMPT}"
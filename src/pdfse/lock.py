@@ -0,0 +1,101 @@
+import asyncio
+import hashlib
+import os
+import time
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class FileLock:
+    """
+    Advisory inter-process lock backed by a lock file.
+
+    The OS releases the lock when its holder dies, so a crashed process
+    never leaves a stale lock behind.
+    """
+    def __init__(self, path: Path, poll_interval: float = 0.1):
+        self.path = path
+        self.poll_interval = poll_interval
+        self._fd: int | None = None
+
+    def _try_lock(self, fd: int) -> bool:
+        try:
+            if fcntl:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            return False
+
+    def try_acquire(self) -> bool:
+        if self._fd is not None:
+            raise RuntimeError(f"Lock already held: {self.path}")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        if self._try_lock(fd):
+            self._fd = fd
+            return True
+        os.close(fd)
+        return False
+
+    def acquire(self, timeout: float | None = None) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.try_acquire():
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(self.poll_interval)
+        return True
+
+    async def acquire_async(self, timeout: float | None = None) -> bool:
+        """
+        Like acquire(), but polls without blocking the event loop or a worker thread.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.try_acquire():
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(self.poll_interval)
+        return True
+
+    def release(self):
+        if self._fd is None:
+            return
+        try:
+            if fcntl:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            else:
+                msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+
+    @property
+    def locked(self) -> bool:
+        return self._fd is not None
+
+    def __enter__(self) -> "FileLock":
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+def lock_dir_for(store_path: Path) -> Path:
+    return store_path.with_name(store_path.name + ".locks")
+
+
+def heuristic_lock(store_path: Path, label: str, fields: set[str]) -> FileLock:
+    """
+    Lock guarding the generation of `fields` for `label` against the store at `store_path`.
+    """
+    key = "\x00".join([label, *sorted(fields)])
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+    safe_label = "".join(c if c.isalnum() or c in "-_" else "_" for c in label)[:64]
+    return FileLock(lock_dir_for(store_path) / f"{safe_label}-{digest}.lock")
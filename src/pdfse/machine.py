@@ -1,33 +1,85 @@
+import time
+from dataclasses import dataclass
 from typing import Any, Callable
 from pdfse.wordspace import WordSpace
+from pdfse.tracing import Tracer
+
+
+@dataclass
+class ExecutionConfig:
+    max_loop_iterations: int = 100
+    # Time budgets in seconds, checked between commands and loop iterations
+    document_timeout: float | None = None
+    field_timeout: float | None = None
+
+
+class ExecutionTimeout(Exception):
+    pass
+
+
+# WordSpace methods a heuristic may call
+COMMANDS = (
+    "anchor_to_regex",
+    "anchor_to_text",
+    "anchor_to_nearest",
+    "move_first",
+    "move_right",
+    "move_left",
+    "move_down",
+    "move_up",
+    "move_next",
+    "move_previous",
+    "move_to_sentence_begin",
+    "move_to_sentence_end",
+    "collect",
+    "collect_trailing_sentence",
+    "collect_leading_sentence",
+    "collect_whole_sentence",
+    "clear_text_buffer",
+    "move_last",
+)
+CHECKS = (
+    "check_current_word_matches_regex",
+)
+
+
+_execution_config = ExecutionConfig()
+
+def configure_execution(config: ExecutionConfig) -> ExecutionConfig:
+    global _execution_config
+    _execution_config = config
+    return config
+
+def get_execution_config() -> ExecutionConfig:
+    return _execution_config
+
 
 class HeuristicMachine:
-    def __init__(self, wordspace: WordSpace):
+    def __init__(self, wordspace: WordSpace, config: ExecutionConfig | None = None):
         self.wordspace = wordspace
-        self.methods: dict[str, Callable[..., None]] = {
-            "anchor_to_regex": wordspace.anchor_to_regex,
-            "anchor_to_text": wordspace.anchor_to_text,
-            "anchor_to_nearest": wordspace.anchor_to_nearest,
-            "move_first": wordspace.move_first,
-            "move_right": wordspace.move_right,
-            "move_left": wordspace.move_left,
-            "move_down": wordspace.move_down,
-            "move_up": wordspace.move_up,
-            "move_next": wordspace.move_next,
-            "move_previous": wordspace.move_previous,
-            "move_to_sentence_begin": wordspace.move_to_sentence_begin,
-            "move_to_sentence_end": wordspace.move_to_sentence_end,
-            "collect": wordspace.collect,
-            "collect_trailing_sentence": wordspace.collect_trailing_sentence,
-            "collect_leading_sentence": wordspace.collect_leading_sentence,
-            "collect_whole_sentence": wordspace.collect_whole_sentence,
-            "clear_text_buffer": wordspace.clear_text_buffer,
-            "move_last": wordspace.move_last,
-        }
-        self.checks: dict[str, Callable[..., bool]] = {
-            "check_current_word_matches_regex": self.wordspace.check_current_word_matches_regex,
-        }
-
+        self.config = config or get_execution_config()
+        # Loops exited early because an iteration changed nothing
+        self.stalled_loops = 0
+        self.methods: dict[str, Callable[..., None]] = {name: getattr(wordspace, name) for name in COMMANDS}
+        self.checks: dict[str, Callable[..., bool]] = {name: getattr(wordspace, name) for name in CHECKS}
+        self.tracer: Tracer | None = None
+        self.label: str = ""
+        # Fields of the last run cut short by a time budget
+        self.timed_out: list[str] = []
+        self._deadline: float | None = None
+
+
+    def trace(self, tracer: Tracer, label: str):
+        """
+        Report timings, loop iterations and swallowed exceptions to `tracer`.
+        """
+        self.tracer = tracer
+        self.label = label
+
+
+    def _check_deadline(self):
+        if self._deadline is not None and time.perf_counter() > self._deadline:
+            raise ExecutionTimeout("time budget exceeded")
 
     def _check_condition(self, condition: dict[str, Any]) -> bool:
         check_name = condition.get("name")
@@ -41,7 +93,9 @@ class HeuristicMachine:
         try:
             result = check_func(**check_args)
             return result == expected_result
-        except Exception:
+        except Exception as e:
+            if self.tracer:
+                self.tracer.exception(self.label, check_name, e)
             return False
 
     def _execute_command(self, command: dict[str, Any]):
@@ -55,10 +109,19 @@ class HeuristicMachine:
                 return
 
             cmd_func = self.methods[cmd_name]
+            if not self.tracer:
+                try:
+                    cmd_func(**cmd_args)
+                except Exception:
+                    return
+                return
+
+            start = time.perf_counter()
             try:
                 cmd_func(**cmd_args)
-            except Exception:
-                return
+            except Exception as e:
+                self.tracer.exception(self.label, cmd_name, e)
+            self.tracer.command(self.label, cmd_name, start, time.perf_counter() - start, self.wordspace.cursor)
 
         elif cmd_type == "loop":
             condition = command.get("condition")
@@ -66,11 +129,22 @@ class HeuristicMachine:
             if not condition or not body:
                 return
 
-            max_iterations = 100
+            max_iterations = self.config.max_loop_iterations
             count = 0
+            stalled = False
             while self._check_condition(condition) and count < max_iterations:
+                self._check_deadline()
+                state = (self.wordspace.cursor, self.wordspace.text)
                 self._execute_command_list(body)
                 count += 1
+                # Execution is deterministic: an iteration that moved neither
+                # the cursor nor the buffer would repeat itself until the cap
+                if (self.wordspace.cursor, self.wordspace.text) == state:
+                    stalled = True
+                    self.stalled_loops += 1
+                    break
+            if self.tracer:
+                self.tracer.loop(self.label, count, stalled)
 
         elif cmd_type == "if":
             condition = command.get("condition")
@@ -90,17 +164,33 @@ class HeuristicMachine:
             return
         for command in commands:
             if isinstance(command, dict):
+                self._check_deadline()
                 self._execute_command(command)
 
-    def run(self, heuristic: dict[str, list[dict[str, Any]]]) -> dict[str, str | None]:
-        extracted_schema: dict[str, str | None] = {}
+    def run(self, heuristic: dict[str, list[dict[str, Any]]]) -> dict[str, Any]:
+        """
+        Extract every field of `heuristic`. Fields cut short by the document
+        or field time budget are None and listed in `self.timed_out`.
+        """
+        extracted_schema: dict[str, Any] = {}
+        timed_out: list[str] = []
+        self.timed_out = timed_out
 
         if not isinstance(heuristic, dict):
             return extracted_schema
 
+        document_timeout = self.config.document_timeout
+        field_timeout = self.config.field_timeout
+        document_deadline = time.perf_counter() + document_timeout if document_timeout is not None else None
+
         for field, commands in heuristic.items():
             self.wordspace.reset_cursor()
             self.wordspace.clear_text_buffer()
+            start = time.perf_counter()
+            self._deadline = document_deadline
+            if field_timeout is not None:
+                field_deadline = start + field_timeout
+                self._deadline = field_deadline if document_deadline is None else min(field_deadline, document_deadline)
 
             try:
                 self._execute_command_list(commands)
@@ -111,7 +201,19 @@ class HeuristicMachine:
                 else:
                     extracted_schema[field] = extracted_text.strip()
 
-            except Exception:
+            except ExecutionTimeout as e:
+                extracted_schema[field] = None
+                timed_out.append(field)
+                if self.tracer:
+                    self.tracer.exception(self.label, field, e)
+
+            except Exception as e:
                 extracted_schema[field] = None
+                if self.tracer:
+                    self.tracer.exception(self.label, field, e)
+
+            if self.tracer:
+                self.tracer.field(self.label, field, start, time.perf_counter() - start)
 
+        self._deadline = None
         return extracted_schema
@@ -0,0 +1,209 @@
+import asyncio
+import math
+import sys
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Iterator, TypeVar
+from .pdf import RENDER_DPI
+from .scheduler import MemoryBudget
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+T = TypeVar("T")
+
+# Rough peak of parsing one PDF into a WordSpace, per byte of the PDF
+# (MuPDF's page tree plus the word tuples and Words), and its floor
+PARSE_BYTES_PER_PDF_BYTE = 4
+PARSE_MIN_BYTES = 1024 * 1024
+
+
+def render_bytes(width: float, height: float, dpi: int = RENDER_DPI) -> int:
+    """
+    Peak bytes of rendering a page of `width` x `height` points: the RGB
+    pixmap, plus its PNG encoding (assumed to compress to at most half).
+    """
+    zoom = dpi / 72
+    # Rounded first, so float noise does not add a row or column
+    pixmap = math.ceil(round(width * zoom, 6)) * math.ceil(round(height * zoom, 6)) * 3
+    return pixmap + pixmap // 2
+
+
+def parse_bytes(pdf_size: int) -> int:
+    return max(PARSE_MIN_BYTES, pdf_size * PARSE_BYTES_PER_PDF_BYTE)
+
+
+def parse_bytes_of(pdf_path: Path) -> int:
+    """
+    parse_bytes of a PDF on disk (the floor if it cannot be stat'ed).
+    """
+    try:
+        return parse_bytes(pdf_path.stat().st_size)
+    except OSError:
+        return PARSE_MIN_BYTES
+
+
+class GlobalMemoryBudget:
+    """
+    One memory budget shared by every render and parse of the process,
+    whatever task runs them. The underlying MemoryBudget is made for the
+    running event loop, so the budget survives across asyncio.run calls.
+    """
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._budget: MemoryBudget | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def budget(self) -> MemoryBudget:
+        loop = asyncio.get_running_loop()
+        if self._budget is None or self._loop is not loop:
+            self._budget = MemoryBudget(self.limit)
+            self._loop = loop
+        return self._budget
+
+    async def run(self, phase: str, size: int, func: Callable[..., T], *args: Any) -> T:
+        """
+        Run `func(*args)` in a worker thread once `size` bytes fit in the
+        budget, accounting its memory to `phase`.
+        """
+        async with self.budget().reserve(size):
+            with memory_phase(phase):
+                return await asyncio.to_thread(func, *args)
+
+
+_memory_budget = GlobalMemoryBudget(1024 * 1024 * 1024)
+
+def configure_memory_budget(limit: int) -> GlobalMemoryBudget:
+    global _memory_budget
+    _memory_budget = GlobalMemoryBudget(limit)
+    return _memory_budget
+
+def get_memory_budget() -> GlobalMemoryBudget:
+    return _memory_budget
+
+
+def peak_rss() -> int:
+    """
+    Highest resident set size of this process so far, in bytes.
+    """
+    if not resource:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def current_rss() -> int:
+    """
+    Resident set size of this process in bytes, from /proc on Linux (the
+    peak so far elsewhere).
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except (OSError, AttributeError, IndexError, ValueError):
+        return peak_rss()
+
+
+class MemoryMonitor:
+    """
+    Samples the process RSS (and with `trace_python`, the bytes traced by
+    tracemalloc) in a background thread, and records for each phase the
+    highest values seen while at least one call of it was running.
+    Concurrent phases share their samples: the peaks bound what a phase
+    was running alongside, which is what a budget has to cover.
+    """
+    def __init__(self, interval: float = 0.05, trace_python: bool = False):
+        self.interval = interval
+        self.trace_python = trace_python
+        self.peak_rss = 0
+        self.peak_traced = 0
+        self.phases: dict[str, dict[str, int]] = {}
+        self._active: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> "MemoryMonitor":
+        if self.trace_python and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="pdfse-memory", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.sample()
+        if self.trace_python and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        rss = current_rss()
+        traced = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0
+        with self._lock:
+            self.peak_rss = max(self.peak_rss, rss)
+            self.peak_traced = max(self.peak_traced, traced)
+            for name, running in self._active.items():
+                if running:
+                    peaks = self.phases[name]
+                    peaks["peak_rss_bytes"] = max(peaks["peak_rss_bytes"], rss)
+                    peaks["peak_traced_bytes"] = max(peaks["peak_traced_bytes"], traced)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        with self._lock:
+            self.phases.setdefault(name, {"calls": 0, "peak_rss_bytes": 0, "peak_traced_bytes": 0})
+            self.phases[name]["calls"] += 1
+            self._active[name] = self._active.get(name, 0) + 1
+        try:
+            # Short calls may fall between two samples
+            self.sample()
+            yield
+        finally:
+            self.sample()
+            with self._lock:
+                self._active[name] -= 1
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {
+                "peak_rss_bytes": self.peak_rss,
+                "peak_traced_bytes": self.peak_traced,
+                "phases": {name: dict(peaks) for name, peaks in sorted(self.phases.items())},
+            }
+
+
+_monitor: MemoryMonitor | None = None
+
+def configure_memory_monitor(enabled: bool = True, interval: float = 0.05, trace_python: bool = False) -> MemoryMonitor | None:
+    global _monitor
+    if _monitor is not None:
+        _monitor.stop()
+    _monitor = MemoryMonitor(interval, trace_python).start() if enabled else None
+    return _monitor
+
+def get_memory_monitor() -> MemoryMonitor | None:
+    return _monitor
+
+@contextmanager
+def memory_phase(name: str) -> Iterator[None]:
+    """
+    Account the memory of the enclosed code to `name`, when monitoring.
+    """
+    if _monitor is None:
+        yield
+        return
+    with _monitor.phase(name):
+        yield
@@ -0,0 +1,190 @@
+import json
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+
+# Upper bounds (seconds) of latency histogram buckets
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+HELP = {
+    "pdfse_documents_total": "Documents in the dataset.",
+    "pdfse_heuristic_cache_entries_total": "Entries whose label heuristic was cached (hit) or had to be generated (miss).",
+    "pdfse_result_cache_fields_total": "Fields served from the result cache (hit) or executed (miss).",
+    "pdfse_failures_total": "Failures by stage.",
+    "pdfse_timed_out_fields_total": "Fields cut short by an execution time budget.",
+    "pdfse_phase_seconds": "Per-document latency of each extraction phase.",
+    "pdfse_llm_requests_total": "LLM requests by outcome.",
+    "pdfse_llm_request_seconds": "LLM request latency.",
+    "pdfse_llm_retries_total": "LLM requests retried after a retryable error.",
+    "pdfse_llm_tokens_total": "LLM tokens reported by the API.",
+    "pdfse_run_seconds": "Wall time of the extraction run.",
+    "pdfse_documents_per_second": "Documents extracted per second of wall time.",
+    "pdfse_peak_rss_bytes": "Peak resident set size of the process.",
+    "pdfse_phase_peak_rss_bytes": "Peak resident set size seen while a phase was running.",
+    "pdfse_phase_peak_traced_bytes": "Peak Python allocations (tracemalloc) seen while a phase was running.",
+}
+
+
+@dataclass
+class Histogram:
+    buckets: tuple[float, ...] = DEFAULT_BUCKETS
+    # One count per bucket, plus the +Inf bucket
+    counts: list[int] = field(default_factory=list)
+    count: int = 0
+    sum: float = 0.0
+    max: float = 0.0
+
+    def __post_init__(self):
+        if not self.counts:
+            self.counts = [0] * (len(self.buckets) + 1)
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                return
+        self.counts[-1] += 1
+
+    def quantile(self, q: float) -> float:
+        """
+        Upper bound of the bucket holding the q-quantile (the max for +Inf).
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return min(self.buckets[i], self.max) if i < len(self.buckets) else self.max
+        return self.max
+
+    def as_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "mean": round(self.sum / self.count, 6) if self.count else 0.0,
+            "max": round(self.max, 6),
+            "p50": round(self.quantile(0.5), 6),
+            "p95": round(self.quantile(0.95), 6),
+            "p99": round(self.quantile(0.99), 6),
+        }
+
+
+Labels = tuple[tuple[str, str], ...]
+
+
+def _series(name: str, labels: Labels, extra: str = "") -> str:
+    pairs = [f'{key}="{value}"' for key, value in labels]
+    if extra:
+        pairs.append(extra)
+    return f"{name}{{{','.join(pairs)}}}" if pairs else name
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class RunMetrics:
+    """
+    Counters, gauges and histograms of one run, exported as a JSON summary
+    or in the Prometheus text format. Safe to share between threads.
+    """
+    def __init__(self):
+        self.counters: dict[str, dict[Labels, float]] = {}
+        self.gauges: dict[str, dict[Labels, float]] = {}
+        self.histograms: dict[str, dict[Labels, Histogram]] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1, **labels: str):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels: str):
+        with self._lock:
+            self.gauges.setdefault(name, {})[tuple(sorted(labels.items()))] = value
+
+    def observe(self, name: str, value: float, **labels: str):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self.histograms.setdefault(name, {})
+            if key not in series:
+                series[key] = Histogram()
+            series[key].observe(value)
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {
+                "counters": {
+                    _series(name, labels): value
+                    for name, series in self.counters.items()
+                    for labels, value in series.items()
+                },
+                "gauges": {
+                    _series(name, labels): value
+                    for name, series in self.gauges.items()
+                    for labels, value in series.items()
+                },
+                "histograms": {
+                    _series(name, labels): histogram.as_dict()
+                    for name, series in self.histograms.items()
+                    for labels, histogram in series.items()
+                },
+            }
+
+    def prometheus_text(self) -> str:
+        lines = []
+        with self._lock:
+            for kind, metrics in (("counter", self.counters), ("gauge", self.gauges)):
+                for name, series in sorted(metrics.items()):
+                    if name in HELP:
+                        lines.append(f"# HELP {name} {HELP[name]}")
+                    lines.append(f"# TYPE {name} {kind}")
+                    for labels, value in sorted(series.items()):
+                        lines.append(f"{_series(name, labels)} {_number(value)}")
+            for name, series in sorted(self.histograms.items()):
+                if name in HELP:
+                    lines.append(f"# HELP {name} {HELP[name]}")
+                lines.append(f"# TYPE {name} histogram")
+                for labels, histogram in sorted(series.items()):
+                    cumulative = 0
+                    for bound, bucket_count in zip((*histogram.buckets, "+Inf"), histogram.counts):
+                        cumulative += bucket_count
+                        le = bound if bound == "+Inf" else _number(bound)
+                        bucket = _series(f"{name}_bucket", labels, f'le="{le}"')
+                        lines.append(f"{bucket} {cumulative}")
+                    lines.append(f"{_series(f'{name}_sum', labels)} {_number(histogram.sum)}")
+                    lines.append(f"{_series(f'{name}_count', labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, json_path: Path | None = None, prometheus_path: Path | None = None):
+        if json_path:
+            with open(json_path, "w") as f:
+                json.dump(self.as_dict(), f, indent=2, ensure_ascii=False)
+        if prometheus_path:
+            with open(prometheus_path, "w") as f:
+                f.write(self.prometheus_text())
+
+
+_metrics: RunMetrics | None = None
+
+def configure_metrics(enabled: bool = True) -> RunMetrics | None:
+    global _metrics
+    _metrics = RunMetrics() if enabled else None
+    return _metrics
+
+def get_metrics() -> RunMetrics | None:
+    return _metrics
+
+def inc(name: str, value: float = 1, **labels: str):
+    if _metrics:
+        _metrics.inc(name, value, **labels)
+
+def observe(name: str, value: float, **labels: str):
+    if _metrics:
+        _metrics.observe(name, value, **labels)
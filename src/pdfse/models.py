@@ -1,6 +1,7 @@
 from pathlib import Path
-from pydantic import BaseModel
+from pydantic import BaseModel, field_validator
 from dataclasses import dataclass
+from .variants import VARIANT_SEPARATOR
 
 Heuristics = dict[str, dict[str, list[dict]]]
 ExtractionSchema = dict[str, str]
@@ -10,6 +11,15 @@ class DatasetEntry(BaseModel):
     pdf_path: Path
     extraction_schema: ExtractionSchema
 
+    @field_validator("extraction_schema")
+    @classmethod
+    def _no_reserved_fields(cls, schema: ExtractionSchema) -> ExtractionSchema:
+        # Stored heuristics use the separator for layout variants
+        reserved = [name for name in schema if VARIANT_SEPARATOR in name]
+        if reserved:
+            raise ValueError(f"field names cannot contain '{VARIANT_SEPARATOR}': {', '.join(reserved)}")
+        return schema
+
 class Entry(DatasetEntry):
     id: int
 
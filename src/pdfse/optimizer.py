@@ -0,0 +1,205 @@
+import copy
+import inspect
+from typing import Any
+from pdfse.wordspace import WordSpace
+from pdfse.machine import CHECKS, COMMANDS, ExecutionConfig, HeuristicMachine
+from pdfse.variants import VARIANT_SEPARATOR
+
+# Commands that only move the cursor
+CURSOR_COMMANDS = {
+    "anchor_to_regex", "anchor_to_text", "anchor_to_nearest",
+    "move_first", "move_last", "move_right", "move_left", "move_down", "move_up",
+    "move_next", "move_previous", "move_to_sentence_begin", "move_to_sentence_end",
+}
+# Cursor commands whose target does not depend on where the cursor was.
+# Anchors are not among them: one that matches nothing leaves the cursor
+# alone, so the moves before it are its fallback.
+ABSOLUTE_COMMANDS = {"move_first", "move_last"}
+# move_next(a) then move_next(b) lands where move_next(a + b + 1) does.
+# Spatial moves don't chain that way: the second one searches from the
+# word the first one reached, not along the first one's list.
+MERGEABLE_JUMPS = {"move_next", "move_previous"}
+
+_SIGNATURES = {name: inspect.signature(getattr(WordSpace, name)) for name in (*COMMANDS, *CHECKS)}
+
+
+def count_commands(commands: Any) -> int:
+    if not isinstance(commands, list):
+        return 0
+    total = 0
+    for command in commands:
+        if not isinstance(command, dict):
+            continue
+        total += 1
+        for branch in ("body", "then", "else"):
+            total += count_commands(command.get(branch))
+    return total
+
+
+def _valid_call(name: Any, args: Any, allowed: tuple[str, ...]) -> bool:
+    if name not in allowed or not isinstance(args, dict):
+        return False
+    try:
+        _SIGNATURES[name].bind(None, **args)
+    except TypeError:
+        return False
+    return True
+
+
+def _is_command(command: dict, names: set[str]) -> bool:
+    return command.get("type") == "command" and command.get("name") in names
+
+
+def _jump(command: dict) -> int | None:
+    jump = command.get("args", {}).get("jump", 0)
+    return jump if isinstance(jump, int) and not isinstance(jump, bool) and jump >= 0 else None
+
+
+def _clean(commands: Any) -> list[dict]:
+    """
+    Drop what the machine would skip or fail on without side effects:
+    unknown commands, bad arguments, malformed or empty loops and ifs.
+    """
+    cleaned: list[dict] = []
+    if not isinstance(commands, list):
+        return cleaned
+    for command in commands:
+        if not isinstance(command, dict):
+            continue
+        kind = command.get("type")
+        if kind == "command":
+            if _valid_call(command.get("name"), command.get("args", {}), COMMANDS):
+                cleaned.append(command)
+        elif kind in ("loop", "if"):
+            condition = command.get("condition")
+            if not condition or (kind == "loop" and not command.get("body")) or (kind == "if" and not command.get("then")):
+                continue  # skipped by the machine
+            if not isinstance(condition, dict):
+                cleaned.append(command)  # fails the whole field; left for verification
+                continue
+            valid = _valid_call(condition.get("name"), condition.get("args", {}), CHECKS)
+            if kind == "loop":
+                body = _clean(command.get("body"))
+                if valid and body:
+                    cleaned.append({**command, "body": body})
+                continue
+            then_branch = _clean(command.get("then"))
+            else_branch = _clean(command.get("else"))
+            if not valid:
+                # A check that cannot run counts as false
+                cleaned.extend(else_branch)
+            elif then_branch == else_branch:
+                # Checks have no side effects: both outcomes run the same code
+                cleaned.extend(then_branch)
+            elif then_branch:
+                cleaned.append({**command, "then": then_branch, "else": else_branch})
+            elif type(expected := condition.get("check", True)) is bool:
+                # Only the else branch does something: flip the check instead
+                flipped = {**condition, "check": not expected}
+                cleaned.append({**command, "condition": flipped, "then": else_branch, "else": []})
+            else:
+                cleaned.append(command)
+    return cleaned
+
+
+def _branches(command: dict) -> list[list]:
+    return [branch for name in ("body", "then", "else") if isinstance(branch := command.get(name), list)]
+
+
+def _is_clean(command: dict) -> bool:
+    if command.get("type") == "command":
+        return True
+    return isinstance(command.get("condition"), dict) and all(
+        isinstance(c, dict) for branch in _branches(command) for c in branch
+    )
+
+
+def _simplify(commands: list[dict]) -> list[dict]:
+    result: list[dict] = []
+    for command in commands:
+        if not _is_clean(command):
+            result.append(command)
+            continue
+        if command.get("type") == "loop":
+            command = {**command, "body": _simplify(command["body"])}
+        elif command.get("type") == "if":
+            command = {**command, "then": _simplify(command["then"]), "else": _simplify(command.get("else") or [])}
+
+        previous = result[-1] if result else None
+        if previous is not None and _is_command(command, {"clear_text_buffer"}) and _is_command(previous, {"clear_text_buffer"}):
+            continue
+        # Cursor moves immediately replaced by an absolute one
+        if _is_command(command, ABSOLUTE_COMMANDS):
+            while result and _is_command(result[-1], CURSOR_COMMANDS):
+                result.pop()
+            previous = None
+        # Chains of relative jumps in the same direction
+        if (previous is not None and _is_command(command, MERGEABLE_JUMPS)
+                and previous.get("type") == "command" and previous.get("name") == command.get("name")):
+            first, second = _jump(previous), _jump(command)
+            if first is not None and second is not None:
+                result[-1] = {**previous, "args": {**previous.get("args", {}), "jump": first + second + 1}}
+                continue
+        result.append(command)
+    return result
+
+
+def _affects_buffer(command: dict) -> bool:
+    if command.get("type") == "command":
+        return command.get("name") not in CURSOR_COMMANDS
+    if not _is_clean(command):
+        return True
+    return any(_affects_buffer(c) for branch in _branches(command) for c in branch)
+
+
+def optimize_commands(commands: Any) -> list[dict]:
+    """
+    Rewrite a field's plan into a shorter candidate. Some rewrites only hold
+    on typical layouts, so candidates are checked with `verify` before use.
+    """
+    optimized = _simplify(_clean(commands))
+    # The buffer starts empty: clearing it before anything was collected is a no-op
+    while optimized and _is_command(optimized[0], {"clear_text_buffer"}):
+        optimized.pop(0)
+    # Only the buffer is extracted: cursor moves after the last write are dead
+    while optimized and not _affects_buffer(optimized[-1]):
+        optimized.pop()
+    return optimized
+
+
+def _run_field(field: str, commands: list, wordspace: WordSpace, config: ExecutionConfig) -> str | None:
+    return HeuristicMachine(wordspace, config).run({field: commands}).get(field)
+
+
+def verify(field: str, original: list, candidate: list, wordspaces: list[WordSpace], config: ExecutionConfig | None = None) -> bool:
+    config = config or ExecutionConfig()
+    return all(
+        _run_field(field, original, wordspace, config) == _run_field(field, candidate, wordspace, config)
+        for wordspace in wordspaces
+    )
+
+
+def optimize_heuristic(
+    heuristic: dict[str, Any],
+    wordspaces: list[WordSpace],
+    config: ExecutionConfig | None = None
+) -> tuple[dict[str, Any], int, int]:
+    """
+    Replace each field's plan (variants included) by its optimized form
+    when both extract the same values from every sample. Returns the new
+    heuristic and the command counts before and after.
+    """
+    optimized: dict[str, Any] = {}
+    before = after = 0
+    for field, commands in heuristic.items():
+        if field.startswith(VARIANT_SEPARATOR) or not isinstance(commands, list):
+            optimized[field] = commands
+            continue
+        candidate = optimize_commands(copy.deepcopy(commands))
+        if candidate != commands and verify(field, commands, candidate, wordspaces, config):
+            optimized[field] = candidate
+        else:
+            optimized[field] = commands
+        before += count_commands(commands)
+        after += count_commands(optimized[field])
+    return optimized, before, after
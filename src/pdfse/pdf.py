@@ -1,107 +1,206 @@
 import fitz
+from itertools import islice
+from operator import itemgetter
 from pathlib import Path
+from typing import Callable
 from pdfse.wordspace import Word, WordSpace
 
 
-def render_pdf(pdf_path: Path) -> bytes:
-    doc = fitz.open(pdf_path)
-    page = doc[0]
-    dpi = 300
+RENDER_DPI = 300
+
+
+def _to_png(page: fitz.Page, dpi: int = RENDER_DPI) -> bytes:
     zoom = dpi / 72  # 72 is the PDF standard DPI
-    mat = fitz.Matrix(zoom, zoom)
-    pix = page.get_pixmap(matrix=mat)
-    image_bytes = pix.tobytes("png")
-    doc.close()
-    return image_bytes
+    return page.get_pixmap(matrix=fitz.Matrix(zoom, zoom)).tobytes("png")
 
 
-def render_pdf_text(pdf_path: Path) -> bytes:
-    doc = fitz.open(pdf_path)
-    page = doc[0]
+def page_size(pdf_path: Path) -> tuple[float, float]:
+    with fitz.open(pdf_path) as doc:
+        rect = doc[0].rect
+        return rect.width, rect.height
 
-    new_doc = fitz.open()
-    new_page = new_doc.new_page(width=page.rect.width, height=page.rect.height)
 
+def render_pdf(pdf_path: Path) -> bytes:
+    with fitz.open(pdf_path) as doc:
+        return _to_png(doc[0])
+
+
+def _text_spans(page: fitz.Page) -> list[dict]:
     text_dict: dict = page.get_text("dict") # type: ignore
+    spans = []
     for block in text_dict["blocks"]:
         if block["type"] != 0:
             continue  # Skip not text blocks
         for line in block["lines"]:
-            for span in line["spans"]:
-                text = span["text"].strip()
-                if not text:
-                    continue
-
-                font = span.get("font", "helv")
-                size = span["size"]
-                color = span.get("color", 0)
-                x0, _, _, y1 = span["bbox"]
-                insert_point = (x0, y1)
-
-                new_page.insert_text(
-                    insert_point,
-                    text,
-                    fontsize=size,
-                    fontname=font,
-                    color=color,
-                )
-    dpi = 300
-    zoom = dpi / 72  # 72 is the PDF standard DPI
-    mat = fitz.Matrix(zoom, zoom)
-    pix = new_page.get_pixmap(matrix=mat)
-    image_bytes = pix.tobytes("png")
-    doc.close()
-    new_doc.close()
-    return image_bytes
+            spans.extend(span for span in line["spans"] if span["text"].strip())
+    return spans
 
 
-def get_pdf_text_layout(pdf_path: Path) -> str:
-    doc = fitz.open(pdf_path)
-    page = doc[0]
-    text = page.get_text("text", sort=True)
-    doc.close()
-    return text # type: ignore
+def _insert_spans(page: fitz.Page, spans: list[dict], dx: float = 0.0, dy: float = 0.0):
+    for span in spans:
+        font = span.get("font", "helv")
+        size = span["size"]
+        color = span.get("color", 0)
+        x0, _, _, y1 = span["bbox"]
+        insert_point = (x0 + dx, y1 + dy)
 
+        page.insert_text(
+            insert_point,
+            span["text"].strip(),
+            fontsize=size,
+            fontname=font,
+            color=color,
+        )
 
-def generate_marked_image(pdf_path: Path) -> bytes:
+
+def render_pdf_text(pdf_path: Path) -> bytes:
+    with fitz.open(pdf_path) as doc:
+        page = doc[0]
+        width, height = page.rect.width, page.rect.height
+        spans = _text_spans(page)
+    # The source document is closed before the copy is rendered
+
+    with fitz.open() as new_doc:
+        new_page = new_doc.new_page(width=width, height=height)
+        _insert_spans(new_page, spans)
+        return _to_png(new_page)
+
+
+def _bands(boxes: list[tuple[float, float]], min_gap: float) -> list[tuple[float, float]]:
     """
-    Render the PDF with its words surrounded by red rectangles.
+    Merge vertical extents (top, bottom) separated by less than `min_gap`.
+    """
+    bands: list[list[float]] = []
+    for top, bottom in sorted(boxes):
+        if bands and top - bands[-1][1] < min_gap:
+            bands[-1][1] = max(bands[-1][1], bottom)
+        else:
+            bands.append([top, bottom])
+    return [(top, bottom) for top, bottom in bands]
+
+
+def render_pdf_regions(
+    pdf_path: Path,
+    is_anchor: Callable[[str], bool] | None = None,
+    context: float = 96.0,
+    margin: float = 12.0,
+    min_gap: float = 36.0,
+    collapsed_gap: float = 12.0,
+) -> bytes:
     """
-    doc = fitz.open(pdf_path)
-    page = doc[0]
+    Like render_pdf_text, but only the part of the page holding text: the
+    image is cropped to the text's bounding box, and horizontal empty
+    bands taller than `min_gap` are collapsed to a thin separator line.
+    With `is_anchor`, only the text within `context` points above or below
+    the spans it accepts is kept (all of it if none are accepted).
+    """
+    with fitz.open(pdf_path) as doc:
+        spans = _text_spans(doc[0])
+    if not spans:
+        return render_pdf_text(pdf_path)
+
+    if is_anchor:
+        anchors = [span["bbox"] for span in spans if is_anchor(span["text"])]
+        if anchors:
+            spans = [
+                span for span in spans
+                if any(span["bbox"][1] - context <= a[3] and a[1] - context <= span["bbox"][3] for a in anchors)
+            ]
+
+    left = min(span["bbox"][0] for span in spans) - margin
+    right = max(span["bbox"][2] for span in spans) + margin
+    bands = _bands([(span["bbox"][1], span["bbox"][3]) for span in spans], min_gap)
+
+    # Where each band starts on the new page
+    offsets = []
+    y = margin
+    for top, bottom in bands:
+        offsets.append(y - top)
+        y += bottom - top + collapsed_gap
+    height = y - collapsed_gap + margin
+
+    with fitz.open() as new_doc:
+        new_page = new_doc.new_page(width=right - left, height=height)
+        for i, ((top, bottom), dy) in enumerate(zip(bands, offsets)):
+            _insert_spans(new_page, [span for span in spans if top <= span["bbox"][1] <= bottom], -left, dy)
+            if i:
+                # Marks where empty or omitted parts of the page were cut out
+                line_y = top + dy - collapsed_gap / 2
+                new_page.draw_line((0, line_y), (right - left, line_y), color=(0.75, 0.75, 0.75), width=0.5, dashes="[3] 0")
+        return _to_png(new_page)
 
-    words: dict = page.get_text("words") # type: ignore
-    for word in words:
-        x0, y0, x1, y1, *_ = word
-        bbox = fitz.Rect(x0, y0, x1, y1)
-        page.draw_rect(bbox, color=(1, 0, 0), width=0.5)
 
-    dpi = 300
-    zoom = dpi / 72  # 72 is the PDF standard DPI
-    mat = fitz.Matrix(zoom, zoom)
+def get_pdf_text_layout(pdf_path: Path) -> str:
+    with fitz.open(pdf_path) as doc:
+        return doc[0].get_text("text", sort=True) # type: ignore
 
-    pix = page.get_pixmap(matrix=mat)
-    image_bytes = pix.tobytes("png")
 
-    doc.close()
-    return image_bytes
+def generate_marked_image(pdf_path: Path) -> bytes:
+    """
+    Render the PDF with its words surrounded by red rectangles.
+    """
+    with fitz.open(pdf_path) as doc:
+        page = doc[0]
+        words: list = page.get_text("words") # type: ignore
+        for word in words:
+            x0, y0, x1, y1, *_ = word
+            page.draw_rect(fitz.Rect(x0, y0, x1, y1), color=(1, 0, 0), width=0.5)
+        return _to_png(page)
 
 
-def get_pdf_wordspace(pdf_path: Path) -> WordSpace:
+def read_pdf(pdf_path: Path) -> bytes:
     """
-    Create a WordSpace object from a PDF
+    Read a whole PDF sequentially, so MuPDF parses it from memory instead
+    of issuing small random reads against the filesystem.
     """
-    doc = fitz.open(pdf_path)
-    page = doc[0]
+    return pdf_path.read_bytes()
 
-    page_width: int = page.rect.width
-    page_height: int = page.rect.height
 
+def reading_order_words(page_words: list[tuple], tolerance: float = 3) -> list[Word]:
+    """
+    Words in the order of PyMuPDF's get_text("words", sort=True): sorted by
+    bottom then left edge, grouped into lines while their top or bottom edge
+    stays within `tolerance` of the line so far, each line left to right.
+    Same result, without a Rect per word, building the Words as lines close.
+    """
     words: list[Word] = []
-    page_words: dict = page.get_text("words", sort=True) # type: ignore
-    for word in page_words:
-        x0, y0, x1, y1, text, *_ = word
-        words.append(Word(text, (x0, y0, x1, y1)))
+    if not page_words:
+        return words
+    page_words.sort(key=itemgetter(3, 0))
+
+    line = [page_words[0]]
+    lx0, ly0, lx1, ly1 = page_words[0][:4]
+    for word in islice(page_words, 1, None):
+        x0, y0, x1, y1 = word[:4]
+        if abs(y0 - ly0) <= tolerance or abs(y1 - ly1) <= tolerance:
+            line.append(word)
+            # The line grows like a Rect union, where empty boxes do not count
+            if x0 < x1 and y0 < y1:
+                if lx0 < lx1 and ly0 < ly1:
+                    lx0, ly0, lx1, ly1 = min(lx0, x0), min(ly0, y0), max(lx1, x1), max(ly1, y1)
+                else:
+                    lx0, ly0, lx1, ly1 = x0, y0, x1, y1
+        else:
+            line.sort(key=itemgetter(0))
+            words.extend([Word(w[4], (w[0], w[1], w[2], w[3])) for w in line])
+            line = [word]
+            lx0, ly0, lx1, ly1 = x0, y0, x1, y1
+    line.sort(key=itemgetter(0))
+    words.extend([Word(w[4], (w[0], w[1], w[2], w[3])) for w in line])
+    return words
+
+
+def get_pdf_wordspace(pdf: Path | bytes) -> WordSpace:
+    """
+    Create a WordSpace object from a PDF, given its path or its contents
+    """
+    with fitz.open(stream=pdf, filetype="pdf") if isinstance(pdf, bytes) else fitz.open(pdf) as doc:
+        page = doc[0]
+
+        page_width: int = page.rect.width
+        page_height: int = page.rect.height
+
+        # Unsorted words, put in reading order without PyMuPDF's Rect-based sort
+        words = reading_order_words(page.get_text("words")) # type: ignore
 
-    doc.close()
     return WordSpace(words, page_width, page_height)
@@ -0,0 +1,128 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Iterable
+
+
+@dataclass
+class PipelineConfig:
+    # Workers per stage
+    readers: int = 4
+    parsers: int = 2
+    executors: int = 2
+    # Capacity of the queue in front of each stage
+    queue_size: int = 16
+    # Bytes of PDFs read ahead of the parse stage
+    prefetch_bytes: int = 256 * 1024 * 1024
+    # Documents executed together (1 runs them one by one)
+    batch_size: int = 1
+
+
+_pipeline_config = PipelineConfig()
+
+def configure_pipeline(config: PipelineConfig) -> PipelineConfig:
+    global _pipeline_config
+    _pipeline_config = config
+    return config
+
+def get_pipeline_config() -> PipelineConfig:
+    return _pipeline_config
+
+
+@dataclass
+class Stage:
+    name: str
+    func: Callable[[Any], Awaitable[Any]]
+    workers: int = 1
+    # Above 1, `func` takes and returns lists of up to this many items,
+    # made of whatever is already queued (a batch never waits to fill up)
+    batch_size: int = 1
+
+
+@dataclass
+class StageStats:
+    items: int = 0
+    # Seconds summed over the stage's workers: processing items, waiting
+    # for the previous stage, and waiting for room in the next queue
+    busy: float = 0.0
+    waiting: float = 0.0
+    blocked: float = 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "items": self.items,
+            "busy_s": round(self.busy, 3),
+            "waiting_s": round(self.waiting, 3),
+            "blocked_s": round(self.blocked, 3),
+        }
+
+
+_DONE = object()
+
+
+async def run_pipeline(source: Iterable, stages: list[Stage], queue_size: int) -> dict[str, StageStats]:
+    """
+    Push every item of `source` through `stages` in order. Stages are
+    connected by queues of `queue_size` items, so a slow stage holds back
+    the ones before it instead of letting work pile up in memory.
+    Returns where each stage spent its time.
+    """
+    # Sentinels are sent once per worker, so each stage needs at least one
+    stages = [Stage(stage.name, stage.func, max(1, stage.workers), stage.batch_size) for stage in stages]
+    queues: list[asyncio.Queue] = [asyncio.Queue(maxsize=queue_size) for _ in stages]
+    stats = {stage.name: StageStats() for stage in stages}
+
+    async def feed():
+        for item in source:
+            await queues[0].put(item)
+        for _ in range(stages[0].workers):
+            await queues[0].put(_DONE)
+
+    async def work(index: int):
+        stage = stages[index]
+        inbox = queues[index]
+        outbox = queues[index + 1] if index + 1 < len(stages) else None
+        stage_stats = stats[stage.name]
+        finished = False
+        while not finished:
+            start = time.perf_counter()
+            item = await inbox.get()
+            got = time.perf_counter()
+            stage_stats.waiting += got - start
+            if item is _DONE:
+                return
+            if stage.batch_size > 1:
+                batch = [item]
+                while len(batch) < stage.batch_size and not inbox.empty():
+                    item = inbox.get_nowait()
+                    if item is _DONE:
+                        finished = True
+                        break
+                    batch.append(item)
+                results = await stage.func(batch)
+            else:
+                results = [await stage.func(item)]
+            done = time.perf_counter()
+            stage_stats.busy += done - got
+            stage_stats.items += len(results)
+            if outbox is not None:
+                for result in results:
+                    await outbox.put(result)
+                stage_stats.blocked += time.perf_counter() - done
+
+    async def run_stage(index: int):
+        await asyncio.gather(*(work(index) for _ in range(stages[index].workers)))
+        if index + 1 < len(stages):
+            for _ in range(stages[index + 1].workers):
+                await queues[index + 1].put(_DONE)
+
+    tasks = [asyncio.create_task(feed())]
+    tasks += [asyncio.create_task(run_stage(i)) for i in range(len(stages))]
+    try:
+        await asyncio.gather(*tasks)
+        return stats
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
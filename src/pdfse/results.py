@@ -0,0 +1,146 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Iterable
+from .variants import VARIANT_SEPARATOR
+
+# Bump when a WordSpace or HeuristicMachine change alters what a heuristic
+# extracts, so results computed by older code are not served
+RESULT_CACHE_VERSION = 1
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def field_heuristic_hash(label_heuristic: dict[str, Any], field: str, max_loop_iterations: int) -> str:
+    """
+    Hash of everything that decides how `field` is extracted: its generic
+    plan, its layout variants, the loop cap and the signatures of every
+    variant of the label, as dispatch picks among all of them (a new
+    variant without a plan for `field` can send it back to its generic plan).
+    """
+    signatures = {}
+    variants = {}
+    for name, value in label_heuristic.items():
+        if name.startswith(VARIANT_SEPARATOR):
+            signatures[name[1:]] = value
+        elif name.startswith(f"{field}{VARIANT_SEPARATOR}"):
+            variants[name[len(field) + 1:]] = value
+    payload = [RESULT_CACHE_VERSION, max_loop_iterations, label_heuristic.get(field), variants, signatures]
+    return hashlib.sha1(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def results_path_for(store_path: Path) -> Path:
+    return store_path.with_name(f"{store_path.stem}.results.db")
+
+
+class ResultCache:
+    """
+    Extracted values keyed by (PDF content hash, label, field, field
+    heuristic hash), so a rerun only executes the fields whose heuristic
+    changed or that were added since. Stale rows are never served, as a
+    regenerated heuristic hashes differently.
+    """
+    def __init__(self, path: Path):
+        self.path = path
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30.0, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS results (
+                    pdf_hash TEXT NOT NULL,
+                    label TEXT NOT NULL,
+                    field TEXT NOT NULL,
+                    heuristic_hash TEXT NOT NULL,
+                    value TEXT,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (pdf_hash, label, field)
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS results_label ON results (label)")
+            self._conn = conn
+        return self._conn
+
+    def get(self, pdf_hash: str, label: str, field_hashes: dict[str, str]) -> dict[str, str | None]:
+        """
+        Cached values of the fields whose heuristic hash still matches.
+        """
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT field, heuristic_hash, value FROM results WHERE pdf_hash = ? AND label = ?",
+                (pdf_hash, label)
+            ).fetchall()
+        return {
+            field: value
+            for field, heuristic_hash, value in rows
+            if field_hashes.get(field) == heuristic_hash
+        }
+
+    def put(self, pdf_hash: str, label: str, field_hashes: dict[str, str], values: dict[str, str | None]):
+        now = time.time()
+        rows = [
+            (pdf_hash, label, field, field_hashes[field], value, now)
+            for field, value in values.items()
+            if field in field_hashes
+        ]
+        if not rows:
+            return
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.executemany(
+                    """
+                    INSERT INTO results (pdf_hash, label, field, heuristic_hash, value, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (pdf_hash, label, field) DO UPDATE SET
+                        heuristic_hash = excluded.heuristic_hash,
+                        value = excluded.value,
+                        updated_at = excluded.updated_at
+                    """,
+                    rows
+                )
+
+    def delete(self, labels: Iterable[str]) -> int:
+        labels = list(labels)
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                cursor = conn.executemany("DELETE FROM results WHERE label = ?", [(label,) for label in labels])
+        return cursor.rowcount
+
+    def clear(self):
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute("DELETE FROM results")
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+_result_cache: ResultCache | None = None
+
+def configure_result_cache(path: Path | None) -> ResultCache | None:
+    global _result_cache
+    if _result_cache is not None:
+        _result_cache.close()
+    _result_cache = ResultCache(path) if path else None
+    return _result_cache
+
+def get_result_cache() -> ResultCache | None:
+    return _result_cache
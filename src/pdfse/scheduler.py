@@ -0,0 +1,225 @@
+import asyncio
+import random
+import time
+import openai
+import rich
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Iterator, TypeVar
+from . import metrics
+
+T = TypeVar("T")
+
+# Rough size of a render when the page size is unknown.
+# A letter page rasterized at 300 DPI is ~25MB of RGB pixels.
+IMAGE_SAMPLE_BYTES = 25 * 1024 * 1024
+# Rough token cost of a high-detail image input
+IMAGE_SAMPLE_TOKENS = 1500
+
+
+@dataclass
+class SchedulerConfig:
+    max_in_flight: int = 4
+    requests_per_minute: int | None = None
+    tokens_per_minute: int | None = None
+    max_retries: int = 5
+    backoff_base: float = 1.0
+    backoff_max: float = 60.0
+    request_timeout: float = 300.0
+    label_timeout: float = 900.0
+    # Larger schemas are split across concurrent requests
+    fields_per_request: int = 15
+    # Labels with at most bundle_max_fields missing fields share requests
+    bundle_small_labels: bool = False
+    bundle_max_fields: int = 3
+    bundle_token_budget: int = 12000
+    bundle_max_labels: int = 8
+    # Also generate a straight-line plan per sample layout
+    layout_variants: bool = False
+
+
+def is_retryable(exc: BaseException) -> bool:
+    if isinstance(exc, (asyncio.TimeoutError, openai.APIConnectionError, openai.RateLimitError)):
+        return True
+    if isinstance(exc, openai.APIStatusError):
+        return exc.status_code in (408, 409) or exc.status_code >= 500
+    return False
+
+
+def _retry_after(exc: BaseException) -> float | None:
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class RateLimiter:
+    """
+    Sliding one-minute window over requests and tokens.
+    """
+    def __init__(self, requests_per_minute: int | None, tokens_per_minute: int | None, window: float = 60.0):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.window = window
+        self._events: deque[tuple[float, int]] = deque()
+        self._used_tokens = 0
+        self._lock = asyncio.Lock()
+
+    def _prune(self, now: float):
+        while self._events and now - self._events[0][0] >= self.window:
+            _, tokens = self._events.popleft()
+            self._used_tokens -= tokens
+
+    def _fits(self, tokens: int) -> bool:
+        if not self._events:
+            return True  # An oversized request still goes through on an idle window
+        if self.requests_per_minute is not None and len(self._events) + 1 > self.requests_per_minute:
+            return False
+        if self.tokens_per_minute is not None and self._used_tokens + tokens > self.tokens_per_minute:
+            return False
+        return True
+
+    async def acquire(self, tokens: int = 0):
+        if self.requests_per_minute is None and self.tokens_per_minute is None:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._prune(now)
+                if self._fits(tokens):
+                    self._events.append((now, tokens))
+                    self._used_tokens += tokens
+                    return
+                await asyncio.sleep(self._events[0][0] + self.window - now)
+
+
+class MemoryBudget:
+    """
+    Bounds the bytes of sample payloads held at once. A reservation larger
+    than the whole budget is admitted when nothing else is held.
+    """
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.used = 0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self, size: int):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.used == 0 or self.used + size <= self.limit)
+            self.used += size
+
+    async def release(self, size: int):
+        async with self._condition:
+            self.used -= size
+            self._condition.notify_all()
+
+    def reserve(self, size: int) -> "_Reservation":
+        return _Reservation(self, size)
+
+
+class _Reservation:
+    def __init__(self, budget: MemoryBudget, size: int):
+        self.budget = budget
+        self.size = size
+
+    async def __aenter__(self):
+        await self.budget.acquire(self.size)
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.budget.release(self.size)
+
+
+class LLMScheduler:
+    """
+    Admission control for LLM requests: bounded concurrency, request/token
+    rate limits, and retries with exponential backoff and full jitter.
+    Sample renders and parses are bounded by memory.GlobalMemoryBudget.
+    """
+    def __init__(self, config: SchedulerConfig | None = None):
+        self.config = config or SchedulerConfig()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        # label -> (monotonic deadline, blocks sharing it)
+        self._deadlines: dict[str, tuple[float, int]] = {}
+
+    def _ensure_loop(self):
+        # asyncio primitives are bound to the loop that first uses them
+        loop = asyncio.get_running_loop()
+        if loop is self._loop:
+            return
+        self._loop = loop
+        self._slots = asyncio.Semaphore(self.config.max_in_flight)
+        self._limiter = RateLimiter(self.config.requests_per_minute, self.config.tokens_per_minute)
+
+    @contextmanager
+    def label_deadline(self, label: str) -> Iterator[None]:
+        """
+        Give every request submitted for `label` inside the block, retries
+        included, one shared label_timeout deadline. Concurrent blocks for
+        the same label share the deadline of the first one.
+        """
+        deadline, holders = self._deadlines.get(label, (time.monotonic() + self.config.label_timeout, 0))
+        self._deadlines[label] = (deadline, holders + 1)
+        try:
+            yield
+        finally:
+            deadline, holders = self._deadlines[label]
+            if holders == 1:
+                del self._deadlines[label]
+            else:
+                self._deadlines[label] = (deadline, holders - 1)
+
+    def backoff_delay(self, attempt: int, exc: BaseException | None = None) -> float:
+        ceiling = min(self.config.backoff_max, self.config.backoff_base * 2 ** attempt)
+        delay = random.uniform(0, ceiling)
+        retry_after = _retry_after(exc) if exc else None
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    async def _attempts(self, label: str, request: Callable[[], Awaitable[T]], tokens: int) -> T:
+        attempt = 0
+        while True:
+            await self._limiter.acquire(tokens)
+            try:
+                async with self._slots:
+                    return await asyncio.wait_for(request(), self.config.request_timeout)
+            except Exception as e:
+                if not is_retryable(e) or attempt >= self.config.max_retries:
+                    raise
+                delay = self.backoff_delay(attempt, e)
+                attempt += 1
+                metrics.inc("pdfse_llm_retries_total")
+                rich.print(f"[yellow]! Label '{label}': {type(e).__name__}, retrying in {delay:.1f}s ({attempt}/{self.config.max_retries})")
+                await asyncio.sleep(delay)
+
+    async def submit(self, label: str, request: Callable[[], Awaitable[T]], tokens: int = 0) -> T:
+        """
+        Run `request` (a coroutine factory, called once per attempt) under the
+        scheduler's limits, within what is left of the label's deadline (see
+        label_deadline), or label_timeout outside of one.
+        """
+        self._ensure_loop()
+        timeout = self.config.label_timeout
+        if label in self._deadlines:
+            timeout = max(0.0, self._deadlines[label][0] - time.monotonic())
+        return await asyncio.wait_for(self._attempts(label, request, tokens), timeout)
+
+
+_scheduler: LLMScheduler | None = None
+
+def configure_scheduler(config: SchedulerConfig | None = None) -> LLMScheduler:
+    global _scheduler
+    _scheduler = LLMScheduler(config)
+    return _scheduler
+
+def get_scheduler() -> LLMScheduler:
+    if not _scheduler:
+        return configure_scheduler()
+    return _scheduler
@@ -0,0 +1,365 @@
+import json
+import os
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Iterable
+from pydantic import TypeAdapter, ValidationError
+from .models import Heuristics
+from .lock import FileLock
+
+LEGACY_CACHE_FILE = Path(__file__).parent / "heuristics.json"
+CACHE_PATH_ENV = "PDFSE_HEURISTICS"
+
+heuristics_adapter = TypeAdapter(Heuristics)
+commands_adapter = TypeAdapter(list[dict])
+
+
+def default_cache_path() -> Path:
+    """
+    Location of the heuristics store, overridable with $PDFSE_HEURISTICS.
+    """
+    env_path = os.environ.get(CACHE_PATH_ENV)
+    if env_path:
+        return Path(env_path).expanduser()
+    cache_home = os.environ.get("XDG_CACHE_HOME")
+    base = Path(cache_home) if cache_home else Path.home() / ".cache"
+    return base / "pdfse" / "heuristics.db"
+
+
+class HeuristicsStore(ABC):
+    """
+    Persistent storage of heuristics, addressed by (label, field).
+    """
+    path: Path
+
+    @abstractmethod
+    def load(self, labels: Iterable[str] | None = None) -> Heuristics:
+        """
+        Load the heuristics of the given labels (all labels if None).
+        """
+
+    @abstractmethod
+    def upsert(self, heuristics: Heuristics) -> tuple[int, int]:
+        """
+        Insert or replace the given fields, leaving every other field
+        untouched. Returns the store generation the write replaced and the
+        one it produced, both read under the write's lock.
+        """
+
+    @abstractmethod
+    def delete(self, labels: Iterable[str]) -> list[str]:
+        """
+        Delete the given labels, returning the ones that existed.
+        """
+
+    @abstractmethod
+    def clear(self) -> None:
+        """
+        Delete every heuristic in the store.
+        """
+
+    @abstractmethod
+    def generation(self) -> int:
+        """
+        A counter that changes whenever the store is written to.
+        """
+
+    @abstractmethod
+    def changed_labels(self, since: int) -> set[str] | None:
+        """
+        Labels written after generation `since`, or None if the backend
+        cannot tell (callers must then assume every label changed).
+        """
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def _watched_files(self) -> list[Path]:
+        return [self.path]
+
+    def stamp(self) -> tuple:
+        """
+        Cheap stat-based token: if it did not change, neither did the store.
+        """
+        stamp = []
+        for path in self._watched_files():
+            try:
+                st = path.stat()
+                stamp.append((st.st_mtime_ns, st.st_size))
+            except FileNotFoundError:
+                stamp.append(None)
+        return tuple(stamp)
+
+
+class JsonHeuristicsStore(HeuristicsStore):
+    """
+    The original single-file format. Every write rewrites the whole file.
+    """
+    def __init__(self, path: Path):
+        self.path = path
+
+    def _read(self) -> Heuristics:
+        if not self.path.exists():
+            return {}
+        with open(self.path, "r") as f:
+            return heuristics_adapter.validate_json(f.read())
+
+    def _write(self, heuristics: Heuristics):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(heuristics, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def load(self, labels: Iterable[str] | None = None) -> Heuristics:
+        heuristics = self._read()
+        if labels is None:
+            return heuristics
+        return {label: heuristics[label] for label in set(labels) if label in heuristics}
+
+    def _write_lock(self) -> FileLock:
+        # Serializes read-modify-write cycles so concurrent writers merge
+        return FileLock(self.path.with_name(self.path.name + ".lock"))
+
+    def upsert(self, heuristics: Heuristics) -> tuple[int, int]:
+        with self._write_lock():
+            replaced = self.generation()
+            current = self._read()
+            for label, fields in heuristics.items():
+                current.setdefault(label, {}).update(fields)
+            self._write(current)
+            return replaced, self.generation()
+
+    def delete(self, labels: Iterable[str]) -> list[str]:
+        with self._write_lock():
+            current = self._read()
+            removed = [label for label in labels if current.pop(label, None) is not None]
+            if removed:
+                self._write(current)
+        return removed
+
+    def clear(self) -> None:
+        self.path.unlink(missing_ok=True)
+
+    def generation(self) -> int:
+        try:
+            return self.path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return 0
+
+    def changed_labels(self, since: int) -> set[str] | None:
+        return None
+
+
+class SqliteHeuristicsStore(HeuristicsStore):
+    """
+    One row per (label, field), so reads only touch the labels in use and
+    writes are transactional upserts of the changed fields.
+    """
+    def __init__(self, path: Path):
+        self.path = path
+
+    def _connect(self) -> sqlite3.Connection:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30.0)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS heuristics (
+                label TEXT NOT NULL,
+                field TEXT NOT NULL,
+                commands TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (label, field)
+            )
+            """
+        )
+        # Every write bumps the store generation and stamps the labels it
+        # touched with it, so readers can tell which labels changed.
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS label_generations (
+                label TEXT PRIMARY KEY,
+                generation INTEGER NOT NULL
+            )
+            """
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            )
+            """
+        )
+        return conn
+
+    def _watched_files(self) -> list[Path]:
+        return [self.path, self.path.with_name(self.path.name + "-wal")]
+
+    def _bump_generation(self, conn: sqlite3.Connection, labels: Iterable[str]) -> int:
+        conn.execute(
+            """
+            INSERT INTO meta (key, value) VALUES ('generation', 1)
+            ON CONFLICT (key) DO UPDATE SET value = value + 1
+            """
+        )
+        generation = conn.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()[0]
+        conn.executemany(
+            """
+            INSERT INTO label_generations (label, generation) VALUES (?, ?)
+            ON CONFLICT (label) DO UPDATE SET generation = excluded.generation
+            """,
+            [(label, generation) for label in set(labels)]
+        )
+        return generation
+
+    def generation(self) -> int:
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()
+        finally:
+            conn.close()
+        return row[0] if row else 0
+
+    def changed_labels(self, since: int) -> set[str] | None:
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT label FROM label_generations WHERE generation > ?", (since,)
+            ).fetchall()
+        finally:
+            conn.close()
+        return {label for (label,) in rows}
+
+    def load(self, labels: Iterable[str] | None = None) -> Heuristics:
+        conn = self._connect()
+        try:
+            if labels is None:
+                rows = conn.execute("SELECT label, field, commands FROM heuristics").fetchall()
+            else:
+                wanted = list(set(labels))
+                rows = []
+                # Stay well below SQLite's bound-parameter limit
+                for i in range(0, len(wanted), 500):
+                    chunk = wanted[i:i + 500]
+                    placeholders = ", ".join("?" * len(chunk))
+                    rows.extend(conn.execute(
+                        f"SELECT label, field, commands FROM heuristics WHERE label IN ({placeholders})",
+                        chunk
+                    ).fetchall())
+        finally:
+            conn.close()
+
+        heuristics: Heuristics = {}
+        for label, field, commands in rows:
+            try:
+                heuristics.setdefault(label, {})[field] = commands_adapter.validate_json(commands)
+            except ValidationError:
+                continue  # A corrupt row only costs its own field
+        return heuristics
+
+    def upsert(self, heuristics: Heuristics) -> tuple[int, int]:
+        now = time.time()
+        rows = [
+            (label, field, json.dumps(commands, ensure_ascii=False), now)
+            for label, fields in heuristics.items()
+            for field, commands in fields.items()
+        ]
+        if not rows:
+            generation = self.generation()
+            return generation, generation
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany(
+                    """
+                    INSERT INTO heuristics (label, field, commands, updated_at)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT (label, field) DO UPDATE SET
+                        commands = excluded.commands,
+                        updated_at = excluded.updated_at
+                    """,
+                    rows
+                )
+                generation = self._bump_generation(conn, heuristics.keys())
+        finally:
+            conn.close()
+        # The bump is an increment inside the write transaction
+        return generation - 1, generation
+
+    def delete(self, labels: Iterable[str]) -> list[str]:
+        removed = []
+        conn = self._connect()
+        try:
+            with conn:
+                for label in labels:
+                    cursor = conn.execute("DELETE FROM heuristics WHERE label = ?", (label,))
+                    if cursor.rowcount > 0:
+                        removed.append(label)
+                if removed:
+                    self._bump_generation(conn, removed)
+        finally:
+            conn.close()
+        return removed
+
+    def clear(self) -> None:
+        conn = self._connect()
+        try:
+            with conn:
+                labels = [label for (label,) in conn.execute("SELECT DISTINCT label FROM heuristics")]
+                conn.execute("DELETE FROM heuristics")
+                self._bump_generation(conn, labels)
+        finally:
+            conn.close()
+
+    def legacy_migrated(self) -> bool:
+        """
+        Whether the legacy heuristics.json was already imported (or found
+        unneeded), so clearing the store does not bring it back.
+        """
+        if not self.exists():
+            return False
+        conn = self._connect()
+        try:
+            return conn.execute("SELECT 1 FROM meta WHERE key = 'legacy_migrated'").fetchone() is not None
+        finally:
+            conn.close()
+
+    def mark_legacy_migrated(self) -> None:
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('legacy_migrated', 1)")
+        finally:
+            conn.close()
+
+    def is_empty(self) -> bool:
+        conn = self._connect()
+        try:
+            return conn.execute("SELECT 1 FROM heuristics LIMIT 1").fetchone() is None
+        finally:
+            conn.close()
+
+
+def open_store(path: Path | None = None) -> HeuristicsStore:
+    """
+    Open the store at `path`. Files ending in `.json` use the legacy
+    single-file format; anything else is an SQLite database.
+    """
+    path = path or default_cache_path()
+    if path.suffix == ".json":
+        return JsonHeuristicsStore(path)
+    return SqliteHeuristicsStore(path)
+
+
+def migrate_json_cache(json_path: Path, store: HeuristicsStore) -> int:
+    """
+    Copy every heuristic of a legacy heuristics.json into `store`.
+    Returns the number of migrated labels.
+    """
+    heuristics = JsonHeuristicsStore(json_path).load()
+    store.upsert(heuristics)
+    return len(heuristics)
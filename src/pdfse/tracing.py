@@ -0,0 +1,139 @@
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+
+@dataclass
+class TimingStats:
+    calls: int = 0
+    total: float = 0.0
+    max: float = 0.0
+
+    def add(self, elapsed: float):
+        self.calls += 1
+        self.total += elapsed
+        if elapsed > self.max:
+            self.max = elapsed
+
+    def as_dict(self) -> dict:
+        return {
+            "calls": self.calls,
+            "total_ms": round(self.total * 1000, 3),
+            "mean_ms": round(self.total * 1000 / self.calls, 3) if self.calls else 0.0,
+            "max_ms": round(self.max * 1000, 3),
+        }
+
+
+@dataclass
+class LabelTrace:
+    fields: dict[str, TimingStats] = field(default_factory=dict)
+    commands: dict[str, TimingStats] = field(default_factory=dict)
+    loop_iterations: int = 0
+    loops: int = 0
+    max_loop_iterations: int = 0
+    stalled_loops: int = 0
+    exceptions: dict[str, int] = field(default_factory=dict)
+
+    def as_dict(self) -> dict:
+        return {
+            "fields": {name: stats.as_dict() for name, stats in self.fields.items()},
+            "commands": {name: stats.as_dict() for name, stats in self.commands.items()},
+            "loops": {
+                "count": self.loops,
+                "iterations": self.loop_iterations,
+                "max_iterations": self.max_loop_iterations,
+                "stalled": self.stalled_loops,
+            },
+            "exceptions": dict(self.exceptions),
+        }
+
+
+class Tracer:
+    """
+    Aggregates HeuristicMachine timings per label across a run.
+
+    With `record_events`, every field and command is also kept as a
+    Chrome trace event (with the cursor position after the command), for
+    chrome://tracing or Perfetto. Safe to share between threads.
+    """
+    def __init__(self, record_events: bool = False):
+        self.record_events = record_events
+        self.labels: dict[str, LabelTrace] = {}
+        self.events: list[dict] = []
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+
+    def _label(self, label: str) -> LabelTrace:
+        trace = self.labels.get(label)
+        if trace is None:
+            trace = self.labels[label] = LabelTrace()
+        return trace
+
+    def _event(self, name: str, category: str, start: float, elapsed: float, args: dict):
+        self.events.append({
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": (start - self._origin) * 1e6,
+            "dur": elapsed * 1e6,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "args": args,
+        })
+
+    def field(self, label: str, name: str, start: float, elapsed: float):
+        with self._lock:
+            self._label(label).fields.setdefault(name, TimingStats()).add(elapsed)
+            if self.record_events:
+                self._event(name, "field", start, elapsed, {"label": label})
+
+    def command(self, label: str, name: str, start: float, elapsed: float, cursor: tuple[float, float]):
+        with self._lock:
+            self._label(label).commands.setdefault(name, TimingStats()).add(elapsed)
+            if self.record_events:
+                self._event(name, "command", start, elapsed, {"label": label, "cursor": cursor})
+
+    def loop(self, label: str, iterations: int, stalled: bool = False):
+        with self._lock:
+            trace = self._label(label)
+            trace.loops += 1
+            trace.loop_iterations += iterations
+            trace.max_loop_iterations = max(trace.max_loop_iterations, iterations)
+            if stalled:
+                trace.stalled_loops += 1
+
+    def exception(self, label: str, where: str, exc: BaseException):
+        key = f"{where}: {type(exc).__name__}: {exc}"
+        with self._lock:
+            exceptions = self._label(label).exceptions
+            exceptions[key] = exceptions.get(key, 0) + 1
+
+    def summary(self) -> dict:
+        with self._lock:
+            return {label: trace.as_dict() for label, trace in self.labels.items()}
+
+    def chrome_trace(self) -> dict:
+        with self._lock:
+            return {"traceEvents": list(self.events), "displayTimeUnit": "ms"}
+
+    def export(self, summary_path: Path | None = None, chrome_path: Path | None = None):
+        if summary_path:
+            with open(summary_path, "w") as f:
+                json.dump(self.summary(), f, indent=2, ensure_ascii=False)
+        if chrome_path:
+            with open(chrome_path, "w") as f:
+                json.dump(self.chrome_trace(), f, ensure_ascii=False)
+
+
+_tracer: Tracer | None = None
+
+def configure_tracer(enabled: bool = True, record_events: bool = False) -> Tracer | None:
+    global _tracer
+    _tracer = Tracer(record_events) if enabled else None
+    return _tracer
+
+def get_tracer() -> Tracer | None:
+    return _tracer
@@ -1,3 +1,4 @@
+import math
 import unicodedata
 
 
@@ -56,3 +57,26 @@ def normalize_text(text):
     normalized = unicodedata.normalize('NFKD', text)
     without_accents = ''.join(c for c in normalized if unicodedata.category(c) != 'Mn')
     return without_accents.lower()
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token for latin text
+    return len(text) // 4 + 1
+
+
+def estimate_image_tokens(png: bytes) -> int | None:
+    """
+    Tokens of a PNG sent with "detail": "high": scaled to fit 2048x2048,
+    then its short side to 768, at 170 tokens per 512px tile plus 85.
+    None if `png` is not a PNG.
+    """
+    if len(png) < 24 or not png.startswith(b"\x89PNG\r\n\x1a\n"):
+        return None
+    width = int.from_bytes(png[16:20], "big")
+    height = int.from_bytes(png[20:24], "big")
+    if not width or not height:
+        return None
+    scale = min(1.0, 2048 / max(width, height))
+    scale *= min(1.0, 768 / (min(width, height) * scale))
+    tiles = math.ceil(width * scale / 512) * math.ceil(height * scale / 512)
+    return 170 * tiles + 85
@@ -0,0 +1,130 @@
+import hashlib
+import json
+from typing import Any
+from pdfse.wordspace import WordSpace
+from pdfse.utils import normalize_text
+
+# Variants live next to the generic plan of a label, as extra fields:
+#   "@<key>"          -> signature of the layout the variant was made for
+#   "<field>@<key>"   -> the variant's command list for <field>
+# Schema fields cannot contain the separator (DatasetEntry rejects them),
+# so the generic plan, the cache checks and the stores are unaware of
+# variants.
+VARIANT_SEPARATOR = "@"
+
+# How far (as a fraction of the page size) an anchor may drift and still match
+POSITION_TOLERANCE = 0.05
+
+
+def is_variant_field(name: str) -> bool:
+    return VARIANT_SEPARATOR in name
+
+
+def _anchor_texts(commands: list[dict[str, Any]]) -> list[str]:
+    texts = []
+    for command in commands:
+        if not isinstance(command, dict):
+            continue
+        if command.get("type") == "command" and command.get("name") == "anchor_to_text":
+            text = command.get("args", {}).get("text")
+            if isinstance(text, str) and text.split():
+                texts.append(text)
+        for branch in ("body", "then", "else"):
+            if isinstance(command.get(branch), list):
+                texts.extend(_anchor_texts(command[branch]))
+    return texts
+
+
+class LayoutIndex:
+    """
+    Normalized word text -> normalized word centers, built once per document.
+    """
+    def __init__(self, wordspace: WordSpace):
+        self.positions: dict[str, list[tuple[float, float]]] = {}
+        max_x = wordspace.max_x or 1
+        max_y = wordspace.max_y or 1
+        for word in wordspace.words:
+            x0, y0, x1, y1 = word.bbox
+            center = ((x0 + x1) / 2 / max_x, (y0 + y1) / 2 / max_y)
+            self.positions.setdefault(normalize_text(word.text), []).append(center)
+
+    def find(self, text: str) -> tuple[float, float] | None:
+        occurrences = self.positions.get(normalize_text(text))
+        return occurrences[0] if occurrences else None
+
+    def matches(self, text: str, x: float, y: float) -> bool:
+        for ox, oy in self.positions.get(normalize_text(text), ()):
+            if abs(ox - x) <= POSITION_TOLERANCE and abs(oy - y) <= POSITION_TOLERANCE:
+                return True
+        return False
+
+
+def plan_signature(fields: dict[str, list], wordspace: WordSpace) -> list[dict]:
+    """
+    Where the anchors a plan relies on sit in the document it was made for.
+    """
+    index = LayoutIndex(wordspace)
+    signature = []
+    seen = set()
+    for commands in fields.values():
+        for text in _anchor_texts(commands):
+            first_word = text.split()[0]
+            position = index.find(first_word)
+            if position is None or normalize_text(first_word) in seen:
+                continue
+            seen.add(normalize_text(first_word))
+            signature.append({"text": first_word, "x": round(position[0], 3), "y": round(position[1], 3)})
+    return signature
+
+
+def build_variant(fields: dict[str, list], wordspace: WordSpace) -> dict[str, list]:
+    """
+    Turn a plan made for the layout of `wordspace` into variant fields.
+    Returns {} when the plan has no text anchor to recognize the layout by.
+    """
+    signature = plan_signature(fields, wordspace)
+    if not signature:
+        return {}
+    key = hashlib.sha1(json.dumps(signature, sort_keys=True).encode("utf-8")).hexdigest()[:10]
+    variant = {f"{VARIANT_SEPARATOR}{key}": signature}
+    for field, commands in fields.items():
+        variant[f"{field}{VARIANT_SEPARATOR}{key}"] = commands
+    return variant
+
+
+def get_variants(label_heuristic: dict[str, list]) -> dict[str, tuple[list[dict], dict[str, list]]]:
+    """
+    The variants of a label: key -> (signature, fields).
+    """
+    variants: dict[str, tuple[list[dict], dict[str, list]]] = {
+        name[1:]: (signature, {})
+        for name, signature in label_heuristic.items()
+        if name.startswith(VARIANT_SEPARATOR)
+    }
+    for name, value in label_heuristic.items():
+        if is_variant_field(name) and not name.startswith(VARIANT_SEPARATOR):
+            field, key = name.rsplit(VARIANT_SEPARATOR, 1)
+            if key in variants:
+                variants[key][1][field] = value
+    return variants
+
+
+def select_variant(label_heuristic: dict[str, list], wordspace: WordSpace) -> dict[str, list]:
+    """
+    Fields of the variant whose signature fully matches the document (the
+    most specific one if several do), or {} to use the generic plan.
+    """
+    variants = get_variants(label_heuristic)
+    if not variants:
+        return {}
+
+    index = LayoutIndex(wordspace)
+    best: dict[str, list] = {}
+    best_size = 0
+    for signature, fields in variants.values():
+        if len(signature) <= best_size:
+            continue
+        if all(index.matches(anchor["text"], anchor["x"], anchor["y"]) for anchor in signature):
+            best = fields
+            best_size = len(signature)
+    return best
@@ -0,0 +1,184 @@
+import copy
+import time
+from pathlib import Path
+from unittest.mock import patch
+from pdfse.wordspace import Word, WordSpace
+from pdfse.machine import ExecutionConfig, HeuristicMachine
+from pdfse.batch import BatchExecutor, compile_commands
+from pdfse.core import process_batch
+from pdfse.models import Entry
+
+
+def make_wordspace(name: str, cpf: str, shifted: bool = False) -> WordSpace:
+    dy = 20 if shifted else 0
+    return WordSpace([
+        Word("Nome:", (10, 10 + dy, 30, 20 + dy)),
+        Word(name, (40, 10 + dy, 60, 20 + dy)),
+        Word("CPF:", (10, 30 + dy, 30, 40 + dy)),
+        Word(cpf, (40, 30 + dy, 60, 40 + dy)),
+    ], 100, 100)
+
+
+HEURISTIC = {
+    "nome": [
+        {"type": "command", "name": "anchor_to_text", "args": {"text": "Nome:"}},
+        {"type": "command", "name": "move_right", "args": {}},
+        {"type": "command", "name": "collect", "args": {}},
+    ],
+    "cpf": [
+        {"type": "command", "name": "anchor_to_text", "args": {"text": "CPF:"}},
+        {"type": "command", "name": "move_right", "args": {"bad_arg": 1}},
+        {"type": "command", "name": "unknown", "args": {}},
+        {
+            "type": "loop",
+            "condition": {"name": "check_current_word_matches_regex", "args": {"pattern": "CPF"}},
+            "body": [{"type": "command", "name": "move_right", "args": {}}],
+        },
+        {
+            "type": "if",
+            "condition": {"name": "check_current_word_matches_regex", "args": {"pattern": "^[0-9]+$"}},
+            "then": [{"type": "command", "name": "collect", "args": {}}],
+            "else": [{"type": "command", "name": "move_left", "args": {}}, {"type": "command", "name": "collect", "args": {}}],
+        },
+    ],
+    "stuck": [
+        {"type": "command", "name": "anchor_to_text", "args": {"text": "Nome:"}},
+        {
+            "type": "loop",
+            "condition": {"name": "check_current_word_matches_regex", "args": {"pattern": "Nome"}},
+            "body": [{"type": "command", "name": "move_left", "args": {}}],
+        },
+        {"type": "command", "name": "collect", "args": {}},
+    ],
+    "repeat": [
+        {"type": "command", "name": "anchor_to_text", "args": {"text": "CPF:"}},
+        {"type": "command", "name": "move_right", "args": {}},
+        {
+            "type": "loop",
+            "condition": {"name": "check_current_word_matches_regex", "args": {"pattern": "^1"}},
+            "body": [{"type": "command", "name": "collect", "args": {}}],
+        },
+    ],
+    "empty": [],
+}
+
+
+def test_compile_drops_what_the_machine_skips():
+    ops = compile_commands(HEURISTIC["cpf"])
+    assert [op[0] for op in ops] == ["command", "command", "loop", "if"]
+    assert compile_commands("not a list") == []
+
+
+def test_batch_matches_machine():
+    wordspaces = [
+        make_wordspace("GOKU", "123"),
+        make_wordspace("VEGETA", "ABC", shifted=True),
+        make_wordspace("GOHAN", "1999"),
+    ]
+    config = ExecutionConfig(max_loop_iterations=4)
+
+    expected = [HeuristicMachine(copy.deepcopy(ws), config).run(HEURISTIC) for ws in wordspaces]
+    executor = BatchExecutor(HEURISTIC, config)
+    results = executor.run(wordspaces)
+
+    assert results == expected
+    assert results[0]["repeat"] == "123 123 123 123"
+    assert executor.stalled_loops == 3
+
+
+def test_batch_matches_machine_on_malformed_conditions():
+    collect = {"type": "command", "name": "collect", "args": {}}
+    move_right = {"type": "command", "name": "move_right", "args": {}}
+    anchor = {"type": "command", "name": "anchor_to_text", "args": {"text": "Nome:"}}
+    heuristic = {
+        "unknown_check": [anchor, {
+            "type": "if",
+            "condition": {"name": "check_nothing", "args": {}},
+            "then": [collect],
+            "else": [move_right, collect],
+        }],
+        "bad_args": [anchor, {
+            "type": "if",
+            "condition": {"name": "check_current_word_matches_regex", "args": ["Nome"]},
+            "then": [collect],
+            "else": [move_right, collect],
+        }],
+        "wrong_args": [anchor, {
+            "type": "if",
+            "condition": {"name": "check_current_word_matches_regex", "args": {"regex": "Nome"}},
+            "then": [collect],
+            "else": [move_right, collect],
+        }],
+        "missing_condition": [anchor, {"type": "if", "then": [collect], "else": [move_right, collect]}, collect],
+        "not_a_dict": [anchor, collect, {"type": "if", "condition": "Nome", "then": [collect]}],
+        "loop_not_a_dict": [anchor, collect, {"type": "loop", "condition": ["Nome"], "body": [move_right]}],
+        "loop_unknown_check": [anchor, {"type": "loop", "condition": {"name": "check_nothing"}, "body": [move_right]}, collect],
+        "loop_empty_body": [anchor, {
+            "type": "loop",
+            "condition": {"name": "check_current_word_matches_regex", "args": {"pattern": "Nome"}},
+            "body": [{"type": "command", "name": "unknown"}],
+        }, collect],
+        "then_not_a_list": [anchor, {
+            "type": "if",
+            "condition": {"name": "check_current_word_matches_regex", "args": {"pattern": "Nome"}},
+            "then": "collect",
+            "else": [move_right],
+        }, collect],
+    }
+    wordspaces = [make_wordspace("GOKU", "123"), make_wordspace("VEGETA", "456", shifted=True)]
+
+    machines = [HeuristicMachine(copy.deepcopy(ws)) for ws in wordspaces]
+    expected = [machine.run(heuristic) for machine in machines]
+    executor = BatchExecutor(heuristic)
+    results = executor.run(wordspaces)
+
+    assert results == expected
+    assert results[0]["unknown_check"] == "GOKU"
+    assert results[0]["bad_args"] == "GOKU"
+    assert results[0]["not_a_dict"] is None
+    assert results[0]["loop_not_a_dict"] is None
+    assert executor.stalled_loops == sum(machine.stalled_loops for machine in machines)
+    assert executor.timed_out == [[], []]
+
+
+def test_batch_charges_time_budgets_per_document():
+    slow = make_wordspace("GOKU", "123")
+    fast = make_wordspace("VEGETA", "456")
+    original = WordSpace.move_first
+
+    def move_first(self):
+        if self is slow:
+            time.sleep(0.05)
+        original(self)
+
+    heuristic = {
+        "first": [{"type": "command", "name": "move_first", "args": {}}, {"type": "command", "name": "collect", "args": {}}],
+        "nome": HEURISTIC["nome"],
+    }
+    with patch.object(WordSpace, "move_first", move_first):
+        executor = BatchExecutor(heuristic, ExecutionConfig(document_timeout=0.01))
+        results = executor.run([slow, fast])
+
+    assert results[0] == {"first": None, "nome": None}
+    assert results[1] == {"first": "Nome:", "nome": "VEGETA"}
+    assert executor.timed_out == [["first", "nome"], []]
+
+
+def test_process_batch_groups_by_label():
+    entries = [
+        Entry(id=1, label="a", pdf_path=Path("a1.pdf"), extraction_schema={"nome": "", "extra": ""}),
+        Entry(id=2, label="b", pdf_path=Path("b1.pdf"), extraction_schema={"cpf": ""}),
+        Entry(id=3, label="a", pdf_path=Path("a2.pdf"), extraction_schema={"nome": "", "extra": ""}),
+    ]
+    heuristics = {"a": {"nome": HEURISTIC["nome"]}, "b": {"cpf": HEURISTIC["cpf"]}}
+    wordspaces = [make_wordspace("GOKU", "1"), make_wordspace("VEGETA", "2"), make_wordspace("GOHAN", "3")]
+
+    with patch("pdfse.core.BatchExecutor", wraps=BatchExecutor) as executor_cls:
+        results = process_batch(entries, heuristics, wordspaces)
+
+    assert executor_cls.call_count == 2
+    assert [result.values for result in results] == [
+        {"nome": "GOKU", "extra": None},
+        {"cpf": "2"},
+        {"nome": "GOHAN", "extra": None},
+    ]
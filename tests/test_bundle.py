@@ -0,0 +1,68 @@
+import asyncio
+import pytest
+from unittest.mock import patch, AsyncMock
+
+from pdfse.bundle import BundleItem, HeuristicBundler, pack_bundles
+from pdfse.scheduler import LLMScheduler, SchedulerConfig
+
+
+def _item(label: str, tokens: int) -> BundleItem:
+    return BundleItem(label, {}, [], tokens, future=None) # type: ignore
+
+
+def test_pack_bundles():
+    items = [_item("a", 40), _item("b", 70), _item("c", 50), _item("d", 200), _item("e", 10)]
+
+    bundles = pack_bundles(items, token_budget=100, max_labels=2)
+
+    assert [[item.label for item in bundle] for bundle in bundles] == [["a", "c"], ["b", "e"], ["d"]]
+
+
+@pytest.mark.asyncio
+@patch("pdfse.bundle.fetch_heuristic", new_callable=AsyncMock)
+@patch("pdfse.bundle.fetch_bundled_heuristics", new_callable=AsyncMock)
+async def test_bundler_demultiplexes_response(mock_fetch_bundled, mock_fetch_single):
+    mock_fetch_bundled.return_value = {
+        "label_a": {"field1": [], "unrequested": []},
+        "label_b": {"field2": []},
+        "label_c": {"field4": []},
+    }
+    mock_fetch_single.side_effect = lambda schema, *_, **__: {name: [] for name in schema}
+    bundler = HeuristicBundler(
+        LLMScheduler(SchedulerConfig()), ["label_a", "label_b", "label_c", "label_d"],
+        image_mode=False, token_budget=10_000
+    )
+
+    async def skip_label_d():
+        bundler.skip("label_d")
+
+    results = await asyncio.gather(
+        bundler.fetch("label_a", {"field1": "d"}, ["sample a"], 10),
+        bundler.fetch("label_b", {"field2": "d"}, ["sample b"], 10),
+        # Partly missing from the bundled response: the rest is fetched on its own
+        bundler.fetch("label_c", {"field3": "d", "field4": "d"}, ["sample c"], 10),
+        skip_label_d(),
+    )
+
+    assert results[:3] == [{"field1": []}, {"field2": []}, {"field3": [], "field4": []}]
+    mock_fetch_bundled.assert_called_once()
+    bundle = mock_fetch_bundled.call_args.args[0]
+    assert [label for label, _, _ in bundle] == ["label_a", "label_b", "label_c"]
+    mock_fetch_single.assert_called_once_with({"field3": "d"}, ["sample c"], False, cropped=False)
+
+
+@pytest.mark.asyncio
+@patch("rich.print")
+@patch("pdfse.bundle.fetch_heuristic", new_callable=AsyncMock)
+@patch("pdfse.bundle.fetch_bundled_heuristics", new_callable=AsyncMock)
+async def test_bundler_lingers_for_late_labels(mock_fetch_bundled, mock_fetch_single, mock_rich_print):
+    mock_fetch_single.return_value = {"field1": []}
+    bundler = HeuristicBundler(
+        LLMScheduler(SchedulerConfig()), ["label_a", "never_arrives"],
+        image_mode=False, token_budget=10_000, linger=0.05
+    )
+
+    result = await asyncio.wait_for(bundler.fetch("label_a", {"field1": "d"}, ["sample"], 10), 1)
+
+    assert result == {"field1": []}
+    mock_fetch_bundled.assert_not_called()
@@ -0,0 +1,106 @@
+import pytest
+from unittest.mock import patch
+
+from pdfse.cache import HeuristicsCache
+from pdfse.store import open_store
+
+MOVE_FIRST = [{"type": "command", "name": "move_first", "args": {}}]
+MOVE_LAST = [{"type": "command", "name": "move_last", "args": {}}]
+
+
+@pytest.fixture(params=["heuristics.db", "heuristics.json"])
+def store_path(request, tmp_path):
+    return tmp_path / request.param
+
+
+def test_lazy_load_of_labels(store_path):
+    open_store(store_path).upsert({"label_a": {"field1": MOVE_FIRST}, "label_b": {"field1": MOVE_LAST}})
+    cache = HeuristicsCache(open_store(store_path), check_interval=0)
+
+    assert len(cache) == 0
+    assert cache.get("label_a") == {"field1": MOVE_FIRST}
+    assert cache.get("missing") is None
+    assert list(cache) == ["label_a"]
+
+
+def test_refresh_reloads_only_changed_labels(store_path):
+    writer = open_store(store_path)
+    writer.upsert({"label_a": {"field1": MOVE_FIRST}, "label_b": {"field1": MOVE_FIRST}})
+    cache = HeuristicsCache(open_store(store_path), check_interval=0)
+    cache.track(["label_a", "label_b", "label_c"])
+    invalidated = []
+    cache.on_invalidate(invalidated.append)
+
+    assert cache.refresh() == set()
+
+    writer.upsert({"label_b": {"field2": MOVE_LAST}, "label_c": {"field1": MOVE_LAST}})
+
+    assert cache.refresh(force=True) == {"label_b", "label_c"}
+    assert invalidated == [{"label_b", "label_c"}]
+    assert cache["label_b"] == {"field1": MOVE_FIRST, "field2": MOVE_LAST}
+    assert cache["label_c"] == {"field1": MOVE_LAST}
+
+
+def test_refresh_sees_deleted_labels(store_path):
+    writer = open_store(store_path)
+    writer.upsert({"label_a": {"field1": MOVE_FIRST}})
+    cache = HeuristicsCache(open_store(store_path), check_interval=0)
+    cache.track(["label_a"])
+
+    writer.delete(["label_a"])
+
+    assert cache.refresh(force=True) == {"label_a"}
+    assert "label_a" not in cache
+
+
+def test_check_interval_throttles_refresh(store_path):
+    writer = open_store(store_path)
+    writer.upsert({"label_a": {"field1": MOVE_FIRST}})
+    cache = HeuristicsCache(open_store(store_path), check_interval=3600)
+    cache.track(["label_a"])
+
+    writer.upsert({"label_a": {"field1": MOVE_LAST}})
+
+    assert cache.refresh() == set()
+    assert cache["label_a"] == {"field1": MOVE_FIRST}
+
+
+def test_own_update_is_not_reloaded(store_path):
+    writer = open_store(store_path)
+    writer.upsert({"label_a": {"field1": MOVE_FIRST}})
+    cache = HeuristicsCache(open_store(store_path), check_interval=0)
+    cache.track(["label_a"])
+    invalidated = []
+    cache.on_invalidate(invalidated.append)
+
+    cache.update({"label_a": {"field2": MOVE_LAST}})
+    assert invalidated == [{"label_a"}]
+    with patch.object(cache.store, "load", wraps=cache.store.load) as load:
+        assert cache.refresh(force=True) == set()
+    load.assert_not_called()
+    assert invalidated == [{"label_a"}]
+
+    # Writes by others after ours are still seen
+    writer.upsert({"label_a": {"field1": MOVE_LAST}})
+    assert cache.refresh(force=True) == {"label_a"}
+    assert cache["label_a"] == {"field1": MOVE_LAST, "field2": MOVE_LAST}
+
+
+def test_update_after_foreign_write_marks_cache_stale(store_path):
+    writer = open_store(store_path)
+    writer.upsert({"label_a": {"field1": MOVE_FIRST}, "label_b": {"field1": MOVE_FIRST}})
+    cache = HeuristicsCache(open_store(store_path), check_interval=3600)
+    cache.track(["label_a", "label_b"])
+    upsert = cache.store.upsert
+
+    def racing_upsert(heuristics):
+        # Lands between the cache's last check and its own write
+        writer.upsert({"label_b": {"field1": MOVE_LAST}})
+        return upsert(heuristics)
+
+    with patch.object(cache.store, "upsert", side_effect=racing_upsert):
+        cache.update({"label_a": {"field2": MOVE_LAST}})
+
+    assert cache.refresh() == {"label_b"}
+    assert cache["label_b"] == {"field1": MOVE_LAST}
+    assert cache["label_a"] == {"field1": MOVE_FIRST, "field2": MOVE_LAST}
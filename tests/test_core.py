@@ -7,12 +7,22 @@ import pytest
 import pytest_asyncio
 
 from pdfse.models import Entry, LLMTask
+from pdfse.store import SqliteHeuristicsStore
+from pdfse.lock import heuristic_lock
+from pdfse.scheduler import LLMScheduler, SchedulerConfig
 from pdfse.core import (
+    split_schema,
     _fetch_heuristic_for_task,
+    _single_flight_fetch,
     fetch_and_save_missing_heuristics,
     process_entry,
-    run_extraction
+    run_extraction,
+    EntryResult,
+    _result_record
 )
+from pdfse.results import configure_result_cache
+from pdfse.metrics import configure_metrics
+from pdfse.layout import ImageCrop, configure_layout_encoder
 
 # Mark all tests in this module as asyncio
 # pytestmark = pytest.mark.asyncio
@@ -81,6 +91,64 @@ async def test_fetch_heuristic_for_task_image_mode(
     assert result_label == label
     assert result_heuristic == {"field1": []}
 
+@pytest.mark.asyncio
+@patch("pdfse.core.fetch_heuristic", new_callable=AsyncMock)
+@patch("pdfse.core.render_pdf_regions", new_callable=MagicMock)
+@patch("pdfse.core.render_pdf_text", new_callable=MagicMock)
+async def test_fetch_heuristic_for_task_image_crop(mock_render, mock_regions, mock_fetch):
+    mock_regions.return_value = b"cropped image bytes"
+    mock_fetch.return_value = {"field1": []}
+    schema = {"inscricao": "Número de inscrição"}
+    configure_layout_encoder(image_crop=ImageCrop.ANCHORS)
+    try:
+        await _fetch_heuristic_for_task("test_label", schema, [Path("dummy.pdf")], image_mode=True)
+    finally:
+        configure_layout_encoder()
+
+    mock_render.assert_not_called()
+    (pdf_path, is_anchor), _ = mock_regions.call_args
+    assert pdf_path == Path("dummy.pdf")
+    assert is_anchor("Inscrição: 101943")
+    assert not is_anchor("Nome: SON GOKU")
+    mock_fetch.assert_called_once_with(schema, [b"cropped image bytes"], True, cropped=True)
+
+def test_split_schema():
+    schema = {f"field{i}": "desc" for i in range(7)}
+
+    assert split_schema(schema, 10) == [schema]
+    groups = split_schema(schema, 3)
+    assert [len(group) for group in groups] == [3, 2, 2]
+    assert [field for group in groups for field in group] == list(schema)
+
+@pytest.mark.asyncio
+@patch("rich.print")
+@patch("pdfse.core.fetch_heuristic", new_callable=AsyncMock)
+@patch("pdfse.core.get_pdf_text_layout", new_callable=MagicMock)
+async def test_fetch_heuristic_for_task_splits_large_schema(
+    mock_layout, mock_fetch, mock_rich_print
+):
+    mock_layout.return_value = "dummy text layout"
+
+    async def fetch_side_effect(schema, samples_data, image_mode):
+        if "field3" in schema:
+            raise ValueError("LLM response was empty")
+        # Fields outside the requested group are dropped when merging
+        return {field: [] for field in [*schema, "unrequested"]}
+
+    mock_fetch.side_effect = fetch_side_effect
+    schema = {f"field{i}": "desc" for i in range(6)}
+    scheduler = LLMScheduler(SchedulerConfig(fields_per_request=2))
+
+    with patch("pdfse.core.get_scheduler", return_value=scheduler):
+        label, heuristic = await _fetch_heuristic_for_task(
+            "label", schema, [Path("a.pdf")], image_mode=False
+        )
+
+    assert mock_fetch.call_count == 3
+    for call in mock_fetch.call_args_list:
+        assert call.args[1] == ["dummy text layout"]
+    assert set(heuristic) == {"field0", "field1", "field4", "field5"}
+
 @pytest.mark.asyncio
 @patch("rich.print")
 @patch("pdfse.core.fetch_heuristic", new_callable=AsyncMock)
@@ -118,10 +186,10 @@ async def test_fetch_and_save_missing_heuristics_no_tasks(
 @pytest.mark.asyncio
 @patch("rich.print")
 @patch("pdfse.core.save_heuristic_cache")
-@patch("asyncio.gather", new_callable=AsyncMock)
+@patch("pdfse.core._single_flight_fetch", new_callable=AsyncMock)
 @patch("pdfse.core.prepare_llm_tasks")
 async def test_fetch_and_save_missing_heuristics_with_tasks(
-    mock_prepare_llm, mock_gather, mock_save_cache, mock_rich_print
+    mock_prepare_llm, mock_fetch, mock_save_cache, mock_rich_print
 ):
     mock_task = LLMTask(
         label="new_label",
@@ -129,7 +197,7 @@ async def test_fetch_and_save_missing_heuristics_with_tasks(
         pdf_paths=[Path("new.pdf")]
     )
     mock_prepare_llm.return_value = [mock_task]
-    mock_gather.return_value = [("new_label", {"new_field": []})]
+    mock_fetch.return_value = ("new_label", {"new_field": []})
 
     initial_heuristics = {"old_label": {"field1": []}}
 
@@ -137,14 +205,53 @@ async def test_fetch_and_save_missing_heuristics_with_tasks(
         [MagicMock()], initial_heuristics, 3, False
     )
 
-    mock_gather.assert_called_once()
-    mock_save_cache.assert_called_once_with({
-        "old_label": {"field1": []},
-        "new_label": {"new_field": []}
-    })
+    mock_fetch.assert_awaited_once()
+    # Saving happens inside each single-flight task
+    mock_save_cache.assert_not_called()
+    assert result["old_label"] == {"field1": []}
     assert "new_label" in result
     assert result["new_label"] == {"new_field": []}
 
+@pytest.mark.asyncio
+@patch("pdfse.core._fetch_heuristic_for_task", new_callable=AsyncMock)
+async def test_single_flight_fetch_generates_only_missing_fields(mock_fetch, tmp_path):
+    store = SqliteHeuristicsStore(tmp_path / "h.db")
+    store.upsert({"label": {"field1": [{"type": "command", "name": "move_first", "args": {}}]}})
+    mock_fetch.return_value = ("label", {"field2": []})
+
+    with patch("pdfse.core.get_store", return_value=store), \
+         patch("pdfse.core.save_heuristic_cache", side_effect=store.upsert):
+        label, heuristic = await _single_flight_fetch(
+            "label", {"field1": "d1", "field2": "d2"}, [Path("a.pdf")], False
+        )
+
+    mock_fetch.assert_called_once_with("label", {"field2": "d2"}, [Path("a.pdf")], False, None)
+    assert label == "label"
+    assert set(heuristic) == {"field1", "field2"}
+    assert store.load(["label"])["label"]["field2"] == []
+
+@pytest.mark.asyncio
+@patch("rich.print")
+@patch("pdfse.core._fetch_heuristic_for_task", new_callable=AsyncMock)
+async def test_single_flight_fetch_waits_and_reuses(mock_fetch, mock_rich_print, tmp_path):
+    store = SqliteHeuristicsStore(tmp_path / "h.db")
+    holder = heuristic_lock(store.path, "label", {"field1"})
+    assert holder.try_acquire()
+
+    async def other_process_finishes():
+        await asyncio.sleep(0.2)
+        store.upsert({"label": {"field1": []}})
+        holder.release()
+
+    with patch("pdfse.core.get_store", return_value=store):
+        _, (label, heuristic) = await asyncio.gather(
+            other_process_finishes(),
+            _single_flight_fetch("label", {"field1": "d1"}, [Path("a.pdf")], False)
+        )
+
+    mock_fetch.assert_not_called()
+    assert heuristic == {"field1": []}
+
 @patch("pdfse.core.HeuristicMachine")
 @patch("pdfse.core.get_pdf_wordspace")
 def test_process_entry_success(mock_get_ws, mock_machine_cls, mock_entry):
@@ -153,6 +260,7 @@ def test_process_entry_success(mock_get_ws, mock_machine_cls, mock_entry):
 
     mock_machine_instance = MagicMock()
     mock_machine_instance.run.return_value = {"field1": "data1"}
+    mock_machine_instance.timed_out = []
     mock_machine_cls.return_value = mock_machine_instance
 
     heuristics = {
@@ -171,7 +279,7 @@ def test_process_entry_success(mock_get_ws, mock_machine_cls, mock_entry):
     }
     mock_machine_instance.run.assert_called_once_with(expected_heuristic_for_entry)
 
-    assert result == {"field1": "data1", "field2": None}
+    assert result == EntryResult({"field1": "data1", "field2": None})
 
 @patch("rich.print")
 @patch("pdfse.core.get_pdf_wordspace")
@@ -181,11 +289,13 @@ def test_process_entry_exception(mock_get_ws, mock_rich_print, mock_entry):
     result = process_entry(mock_entry, {})
 
     mock_rich_print.assert_called_once()
-    assert result == {"field1": None, "field2": None}
+    assert result == EntryResult({"field1": None, "field2": None}, failed=True)
 
 @pytest.mark.asyncio
 @patch("json.dump")
 @patch("builtins.open", new_callable=mock_open)
+@patch("pdfse.core.read_pdf")
+@patch("pdfse.core.get_pdf_wordspace")
 @patch("pdfse.core.process_entry")
 @patch("pdfse.core.fetch_and_save_missing_heuristics", new_callable=AsyncMock)
 @patch("pdfse.core.separate_good_bad_entries")
@@ -197,6 +307,8 @@ async def test_run_extraction(
     mock_separate,
     mock_fetch_save,
     mock_process,
+    mock_get_ws,
+    mock_read_pdf,
     mock_file_open,
     mock_json_dump,
     mock_entry
@@ -227,12 +339,16 @@ async def test_run_extraction(
     }
     mock_fetch_save.return_value = updated_heuristics
 
-    def process_side_effect(entry, heuristics):
+    mock_read_pdf.side_effect = lambda path: path.name.encode()
+    wordspaces = {b"good.pdf": MagicMock(), b"bad.pdf": MagicMock()}
+    mock_get_ws.side_effect = wordspaces.get
+
+    def process_side_effect(entry, heuristics, wordspace):
         if entry.label == "good_label":
-            return {"field1": "data1"}
+            return EntryResult({"field1": "data1"})
         if entry.label == "bad_label":
-            return {"field2": "data2"}
-        return {}
+            return EntryResult({"field2": "data2"})
+        return EntryResult({})
 
     mock_process.side_effect = process_side_effect
 
@@ -246,8 +362,8 @@ async def test_run_extraction(
     await run_extraction(dataset_path, output_path, 3, False)
 
     assert mock_process.call_count == 2
-    mock_process.assert_any_call(mock_entry_good, initial_heuristics)
-    mock_process.assert_any_call(mock_entry_bad, updated_heuristics)
+    mock_process.assert_any_call(mock_entry_good, initial_heuristics, wordspaces[b"good.pdf"])
+    mock_process.assert_any_call(mock_entry_bad, updated_heuristics, wordspaces[b"bad.pdf"])
 
     mock_fetch_save.assert_called_once_with(
         [mock_entry_bad], initial_heuristics, 3, False
@@ -270,3 +386,153 @@ async def test_run_extraction(
     mock_json_dump.assert_called_once_with(
         expected_results, mock_file_open(), indent=2, ensure_ascii=False
     )
+
+
+def test_result_record_moves_timeouts_out_of_extraction(mock_entry):
+    with patch("rich.print"):
+        record = _result_record(mock_entry, Path("dummy/dataset.json"), EntryResult(
+            {"field1": "data1", "field2": None}, ["field2"]
+        ))
+
+    assert record["extraction"] == {"field1": "data1", "field2": None}
+    assert record["timed_out"] == ["field2"]
+
+
+@pytest.mark.asyncio
+@patch("json.dump")
+@patch("builtins.open", new_callable=mock_open)
+@patch("rich.print")
+@patch("pdfse.core.read_pdf")
+@patch("pdfse.core.process_entry")
+@patch("pdfse.core.fetch_and_save_missing_heuristics", new_callable=AsyncMock)
+@patch("pdfse.core.load_heuristics_cache")
+@patch("pdfse.core.load_dataset")
+async def test_run_extraction_unreadable_pdf(
+    mock_load_dataset,
+    mock_load_cache,
+    mock_fetch_save,
+    mock_process,
+    mock_read_pdf,
+    mock_rich_print,
+    mock_file_open,
+    mock_json_dump,
+    mock_entry
+):
+    mock_load_dataset.return_value = [mock_entry]
+    mock_load_cache.return_value = {"test_label": {"field1": [], "field2": []}}
+    mock_fetch_save.return_value = mock_load_cache.return_value
+    mock_read_pdf.side_effect = FileNotFoundError("no such file")
+
+    run_metrics = configure_metrics()
+    try:
+        await run_extraction(Path("dummy/dataset.json"), Path("dummy/output.json"), 3, False)
+    finally:
+        configure_metrics(enabled=False)
+
+    mock_process.assert_not_called()
+    counters = run_metrics.as_dict()["counters"]
+    assert counters["pdfse_documents_total"] == 1
+    assert counters['pdfse_heuristic_cache_entries_total{result="hit"}'] == 1
+    assert counters['pdfse_failures_total{stage="reading"}'] == 1
+    ((results, *_), _) = mock_json_dump.call_args
+    assert results == [{
+        "label": "test_label",
+        "pdf_path": "test.pdf",
+        "extraction": {"field1": None, "field2": None}
+    }]
+
+
+@pytest.mark.asyncio
+@patch("rich.print")
+@patch("pdfse.core.read_pdf")
+@patch("pdfse.core.get_pdf_wordspace")
+@patch("pdfse.core.process_entry")
+@patch("pdfse.core.fetch_and_save_missing_heuristics", new_callable=AsyncMock)
+@patch("pdfse.core.load_heuristics_cache")
+@patch("pdfse.core.load_dataset")
+async def test_run_extraction_serves_unchanged_fields_from_result_cache(
+    mock_load_dataset,
+    mock_load_cache,
+    mock_fetch_save,
+    mock_process,
+    mock_get_ws,
+    mock_read_pdf,
+    mock_rich_print,
+    tmp_path
+):
+    plan = [{"type": "command", "name": "collect", "args": {}}]
+    heuristics = {"label": {"field1": plan}}
+    mock_load_cache.return_value = heuristics
+    mock_fetch_save.return_value = heuristics
+    mock_read_pdf.return_value = b"%PDF"
+    mock_process.side_effect = lambda entry, heuristics, wordspace: EntryResult({
+        field: f"{field} value" for field in entry.extraction_schema
+    })
+    dataset = tmp_path / "dataset.json"
+    output = tmp_path / "output.json"
+
+    def entry(schema):
+        return Entry(id=1, label="label", pdf_path=tmp_path / "doc.pdf", extraction_schema=schema)
+
+    configure_result_cache(tmp_path / "results.db")
+    try:
+        mock_load_dataset.return_value = [entry({"field1": ""})]
+        await run_extraction(dataset, output, 3, False)
+        assert mock_process.call_count == 1
+
+        # Served entirely from cache: nothing is parsed or executed
+        mock_process.reset_mock()
+        mock_get_ws.reset_mock()
+        await run_extraction(dataset, output, 3, False)
+        mock_process.assert_not_called()
+        mock_get_ws.assert_not_called()
+
+        # A new field executes alone
+        heuristics["label"]["field2"] = plan
+        mock_load_dataset.return_value = [entry({"field1": "", "field2": ""})]
+        await run_extraction(dataset, output, 3, False)
+        ((executed, *_), _) = mock_process.call_args
+        assert executed.extraction_schema == {"field2": ""}
+        assert json.loads(output.read_text())[0]["extraction"] == {"field1": "field1 value", "field2": "field2 value"}
+    finally:
+        configure_result_cache(None)
+
+
+@pytest.mark.asyncio
+@patch("rich.print")
+@patch("pdfse.core.read_pdf")
+@patch("pdfse.core.get_pdf_wordspace")
+@patch("pdfse.core.process_entry")
+@patch("pdfse.core.fetch_and_save_missing_heuristics", new_callable=AsyncMock)
+@patch("pdfse.core.load_heuristics_cache")
+@patch("pdfse.core.load_dataset")
+async def test_run_extraction_does_not_cache_failed_executions(
+    mock_load_dataset,
+    mock_load_cache,
+    mock_fetch_save,
+    mock_process,
+    mock_get_ws,
+    mock_read_pdf,
+    mock_rich_print,
+    tmp_path
+):
+    heuristics = {"label": {"field1": [{"type": "command", "name": "collect", "args": {}}]}}
+    mock_load_cache.return_value = heuristics
+    mock_fetch_save.return_value = heuristics
+    mock_read_pdf.return_value = b"%PDF"
+    mock_load_dataset.return_value = [
+        Entry(id=1, label="label", pdf_path=tmp_path / "doc.pdf", extraction_schema={"field1": ""})
+    ]
+    output = tmp_path / "output.json"
+
+    configure_result_cache(tmp_path / "results.db")
+    try:
+        mock_process.return_value = EntryResult({"field1": None}, failed=True)
+        await run_extraction(tmp_path / "dataset.json", output, 3, False)
+
+        mock_process.return_value = EntryResult({"field1": "value"})
+        await run_extraction(tmp_path / "dataset.json", output, 3, False)
+        assert mock_process.call_count == 2
+        assert json.loads(output.read_text())[0]["extraction"] == {"field1": "value"}
+    finally:
+        configure_result_cache(None)
@@ -0,0 +1,132 @@
+import asyncio
+import json
+import fitz
+import pytest
+from pathlib import Path
+from unittest.mock import AsyncMock, patch
+from pdfse.distributed import WorkDir, post_job, run_coordinator, run_worker, split_chunks
+from pdfse.models import Entry
+from pdfse.store import open_store
+
+
+def _entries(labels: list[str]) -> list[Entry]:
+    return [
+        Entry(id=i, label=label, pdf_path=Path(f"/data/{i}.pdf"), extraction_schema={"nome": "Nome"})
+        for i, label in enumerate(labels, start=1)
+    ]
+
+
+def _records(entries, dataset, samples, image_mode):
+    return [
+        {"label": entry.label, "pdf_path": entry.pdf_path.name, "extraction": {"nome": str(entry.id)}}
+        for entry in entries
+    ]
+
+
+def test_split_chunks_keeps_labels_together():
+    entries = _entries(["b", "a", "b", "a", "b", "c"])
+    chunks = split_chunks(entries, 2)
+    assert [[entry.id for entry in chunk] for chunk in chunks] == [[2, 4], [1, 3], [5], [6]]
+
+
+@pytest.mark.asyncio
+async def test_worker_executes_every_chunk(tmp_path):
+    workdir = WorkDir(tmp_path)
+    job = post_job(workdir, Path("/data/dataset.json"), _entries(["a", "a", "b"]), 3, False, 2, 3)
+    assert job["chunks"] == 2
+
+    with patch("pdfse.distributed.extract_entries", new_callable=AsyncMock) as mock_extract:
+        mock_extract.side_effect = _records
+        executed = await run_worker(workdir, poll_interval=0.01)
+
+    assert executed == 2
+    assert workdir.finished(job) == 2
+    assert [r["extraction"]["nome"] for r in workdir.result(job, 0)] == ["1", "2"]
+
+
+@pytest.mark.asyncio
+async def test_worker_skips_claimed_chunks_and_retries_failures(tmp_path):
+    workdir = WorkDir(tmp_path)
+    job = post_job(workdir, Path("/data/dataset.json"), _entries(["a", "b"]), 3, False, 1, 3)
+
+    # Another worker holds chunk 0 and dies after the first one is done
+    other = workdir.claim_lock(0)
+    assert other.try_acquire()
+    calls = []
+
+    async def extract(entries, dataset, samples, image_mode):
+        calls.append(entries[0].id)
+        if len(calls) == 1:
+            raise RuntimeError("LLM unavailable")
+        if len(calls) == 2:
+            other.release()
+        return _records(entries, dataset, samples, image_mode)
+
+    with patch("pdfse.distributed.extract_entries", side_effect=extract):
+        await asyncio.wait_for(run_worker(workdir, poll_interval=0.01), timeout=5)
+
+    assert calls == [2, 2, 1]
+    assert workdir.attempts_path(1).read_text() == "2"
+    assert workdir.finished(job) == 2
+
+
+@pytest.mark.asyncio
+async def test_worker_gives_up_after_max_attempts(tmp_path):
+    workdir = WorkDir(tmp_path)
+    job = post_job(workdir, Path("/data/dataset.json"), _entries(["a"]), 3, False, 1, 2)
+    workdir.attempts_path(0).parent.mkdir(parents=True)
+    workdir.attempts_path(0).write_text("2")
+
+    with patch("pdfse.distributed.extract_entries", new_callable=AsyncMock) as mock_extract:
+        await run_worker(workdir, poll_interval=0.01)
+
+    mock_extract.assert_not_called()
+    assert workdir.result(job, 0) == [{"label": "a", "pdf_path": "1.pdf", "extraction": {"nome": None}}]
+
+
+def test_results_of_previous_job_are_ignored(tmp_path):
+    workdir = WorkDir(tmp_path)
+    first = post_job(workdir, Path("/data/dataset.json"), _entries(["a"]), 3, False, 1, 3)
+    workdir.result_path(0).parent.mkdir(parents=True)
+    workdir.result_path(0).write_text(json.dumps({"job": first["id"], "records": []}))
+    second = post_job(workdir, Path("/data/dataset.json"), _entries(["a"]), 3, False, 1, 3)
+    assert workdir.finished(first) == 1
+    assert workdir.finished(second) == 0
+
+
+def test_coordinator_with_local_workers(tmp_path):
+    """
+    End to end on one host: two worker processes, cached heuristics, real PDFs.
+    """
+    dataset = []
+    for i in range(5):
+        doc = fitz.open()
+        doc.new_page().insert_text((72, 72), f"Nome: PESSOA{i}")
+        doc.save(tmp_path / f"doc{i}.pdf")
+        doc.close()
+        dataset.append({"label": "ficha", "pdf_path": f"doc{i}.pdf", "extraction_schema": {"nome": "Nome"}})
+    (tmp_path / "dataset.json").write_text(json.dumps(dataset))
+    cache = tmp_path / "heuristics.db"
+    store = open_store(cache)
+    store.upsert({"ficha": {"nome": [
+        {"type": "command", "name": "anchor_to_text", "args": {"text": "Nome:"}},
+        {"type": "command", "name": "move_right", "args": {}},
+        {"type": "command", "name": "collect", "args": {}},
+    ]}})
+
+    output = tmp_path / "output.json"
+    run_coordinator(
+        tmp_path / "dataset.json",
+        output,
+        WorkDir(tmp_path / "work"),
+        samples=1,
+        image_mode=False,
+        chunk_size=2,
+        local_workers=2,
+        worker_args=["--cache", str(cache), "--poll-interval", "0.05"],
+        poll_interval=0.05,
+    )
+
+    results = json.loads(output.read_text())
+    assert [r["pdf_path"] for r in results] == [f"doc{i}.pdf" for i in range(5)]
+    assert [r["extraction"]["nome"] for r in results] == [f"PESSOA{i}" for i in range(5)]
@@ -0,0 +1,206 @@
+import asyncio
+import threading
+import fitz
+import pytest
+from pathlib import Path
+from unittest.mock import AsyncMock, patch
+from pdfse import Extractor
+from pdfse.batch import BatchExecutor
+from pdfse.machine import ExecutionConfig
+from pdfse.models import DatasetEntry
+from pdfse.pdf import get_pdf_wordspace
+from pdfse.store import open_store
+
+
+def _plan(label: str) -> list[dict]:
+    return [
+        {"type": "command", "name": "anchor_to_text", "args": {"text": label}},
+        {"type": "command", "name": "move_right", "args": {}},
+        {"type": "command", "name": "collect", "args": {}},
+    ]
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    paths = []
+    for i in range(6):
+        path = tmp_path / f"doc{i}.pdf"
+        doc = fitz.open()
+        page = doc.new_page()
+        page.insert_text((72, 72), f"Nome: PESSOA{i}")
+        page.insert_text((72, 96), f"CPF: {i}{i}{i}")
+        doc.save(path)
+        doc.close()
+        paths.append(path)
+    cache = tmp_path / "heuristics.db"
+    open_store(cache).upsert({"ficha": {"nome": _plan("Nome:")}})
+    return cache, paths
+
+
+def _entry(path: Path, **schema: str) -> DatasetEntry:
+    return DatasetEntry(label="ficha", pdf_path=path, extraction_schema=schema or {"nome": "Nome"})
+
+
+def test_extract_keeps_parses_and_plans_warm(corpus):
+    cache, paths = corpus
+    with Extractor(cache, check_interval=0) as extractor, \
+            patch("pdfse.extractor.get_pdf_wordspace", wraps=get_pdf_wordspace) as parse, \
+            patch("pdfse.extractor.BatchExecutor", wraps=BatchExecutor) as compile_plan:
+        assert extractor.extract(_entry(paths[0])) == {"nome": "PESSOA0"}
+        assert extractor.extract(_entry(paths[0])) == {"nome": "PESSOA0"}
+        assert extractor.extract(_entry(paths[1])) == {"nome": "PESSOA1"}
+        assert parse.call_count == 2
+        assert compile_plan.call_count == 1
+
+        # From bytes, without a readable file
+        data = paths[2].read_bytes()
+        assert extractor.extract(_entry(Path("upload.pdf")), data) == {"nome": "PESSOA2"}
+        assert extractor.extract(_entry(Path("other.pdf")), data) == {"nome": "PESSOA2"}
+        assert parse.call_count == 3
+
+
+def test_extract_picks_up_heuristics_written_elsewhere(corpus):
+    cache, paths = corpus
+    with Extractor(cache, check_interval=0, generate_missing=False) as extractor:
+        entry = _entry(paths[0], nome="Nome", cpf="CPF")
+        assert extractor.extract(entry) == {"nome": "PESSOA0", "cpf": None}
+        open_store(cache).upsert({"ficha": {"cpf": _plan("CPF:")}})
+        assert extractor.extract(entry) == {"nome": "PESSOA0", "cpf": "000"}
+
+
+def test_extract_generates_missing_heuristics_once(corpus):
+    cache, paths = corpus
+
+    async def generate(entries, heuristics, samples, image_mode):
+        assert [entry.pdf_path for entry in entries] == [paths[0]]
+        open_store(cache).upsert({"ficha": {"cpf": _plan("CPF:")}})
+        return heuristics
+
+    with Extractor(cache, check_interval=3600) as extractor, \
+            patch("pdfse.extractor.fetch_and_save_missing_heuristics", side_effect=generate) as fetch:
+        assert extractor.extract(_entry(paths[0], cpf="CPF")) == {"cpf": "000"}
+        assert extractor.extract(_entry(paths[1], cpf="CPF")) == {"cpf": "111"}
+    assert fetch.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_wait_for_generation_in_flight(corpus):
+    cache, paths = corpus
+
+    async def generate(entries, heuristics, *_):
+        await asyncio.sleep(0.05)
+        open_store(cache).upsert({"ficha": {"cpf": _plan("CPF:")}})
+        return heuristics
+
+    with Extractor(cache, check_interval=3600) as extractor, \
+            patch("pdfse.extractor.fetch_and_save_missing_heuristics", side_effect=generate) as fetch:
+        results = await asyncio.gather(*[extractor.extract_async(_entry(path, cpf="CPF")) for path in paths[:3]])
+    assert results == [{"cpf": "000"}, {"cpf": "111"}, {"cpf": "222"}]
+    assert fetch.call_count == 1
+
+
+def test_threads_wait_for_generation_in_flight(corpus):
+    cache, paths = corpus
+    started = threading.Event()
+    release = threading.Event()
+
+    async def generate(entries, heuristics, *_):
+        started.set()
+        await asyncio.to_thread(release.wait, 5)
+        open_store(cache).upsert({"ficha": {"cpf": _plan("CPF:")}})
+        return heuristics
+
+    results = {}
+    with Extractor(cache, check_interval=3600) as extractor, \
+            patch("pdfse.extractor.fetch_and_save_missing_heuristics", side_effect=generate) as fetch:
+        def run(i):
+            results[i] = extractor.extract(_entry(paths[i], cpf="CPF"))
+
+        first = threading.Thread(target=run, args=(0,))
+        first.start()
+        assert started.wait(5)
+        second = threading.Thread(target=run, args=(1,))
+        second.start()
+        second.join(0.1)
+        # Blocked on the first thread's generation, not returning all-None
+        assert second.is_alive()
+        release.set()
+        first.join(5)
+        second.join(5)
+    assert results == {0: {"cpf": "000"}, 1: {"cpf": "111"}}
+    assert fetch.call_count == 1
+
+
+def test_failed_generation_is_retried_after_backoff(corpus):
+    cache, paths = corpus
+    with Extractor(cache, retry_after=3600) as extractor, \
+            patch("pdfse.extractor.fetch_and_save_missing_heuristics", new_callable=AsyncMock) as fetch, \
+            patch("rich.print"):
+        fetch.side_effect = ConnectionError("LLM unreachable")
+        assert extractor.extract(_entry(paths[0], cpf="CPF")) == {"cpf": None}
+        assert extractor.extract(_entry(paths[1], cpf="CPF")) == {"cpf": None}
+        assert fetch.call_count == 1
+
+        # Once the backoff is over, generation runs again and sticks
+        extractor.retry_after = 0
+        extractor._attempted = {key: 0.0 for key in extractor._attempted}
+
+        async def generate(entries, heuristics, *_):
+            open_store(cache).upsert({"ficha": {"cpf": _plan("CPF:")}})
+            return heuristics
+
+        fetch.side_effect = generate
+        assert extractor.extract(_entry(paths[1], cpf="CPF")) == {"cpf": "111"}
+        assert extractor.extract(_entry(paths[2], cpf="CPF")) == {"cpf": "222"}
+        assert fetch.call_count == 2
+
+
+def test_timeouts_are_not_returned_as_fields(corpus):
+    cache, paths = corpus
+    config = ExecutionConfig(field_timeout=1e-9)
+    with Extractor(cache, config=config) as extractor, patch("rich.print") as mock_print:
+        assert extractor.extract(_entry(paths[0])) == {"nome": None}
+    assert "ran out of time" in str(mock_print.call_args)
+
+
+def test_plans_are_cached_by_content(corpus):
+    cache, paths = corpus
+    with Extractor(cache, check_interval=0) as extractor, \
+            patch("pdfse.extractor.BatchExecutor", wraps=BatchExecutor) as compile_plan:
+        extractor.extract(_entry(paths[0]))
+        assert compile_plan.call_count == 1
+        # Same content in new lists: the compiled plan is reused
+        extractor._plan("ficha", {"nome": _plan("Nome:")})
+        assert compile_plan.call_count == 1
+        extractor._plan("ficha", {"nome": _plan("CPF:")})
+        assert compile_plan.call_count == 2
+
+
+def test_extract_many_orders(corpus):
+    cache, paths = corpus
+    entries = [_entry(path) for path in paths]
+    with Extractor(cache, max_workers=3) as extractor:
+        ordered = list(extractor.extract_many(iter(entries), window=2))
+        assert [entry for entry, _ in ordered] == entries
+        assert [result["nome"] for _, result in ordered] == [f"PESSOA{i}" for i in range(6)]
+
+        unordered = list(extractor.extract_many(entries, ordered=False, window=2))
+        assert sorted(result["nome"] for _, result in unordered) == [f"PESSOA{i}" for i in range(6)]
+
+
+def test_unreadable_pdf_gives_empty_fields(corpus):
+    cache, _ = corpus
+    with Extractor(cache) as extractor:
+        assert extractor.extract(_entry(Path("missing.pdf"))) == {"nome": None}
+
+
+@pytest.mark.asyncio
+async def test_async_variants(corpus):
+    cache, paths = corpus
+    entries = [_entry(path) for path in paths]
+    with Extractor(cache, max_workers=2) as extractor:
+        assert await extractor.extract_async(entries[3]) == {"nome": "PESSOA3"}
+        results = [pair async for pair in extractor.extract_many_async(entries)]
+        assert [result["nome"] for _, result in results] == [f"PESSOA{i}" for i in range(6)]
+        results = [pair async for pair in extractor.extract_many_async(entries, ordered=False)]
+        assert len(results) == 6
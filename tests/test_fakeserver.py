@@ -0,0 +1,76 @@
+import openai
+import pytest
+
+from pdfse import llm as pdfse_llm
+from pdfse.fakeserver import FakeOpenAIServer, FakeServerConfig, response_for_request
+
+
+@pytest.fixture
+def fake_server():
+    with FakeOpenAIServer() as server:
+        yield server
+
+
+@pytest.fixture
+def client_for(monkeypatch):
+    def configure(server: FakeOpenAIServer):
+        monkeypatch.setattr(pdfse_llm, "_client", None)
+        pdfse_llm.configure_client(base_url=server.base_url, api_key="test")
+    yield configure
+    pdfse_llm._client = None
+
+
+@pytest.mark.asyncio
+async def test_fetch_heuristic_over_http(fake_server, client_for):
+    client_for(fake_server)
+
+    heuristic = await pdfse_llm.fetch_heuristic(
+        {"nome": "Name", "inscricao": "Inscription"}, ["Nome: GOKU {not json"], image_mode=False
+    )
+
+    assert set(heuristic) == {"nome", "inscricao"}
+    assert heuristic["nome"][0]["name"] == "anchor_to_text"
+    assert fake_server.stats.requests == 1
+    assert fake_server.stats.bytes_received > 0
+
+
+@pytest.mark.asyncio
+async def test_fetch_bundled_heuristics_over_http(fake_server, client_for):
+    client_for(fake_server)
+
+    heuristics = await pdfse_llm.fetch_bundled_heuristics([
+        ("label_a", {"nome": "Name"}, ["Sample A"]),
+        ("label_b", {"cpf": "Tax ID"}, ["Sample B"]),
+    ], image_mode=False)
+
+    assert set(heuristics) == {"label_a", "label_b"}
+    assert set(heuristics["label_b"]) == {"cpf"}
+
+
+@pytest.mark.asyncio
+async def test_error_rate(client_for):
+    with FakeOpenAIServer(config=FakeServerConfig(error_rate=1.0, seed=1)) as server:
+        client_for(server)
+        with pytest.raises((openai.RateLimitError, openai.InternalServerError)):
+            await pdfse_llm.fetch_heuristic({"nome": "Name"}, ["Sample"], image_mode=False)
+        assert server.stats.errors == 1
+
+
+@pytest.mark.asyncio
+async def test_stats_report_latency_percentiles(client_for):
+    with FakeOpenAIServer(config=FakeServerConfig(latency=0.02)) as server:
+        client_for(server)
+        for _ in range(3):
+            await pdfse_llm.fetch_heuristic({"nome": "Name"}, ["Sample"], image_mode=False)
+        stats = server.stats.as_dict()
+
+    assert stats["latency"]["count"] == 3
+    assert stats["latency"]["p50"] == stats["latency"]["p99"] == 0.02
+    assert stats["mean_latency"] == pytest.approx(0.02)
+
+
+def test_response_for_request_derives_schema():
+    body = {"messages": [{"role": "user", "content": [
+        {"type": "text", "text": 'Here is the extraction schema:\n{"nome": "Name"}'}
+    ]}]}
+    assert set(response_for_request(body)) == {"nome"}
@@ -0,0 +1,63 @@
+import pytest
+from pathlib import Path
+from unittest.mock import patch
+
+from pdfse.wordspace import Word, WordSpace
+from pdfse.fingerprint import layout_fingerprint, fingerprint_distance, select_diverse
+from pdfse.extract import select_sample_paths
+
+
+def _wordspace(*positions: tuple[str, float, float]) -> WordSpace:
+    words = [Word(text, (x, y, x + 10, y + 10)) for text, x, y in positions]
+    return WordSpace(words, 100, 100)
+
+
+TOP_LAYOUT = _wordspace(("Nome:", 5, 5), ("Goku", 20, 5), ("CPF:", 5, 15), ("123", 20, 15))
+TOP_LAYOUT_COPY = _wordspace(("Nome:", 6, 5), ("Vegeta", 20, 5), ("CPF:", 6, 15), ("456", 20, 15))
+BOTTOM_LAYOUT = _wordspace(("Nome:", 60, 80), ("Gohan", 75, 80), ("CPF:", 60, 90), ("789", 75, 90))
+
+
+def test_fingerprint_is_normalized():
+    fingerprint = layout_fingerprint(TOP_LAYOUT)
+    half = len(fingerprint) // 2
+    assert abs(sum(fingerprint[:half]) - 1) < 1e-9
+    assert abs(sum(fingerprint[half:]) - 1) < 1e-9
+
+
+def test_fingerprint_of_empty_page():
+    assert not any(layout_fingerprint(WordSpace([], 100, 100)))
+
+
+def test_similar_layouts_are_closer():
+    top = layout_fingerprint(TOP_LAYOUT)
+    assert fingerprint_distance(top, layout_fingerprint(TOP_LAYOUT_COPY)) == 0
+    assert fingerprint_distance(top, layout_fingerprint(BOTTOM_LAYOUT)) > 0
+
+
+def test_select_diverse_covers_both_layouts():
+    fingerprints = {
+        "a": layout_fingerprint(TOP_LAYOUT),
+        "b": layout_fingerprint(TOP_LAYOUT_COPY),
+        "c": layout_fingerprint(TOP_LAYOUT),
+        "d": layout_fingerprint(BOTTOM_LAYOUT),
+    }
+    selected = select_diverse(fingerprints, 2)
+    assert len(selected) == 2
+    assert "d" in selected
+    assert select_diverse(fingerprints, 10) == ["a", "b", "c", "d"]
+
+
+@pytest.mark.asyncio
+@patch("pdfse.extract.get_pdf_wordspace")
+async def test_select_sample_paths(mock_get_ws):
+    layouts = {
+        Path("a.pdf"): TOP_LAYOUT,
+        Path("b.pdf"): TOP_LAYOUT_COPY,
+        Path("c.pdf"): BOTTOM_LAYOUT,
+    }
+    mock_get_ws.side_effect = lambda path: layouts[path]
+
+    selected = await select_sample_paths(list(layouts), 2)
+
+    assert len(selected) == 2
+    assert Path("c.pdf") in selected
@@ -0,0 +1,117 @@
+import json
+import fitz
+from pdfse.golden import GoldenReport, compare_latency, percentile, run_golden, save_golden
+
+NOME = [
+    {"type": "command", "name": "anchor_to_text", "args": {"text": "Nome:"}},
+    {"type": "command", "name": "move_right", "args": {}},
+    {"type": "command", "name": "collect", "args": {}},
+]
+
+
+def _corpus(tmp_path):
+    dataset = []
+    for i in range(3):
+        doc = fitz.open()
+        doc.new_page().insert_text((72, 72), f"Nome: PESSOA{i}")
+        doc.save(tmp_path / f"doc{i}.pdf")
+        doc.close()
+        dataset.append({"label": "ficha", "pdf_path": f"doc{i}.pdf", "extraction_schema": {"nome": "Nome"}})
+    (tmp_path / "dataset.json").write_text(json.dumps(dataset))
+    (tmp_path / "heuristics.json").write_text(json.dumps({"ficha": {"nome": NOME}}))
+    return tmp_path
+
+
+def test_percentile():
+    values = [float(v) for v in range(1, 101)]
+    assert percentile(values, 0.5) == 50.0
+    assert percentile(values, 0.95) == 95.0
+    assert percentile(values, 1.0) == 100.0
+    assert percentile([3.0], 0.99) == 3.0
+    assert percentile([], 0.5) == 0.0
+
+
+def test_golden_round_trip(tmp_path):
+    corpus = _corpus(tmp_path)
+    report, outputs = run_golden(corpus, repeat=2)
+    # Nothing saved yet: every field is a mismatch
+    assert not report.passed
+    assert outputs["ficha:doc1.pdf"] == {"nome": "PESSOA1"}
+
+    save_golden(corpus, outputs)
+    report, _ = run_golden(corpus, repeat=2)
+    assert report.passed
+    summary = report.as_dict()
+    assert summary["labels"]["ficha"] == {
+        "documents": 3, "exact_documents": 3, "fields": 3, "matched": 3, "accuracy": 1.0
+    }
+    assert summary["latency"]["execute"]["count"] == 6
+    assert summary["peak_traced_bytes"] > 0
+    assert summary["peak_rss_bytes"] > 0
+
+
+def test_golden_keys_entries_by_label_and_path(tmp_path):
+    (tmp_path / "corpus").mkdir()
+    corpus = _corpus(tmp_path / "corpus")
+    outside = tmp_path / "shared.pdf"
+    (corpus / "doc1.pdf").rename(outside)
+    dataset = json.loads((corpus / "dataset.json").read_text())
+    # A PDF given by absolute path outside the corpus, and the same PDF
+    # under another label
+    dataset[1]["pdf_path"] = str(outside)
+    dataset.append({"label": "outra", "pdf_path": "doc0.pdf", "extraction_schema": {"nome": "Nome"}})
+    (corpus / "dataset.json").write_text(json.dumps(dataset))
+    (corpus / "heuristics.json").write_text(json.dumps({"ficha": {"nome": NOME}, "outra": {}}))
+
+    report, outputs = run_golden(corpus, measure_memory=False)
+    assert outputs["ficha:doc0.pdf"] == {"nome": "PESSOA0"}
+    assert outputs["outra:doc0.pdf"] == {"nome": None}
+    assert outputs[f"ficha:{outside.as_posix()}"] == {"nome": "PESSOA1"}
+    save_golden(corpus, outputs)
+
+    report, _ = run_golden(corpus, measure_memory=False)
+    assert report.passed
+    assert report.labels["ficha"].documents == 3
+
+
+def test_golden_reports_changed_output(tmp_path):
+    corpus = _corpus(tmp_path)
+    _, outputs = run_golden(corpus, measure_memory=False)
+    outputs["ficha:doc2.pdf"]["nome"] = "OUTRA PESSOA"
+    save_golden(corpus, outputs)
+
+    report, _ = run_golden(corpus, measure_memory=False)
+    assert report.mismatches == [("ficha:doc2.pdf", "nome", "OUTRA PESSOA", "PESSOA2")]
+    assert report.labels["ficha"].exact_documents == 2
+    assert report.labels["ficha"].accuracy == 2 / 3
+
+
+def test_golden_records_unreadable_pdfs(tmp_path):
+    corpus = _corpus(tmp_path)
+    _, outputs = run_golden(corpus, measure_memory=False)
+    save_golden(corpus, outputs)
+    (corpus / "doc1.pdf").write_bytes(b"not a pdf")
+    (corpus / "doc2.pdf").unlink()
+
+    report, outputs = run_golden(corpus, repeat=2)
+    assert outputs["ficha:doc0.pdf"] == {"nome": "PESSOA0"}
+    assert outputs["ficha:doc1.pdf"] == {"nome": None}
+    assert outputs["ficha:doc2.pdf"] == {"nome": None}
+    assert [key for key, _ in report.failed] == ["ficha:doc1.pdf", "ficha:doc2.pdf"]
+    assert report.mismatches == [
+        ("ficha:doc1.pdf", "nome", "PESSOA1", None),
+        ("ficha:doc2.pdf", "nome", "PESSOA2", None),
+    ]
+    assert not report.passed
+    assert report.as_dict()["failed"][0]["entry"] == "ficha:doc1.pdf"
+    # Latency only covers the documents that were processed
+    assert report.latency("execute")["count"] == 2
+
+
+def test_compare_latency():
+    report = GoldenReport()
+    report.latencies["parse"] = [0.010] * 10
+    report.latencies["execute"] = [0.002] * 10
+    baseline = {"latency": {"parse": {"p50": 0.005, "p95": 0.011}, "execute": {"p50": 0.002, "p95": 0.002}}}
+    assert compare_latency(report, baseline, 0.2) == ["parse p50: 0.005000s → 0.010000s"]
+    assert compare_latency(report, {}, 0.2) == []
@@ -0,0 +1,49 @@
+from pdfse.layout import LayoutEncoder, compact_line, compact_layout
+
+
+def test_compact_line():
+    assert compact_line("Nome:      SON GOKU        CPF:   123") == "Nome: | SON GOKU | CPF: | 123"
+    assert compact_line("        Inscrição  101943") == "  Inscrição  101943"
+    assert compact_line("     ") == ""
+
+
+def test_compact_layout_collapses_blank_lines():
+    text = "Header\n\n\n\nBody\n\n"
+    assert compact_layout(text) == ["Header", "", "Body"]
+
+
+def test_encode_dedupes_lines_across_samples():
+    encoder = LayoutEncoder(token_budget=None)
+    boilerplate = "\n".join([
+        "ORDEM DOS ADVOGADOS DO BRASIL",
+        "CONSELHO SECCIONAL DO PARANÁ",
+        "IDENTIDADE DE ADVOGADO",
+    ])
+    first = f"{boilerplate}\nNome:    GOKU\nSeccional"
+    second = f"{boilerplate}\nNome:    VEGETA\nSeccional"
+
+    encoded, report = encoder.encode([first, second], {"nome": "Name"})
+
+    assert encoded[0] == f"{boilerplate}\nNome: | GOKU\nSeccional"
+    # The boilerplate run becomes a marker, while "Seccional", shorter than
+    # any marker, is kept verbatim
+    assert encoded[1] == (
+        "[= 3 line(s) identical to an earlier sample]\n"
+        "Nome: | VEGETA\n"
+        "Seccional"
+    )
+    assert len(report.raw_tokens) == 2
+    assert report.total_encoded <= report.total_raw
+
+
+def test_encode_truncates_far_from_schema_terms():
+    filler = [f"padding row {i} lorem ipsum dolor sit amet" for i in range(200)]
+    text = "\n".join(filler[:100] + ["Inscrição:   101943"] + filler[100:])
+    encoder = LayoutEncoder(token_budget=60, dedupe=False)
+
+    encoded, report = encoder.encode([text], {"inscricao": "Inscription number"})
+
+    assert "Inscrição: | 101943" in encoded[0]
+    assert "lines omitted" in encoded[0]
+    assert "padding row 0 " not in encoded[0]
+    assert report.encoded_tokens[0] < report.raw_tokens[0]
@@ -31,6 +31,16 @@ def test_get_system_prompt_image_mode():
     assert pdfse_llm._COMMON_PROMPT_FOOTER in prompt
 
 
+def test_get_system_prompt_crop_rules_follow_crop_mode():
+    full = pdfse_llm.get_system_prompt(image_mode=True)
+    cropped = pdfse_llm.get_system_prompt(image_mode=True, cropped=True)
+    assert "dashed gray line" not in full
+    assert "dashed gray line" in cropped
+    assert cropped.index("move_first") < cropped.index(pdfse_llm._IMAGE_CROP_PROMPT)
+    assert pdfse_llm._IMAGE_CROP_PROMPT not in pdfse_llm.get_system_prompt(image_mode=False, cropped=True)
+    assert pdfse_llm._IMAGE_CROP_PROMPT in pdfse_llm.get_bundle_system_prompt(image_mode=True, cropped=True)
+
+
 @pytest.fixture
 def mock_openai_client():
     mock_response = MagicMock()
@@ -164,3 +174,31 @@ async def test_fetch_heuristic_no_response_content(mock_openai_client):
             await pdfse_llm.fetch_heuristic(
                 test_schema, test_samples, image_mode=False
             )
+
+
+@pytest.mark.asyncio
+async def test_fetch_bundled_heuristics(mock_openai_client):
+    mock_client, mock_create, mock_response = mock_openai_client
+
+    expected = {"label_a": {"name": []}, "label_b": {"cpf": []}}
+    mock_response.choices[0].message.content = json.dumps(expected)
+
+    bundle = [
+        ("label_a", {"name": "Name"}, ["Sample A"]),
+        ("label_b", {"cpf": "Tax ID"}, ["Sample B1", "Sample B2"]),
+    ]
+
+    with patch("pdfse.llm.get_client", return_value=mock_client):
+        result = await pdfse_llm.fetch_bundled_heuristics(bundle, image_mode=False)
+
+    assert result == expected
+
+    messages = mock_create.call_args[1]["messages"]
+    assert pdfse_llm._BUNDLE_PROMPT in messages[0]["content"]
+
+    user_content = messages[1]["content"]
+    assert len(user_content) == 5
+    assert 'LABEL "label_a"' in user_content[0]["text"]
+    assert "Sample A" in user_content[1]["text"]
+    assert 'LABEL "label_b"' in user_content[2]["text"]
+    assert "Sample B2" in user_content[4]["text"]
@@ -0,0 +1,134 @@
+import time
+import pytest
+from pdfse.wordspace import Word, WordSpace
+from pdfse.machine import ExecutionConfig, HeuristicMachine
+from pdfse.tracing import Tracer
+
+
+@pytest.fixture
+def sample_wordspace():
+    return WordSpace([
+        Word("Nome:", (10, 10, 30, 20)),
+        Word("GOKU", (40, 10, 60, 20)),
+        Word("CPF:", (10, 30, 30, 40)),
+        Word("123", (40, 30, 60, 40)),
+    ], 100, 100)
+
+
+HEURISTIC = {
+    "nome": [
+        {"type": "command", "name": "anchor_to_text", "args": {"text": "Nome:"}},
+        {"type": "command", "name": "move_right", "args": {}},
+        {"type": "command", "name": "collect", "args": {}},
+    ],
+    "cpf": [
+        {"type": "command", "name": "anchor_to_text", "args": {"text": "CPF:"}},
+        {"type": "command", "name": "move_right", "args": {"bad_arg": 1}},
+        {
+            "type": "loop",
+            "condition": {"name": "check_current_word_matches_regex", "args": {"pattern": "CPF"}},
+            "body": [{"type": "command", "name": "move_right", "args": {}}],
+        },
+        {"type": "command", "name": "collect", "args": {}},
+    ],
+}
+
+
+def test_run(sample_wordspace):
+    assert HeuristicMachine(sample_wordspace).run(HEURISTIC) == {"nome": "GOKU", "cpf": "123"}
+
+
+def test_tracing(sample_wordspace):
+    tracer = Tracer(record_events=True)
+    machine = HeuristicMachine(sample_wordspace)
+    machine.trace(tracer, "label")
+
+    assert machine.run(HEURISTIC) == {"nome": "GOKU", "cpf": "123"}
+
+    summary = tracer.summary()["label"]
+    assert set(summary["fields"]) == {"nome", "cpf"}
+    assert summary["commands"]["move_right"]["calls"] == 3
+    assert summary["commands"]["collect"]["calls"] == 2
+    assert summary["loops"] == {"count": 1, "iterations": 1, "max_iterations": 1, "stalled": 0}
+    ((where, count),) = summary["exceptions"].items()
+    assert where.startswith("move_right: TypeError")
+    assert count == 1
+
+    events = tracer.chrome_trace()["traceEvents"]
+    assert len(events) == 2 + 7
+    assert {event["cat"] for event in events} == {"field", "command"}
+    assert all("cursor" in event["args"] for event in events if event["cat"] == "command")
+
+
+def test_tracer_without_events(sample_wordspace):
+    tracer = Tracer()
+    machine = HeuristicMachine(sample_wordspace)
+    machine.trace(tracer, "label")
+    machine.run(HEURISTIC)
+
+    assert tracer.chrome_trace()["traceEvents"] == []
+    assert tracer.summary()["label"]["fields"]["nome"]["calls"] == 1
+
+
+def test_loop_without_progress_exits_early(sample_wordspace):
+    # move_left from the leftmost word leaves the cursor where it is
+    heuristic = {"nome": [
+        {"type": "command", "name": "anchor_to_text", "args": {"text": "Nome:"}},
+        {
+            "type": "loop",
+            "condition": {"name": "check_current_word_matches_regex", "args": {"pattern": "Nome"}},
+            "body": [{"type": "command", "name": "move_left", "args": {}}],
+        },
+        {"type": "command", "name": "collect", "args": {}},
+    ]}
+    tracer = Tracer()
+    machine = HeuristicMachine(sample_wordspace)
+    machine.trace(tracer, "label")
+
+    assert machine.run(heuristic) == {"nome": "Nome:"}
+    assert machine.stalled_loops == 1
+    assert tracer.summary()["label"]["loops"] == {"count": 1, "iterations": 1, "max_iterations": 1, "stalled": 1}
+
+
+def test_loop_cap_is_configurable(sample_wordspace):
+    # Collecting changes the buffer every iteration, so only the cap stops it
+    heuristic = {"nome": [
+        {"type": "command", "name": "anchor_to_text", "args": {"text": "GOKU"}},
+        {
+            "type": "loop",
+            "condition": {"name": "check_current_word_matches_regex", "args": {"pattern": "GOKU"}},
+            "body": [{"type": "command", "name": "collect", "args": {}}],
+        },
+    ]}
+    machine = HeuristicMachine(sample_wordspace, ExecutionConfig(max_loop_iterations=3))
+
+    assert machine.run(heuristic) == {"nome": "GOKU GOKU GOKU"}
+    assert machine.stalled_loops == 0
+
+
+def test_field_timeout_keeps_other_fields(sample_wordspace):
+    machine = HeuristicMachine(sample_wordspace, ExecutionConfig(field_timeout=0.01))
+    machine.methods["slow"] = lambda: time.sleep(0.05)
+    heuristic = {
+        "slow": [
+            {"type": "command", "name": "slow", "args": {}},
+            {"type": "command", "name": "anchor_to_text", "args": {"text": "CPF:"}},
+            {"type": "command", "name": "collect", "args": {}},
+        ],
+        "nome": HEURISTIC["nome"],
+    }
+
+    assert machine.run(heuristic) == {"slow": None, "nome": "GOKU"}
+    assert machine.timed_out == ["slow"]
+
+
+def test_document_timeout_skips_remaining_fields(sample_wordspace):
+    machine = HeuristicMachine(sample_wordspace, ExecutionConfig(document_timeout=0.01))
+    machine.methods["slow"] = lambda: time.sleep(0.05)
+    heuristic = {
+        "nome": [{"type": "command", "name": "slow", "args": {}}] + HEURISTIC["nome"],
+        "cpf": HEURISTIC["cpf"],
+    }
+
+    assert machine.run(heuristic) == {"nome": None, "cpf": None}
+    assert machine.timed_out == ["nome", "cpf"]
@@ -0,0 +1,100 @@
+import asyncio
+import threading
+import time
+import fitz
+import pytest
+from pdfse.memory import GlobalMemoryBudget, MemoryMonitor, parse_bytes, parse_bytes_of, render_bytes, PARSE_MIN_BYTES
+from pdfse.pdf import page_size, render_pdf, render_pdf_text
+
+
+def test_render_bytes_letter_at_300_dpi():
+    pixmap = 2550 * 3300 * 3
+    assert render_bytes(612, 792) == pixmap + pixmap // 2
+    assert render_bytes(612, 792, dpi=150) == render_bytes(612, 792) // 4
+
+
+def test_parse_bytes_has_a_floor():
+    assert parse_bytes(0) == PARSE_MIN_BYTES
+    assert parse_bytes(10 * PARSE_MIN_BYTES) == 40 * PARSE_MIN_BYTES
+
+
+def test_parse_bytes_of_sizes_from_the_file(tmp_path):
+    pdf = tmp_path / "big.pdf"
+    pdf.write_bytes(b"%" * (2 * PARSE_MIN_BYTES))
+    assert parse_bytes_of(pdf) == parse_bytes(2 * PARSE_MIN_BYTES)
+    assert parse_bytes_of(tmp_path / "missing.pdf") == PARSE_MIN_BYTES
+
+
+def _tracking():
+    running = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def work():
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        time.sleep(0.02)
+        with lock:
+            running -= 1
+
+    return work, lambda: peak
+
+
+def test_global_budget_throttles_across_event_loops():
+    budget = GlobalMemoryBudget(10)
+    for _ in range(2):
+        work, peak = _tracking()
+
+        async def main():
+            await asyncio.gather(*[budget.run("parse", 6, work) for _ in range(4)])
+
+        asyncio.run(main())
+        assert peak() == 1
+
+    work, peak = _tracking()
+
+    async def small():
+        await asyncio.gather(*[budget.run("parse", 5, work) for _ in range(4)])
+
+    asyncio.run(small())
+    assert peak() == 2
+
+
+@pytest.mark.asyncio
+async def test_oversized_reservation_runs_alone():
+    budget = GlobalMemoryBudget(10)
+    assert await budget.run("render", 100, lambda: "done") == "done"
+
+
+def test_memory_monitor_accounts_phases():
+    monitor = MemoryMonitor(interval=0.01, trace_python=True).start()
+    try:
+        with monitor.phase("parse"):
+            data = [bytearray(1024) for _ in range(1000)]
+            time.sleep(0.03)
+        with monitor.phase("parse"):
+            pass
+    finally:
+        monitor.stop()
+    del data
+    report = monitor.as_dict()
+    assert report["phases"]["parse"]["calls"] == 2
+    assert report["phases"]["parse"]["peak_rss_bytes"] > 0
+    assert report["phases"]["parse"]["peak_traced_bytes"] >= 1024 * 1000
+    assert report["peak_rss_bytes"] >= report["phases"]["parse"]["peak_rss_bytes"]
+
+
+def test_renders_close_their_documents(tmp_path):
+    path = tmp_path / "page.pdf"
+    doc = fitz.open()
+    doc.new_page(width=300, height=200).insert_text((20, 50), "Nome: SON GOKU")
+    doc.save(path)
+    doc.close()
+
+    assert page_size(path) == (300, 200)
+    for render in (render_pdf, render_pdf_text):
+        assert render(path).startswith(b"\x89PNG")
+    # No document is left open on the file
+    path.unlink()
@@ -0,0 +1,40 @@
+from pdfse.metrics import Histogram, RunMetrics
+
+
+def test_histogram_quantiles():
+    histogram = Histogram(buckets=(0.1, 1.0))
+    for value in (0.05, 0.05, 0.5, 3.0):
+        histogram.observe(value)
+
+    assert histogram.counts == [2, 1, 1]
+    assert histogram.quantile(0.5) == 0.1
+    assert histogram.quantile(0.75) == 1.0
+    assert histogram.quantile(1.0) == 3.0
+
+
+def test_summary_and_prometheus_text(tmp_path):
+    metrics = RunMetrics()
+    metrics.inc("pdfse_heuristic_cache_entries_total", 3, result="hit")
+    metrics.inc("pdfse_heuristic_cache_entries_total", result="miss")
+    metrics.set("pdfse_documents_per_second", 12.5)
+    metrics.observe("pdfse_phase_seconds", 0.02, phase="parse")
+
+    summary = metrics.as_dict()
+    assert summary["counters"] == {
+        'pdfse_heuristic_cache_entries_total{result="hit"}': 3,
+        'pdfse_heuristic_cache_entries_total{result="miss"}': 1,
+    }
+    assert summary["gauges"] == {"pdfse_documents_per_second": 12.5}
+    assert summary["histograms"]['pdfse_phase_seconds{phase="parse"}']["count"] == 1
+
+    text = metrics.prometheus_text()
+    assert "# TYPE pdfse_heuristic_cache_entries_total counter" in text
+    assert 'pdfse_heuristic_cache_entries_total{result="hit"} 3' in text
+    assert "pdfse_documents_per_second 12.5" in text
+    assert 'pdfse_phase_seconds_bucket{phase="parse",le="0.01"} 0' in text
+    assert 'pdfse_phase_seconds_bucket{phase="parse",le="0.025"} 1' in text
+    assert 'pdfse_phase_seconds_bucket{phase="parse",le="+Inf"} 1' in text
+    assert 'pdfse_phase_seconds_count{phase="parse"} 1' in text
+
+    metrics.export(tmp_path / "metrics.json", tmp_path / "metrics.prom")
+    assert (tmp_path / "metrics.prom").read_text() == text
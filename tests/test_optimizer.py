@@ -0,0 +1,101 @@
+from pdfse.wordspace import Word, WordSpace
+from pdfse.optimizer import count_commands, optimize_commands, optimize_heuristic
+
+
+def cmd(name, **args):
+    return {"type": "command", "name": name, "args": args}
+
+
+def check(pattern, expected=True):
+    return {"name": "check_current_word_matches_regex", "args": {"pattern": pattern}, "check": expected}
+
+
+def make_wordspace():
+    return WordSpace([
+        Word("Nome:", (10, 10, 30, 20)),
+        Word("GOKU", (40, 10, 60, 20)),
+        Word("SON", (70, 10, 90, 20)),
+        Word("CPF:", (10, 30, 30, 40)),
+        Word("123", (40, 30, 60, 40)),
+    ], 100, 100)
+
+
+def test_removes_dead_and_invalid_commands():
+    plan = [
+        cmd("clear_text_buffer"),
+        cmd("move_down"),
+        cmd("anchor_to_text", text="Nome:"),
+        cmd("unknown"),
+        cmd("move_right", bad_arg=1),
+        cmd("move_right"),
+        cmd("collect"),
+        cmd("clear_text_buffer"),
+        cmd("clear_text_buffer"),
+        cmd("collect"),
+        cmd("move_down"),
+        cmd("move_left"),
+    ]
+    assert optimize_commands(plan) == [
+        cmd("move_down"),
+        cmd("anchor_to_text", text="Nome:"),
+        cmd("move_right"),
+        cmd("collect"),
+        cmd("clear_text_buffer"),
+        cmd("collect"),
+    ]
+
+
+def test_merges_jump_chains():
+    plan = [cmd("move_first"), cmd("move_next"), cmd("move_next", jump=1), cmd("collect")]
+    assert optimize_commands(plan) == [cmd("move_first"), cmd("move_next", jump=2), cmd("collect")]
+
+
+def test_keeps_anchor_fallbacks_and_spatial_chains():
+    # Each anchor only moves the cursor when it matches, so earlier ones stay
+    fallbacks = [
+        cmd("move_first"),
+        cmd("anchor_to_text", text="CPF:"),
+        cmd("anchor_to_regex", pattern="^RG"),
+        cmd("move_right"),
+        cmd("move_right", jump=1),
+        cmd("collect"),
+    ]
+    assert optimize_commands(fallbacks) == fallbacks
+    assert optimize_commands([cmd("move_down"), cmd("move_down"), cmd("collect")]) == [
+        cmd("move_down"), cmd("move_down"), cmd("collect")
+    ]
+    assert optimize_commands([cmd("anchor_to_text", text="CPF:"), cmd("move_last"), cmd("collect")]) == [
+        cmd("move_last"), cmd("collect")
+    ]
+
+    wordspace = make_wordspace()
+    optimized, _, _ = optimize_heuristic({"cpf": fallbacks}, [wordspace])
+    assert optimized["cpf"] == fallbacks
+
+
+def test_simplifies_ifs():
+    same = {"type": "if", "condition": check("Nome"), "then": [cmd("collect")], "else": [cmd("collect")]}
+    only_else = {"type": "if", "condition": check("Nome"), "then": [cmd("unknown")], "else": [cmd("collect")]}
+    never = {"type": "loop", "condition": check("x"), "body": [cmd("unknown")]}
+
+    assert optimize_commands([cmd("move_first"), same]) == [cmd("move_first"), cmd("collect")]
+    assert optimize_commands([cmd("move_first"), only_else, never]) == [
+        cmd("move_first"),
+        {"type": "if", "condition": check("Nome", False), "then": [cmd("collect")], "else": []},
+    ]
+
+
+def test_optimize_heuristic_keeps_only_verified_rewrites():
+    heuristic = {
+        "nome": [cmd("move_down"), cmd("anchor_to_text", text="Nome:"), cmd("move_right"), cmd("collect_trailing_sentence"), cmd("move_first")],
+        # The anchor finds nothing, so the move before it decides the result
+        "cpf": [cmd("move_last"), cmd("anchor_to_text", text="RG:"), cmd("collect")],
+        "@k": [{"text": "Nome:", "x": 0.2, "y": 0.15}],
+    }
+    optimized, before, after = optimize_heuristic(heuristic, [make_wordspace()])
+
+    assert optimized["nome"] == heuristic["nome"][:4]
+    assert optimized["cpf"] == heuristic["cpf"]
+    assert optimized["@k"] == heuristic["@k"]
+    assert (before, after) == (8, 7)
+    assert count_commands(optimized["nome"]) == 4
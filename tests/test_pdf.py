@@ -0,0 +1,95 @@
+import fitz
+from pdfse.pdf import get_pdf_wordspace, reading_order_words, render_pdf_regions, render_pdf_text
+from pdfse.utils import estimate_image_tokens
+from pdfse.wordspace import Word
+
+
+def _sample_pdf() -> bytes:
+    doc = fitz.open()
+    page = doc.new_page()
+    # Two columns whose rows sit a little off each other, a wide title and
+    # a word slightly raised within its line
+    page.insert_text((72, 60), "Carteira de Identidade Profissional", fontsize=14)
+    for row in range(8):
+        y = 100 + row * 18
+        page.insert_text((72, y), f"Campo{row}: valor {row}", fontsize=10)
+        page.insert_text((320, y + (row % 3)), f"Outro{row} dado{row}", fontsize=9)
+    page.insert_text((72, 300), "Inscrição", fontsize=10)
+    page.insert_text((140, 298), "101943", fontsize=12)
+    page.insert_text((400, 302), "PR", fontsize=8)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def test_reading_order_matches_pymupdf_sort():
+    doc = fitz.open(stream=_sample_pdf(), filetype="pdf")
+    page = doc[0]
+    expected = [Word(w[4], tuple(w[:4])) for w in page.get_text("words", sort=True)]
+    assert reading_order_words(page.get_text("words")) == expected
+    doc.close()
+
+
+def test_reading_order_empty_page():
+    assert reading_order_words([]) == []
+
+
+def test_get_pdf_wordspace_from_bytes():
+    ws = get_pdf_wordspace(_sample_pdf())
+    texts = [w.text for w in ws.words]
+    assert texts[:4] == ["Carteira", "de", "Identidade", "Profissional"]
+    assert texts[-3:] == ["Inscrição", "101943", "PR"]
+
+
+def _png_size(png: bytes) -> tuple[int, int]:
+    return int.from_bytes(png[16:20], "big"), int.from_bytes(png[20:24], "big")
+
+
+def _sparse_pdf(tmp_path):
+    path = tmp_path / "sparse.pdf"
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_text((72, 60), "ORDEM DOS ADVOGADOS DO BRASIL", fontsize=12)
+    page.insert_text((72, 80), "Nome: SON GOKU")
+    page.insert_text((72, 400), "Inscrição: 101943")
+    page.insert_text((72, 780), "Rodapé")
+    doc.save(path)
+    doc.close()
+    return path
+
+
+def test_render_regions_crops_and_collapses_empty_bands(tmp_path):
+    path = _sparse_pdf(tmp_path)
+    full_width, full_height = _png_size(render_pdf_text(path))
+    width, height = _png_size(render_pdf_regions(path))
+    assert width < full_width / 2
+    assert height < full_height / 4
+
+
+def test_render_regions_keeps_rows_near_anchors(tmp_path):
+    path = _sparse_pdf(tmp_path)
+    _, text_height = _png_size(render_pdf_regions(path))
+    _, anchored_height = _png_size(render_pdf_regions(path, lambda text: "Inscrição" in text))
+    assert anchored_height < text_height / 2
+    # No anchor found: the whole text is kept
+    assert render_pdf_regions(path, lambda text: False) == render_pdf_regions(path)
+
+
+def test_render_regions_of_a_page_without_text(tmp_path):
+    path = tmp_path / "blank.pdf"
+    doc = fitz.open()
+    doc.new_page()
+    doc.save(path)
+    doc.close()
+    assert render_pdf_regions(path) == render_pdf_text(path)
+
+
+def test_estimate_image_tokens():
+    def png(width, height):
+        return b"\x89PNG\r\n\x1a\n" + bytes(8) + width.to_bytes(4, "big") + height.to_bytes(4, "big")
+
+    assert estimate_image_tokens(png(512, 512)) == 255
+    # A Letter page at 300 DPI is scaled to 768x994: 2x2 tiles
+    assert estimate_image_tokens(png(2550, 3300)) == 765
+    assert estimate_image_tokens(png(1026, 561)) == 170 * 6 + 85
+    assert estimate_image_tokens(b"dummy image bytes") is None
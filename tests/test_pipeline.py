@@ -0,0 +1,95 @@
+import asyncio
+import pytest
+from pdfse.pipeline import Stage, run_pipeline
+
+
+@pytest.mark.asyncio
+async def test_items_flow_through_every_stage():
+    results = []
+
+    async def double(x):
+        await asyncio.sleep(0)
+        return x * 2
+
+    async def collect(x):
+        results.append(x)
+
+    await run_pipeline(range(20), [Stage("double", double, 3), Stage("collect", collect)], queue_size=2)
+
+    assert sorted(results) == [x * 2 for x in range(20)]
+
+
+@pytest.mark.asyncio
+async def test_queues_bound_work_in_flight():
+    in_flight = 0
+    peak = 0
+    release = asyncio.Event()
+
+    async def produce(x):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        return x
+
+    async def slow_sink(x):
+        nonlocal in_flight
+        await release.wait()
+        in_flight -= 1
+
+    task = asyncio.create_task(run_pipeline(range(100), [Stage("produce", produce, 4), Stage("sink", slow_sink)], queue_size=2))
+    await asyncio.sleep(0.05)
+    # One item in the sink, two queued before it, one per producer waiting to put
+    assert peak <= 1 + 2 + 4
+    release.set()
+    await task
+    assert in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_stage_error_stops_pipeline():
+    async def boom(x):
+        if x == 3:
+            raise ValueError("bad item")
+        return x
+
+    async def sink(x):
+        pass
+
+    with pytest.raises(ValueError):
+        await asyncio.wait_for(run_pipeline(range(10), [Stage("boom", boom, 2), Stage("sink", sink)], 1), 5)
+
+
+@pytest.mark.asyncio
+async def test_stats_split_work_from_waiting():
+    async def slow_source(x):
+        await asyncio.sleep(0.01)
+        return x
+
+    async def fast_sink(x):
+        pass
+
+    stats = await run_pipeline(range(5), [Stage("source", slow_source), Stage("sink", fast_sink)], queue_size=1)
+
+    assert stats["source"].items == stats["sink"].items == 5
+    assert stats["source"].busy >= 0.05
+    # The sink spends its time waiting on the slow stage before it
+    assert stats["sink"].waiting > stats["sink"].busy
+
+
+@pytest.mark.asyncio
+async def test_batched_stage_takes_what_is_queued():
+    batches = []
+    results = []
+
+    async def batch(items):
+        batches.append(list(items))
+        return [x * 10 for x in items]
+
+    async def collect(x):
+        results.append(x)
+
+    await run_pipeline(range(10), [Stage("batch", batch, 1, batch_size=4), Stage("collect", collect)], queue_size=8)
+
+    assert sorted(results) == [x * 10 for x in range(10)]
+    assert all(1 <= len(b) <= 4 for b in batches)
+    assert sorted(x for b in batches for x in b) == list(range(10))
@@ -0,0 +1,44 @@
+from pdfse.results import ResultCache, field_heuristic_hash, results_path_for
+from pathlib import Path
+
+PLAN = [{"type": "command", "name": "collect", "args": {}}]
+
+
+def test_get_serves_only_matching_hashes(tmp_path):
+    cache = ResultCache(tmp_path / "results.db")
+    cache.put("pdf1", "label", {"a": "h1", "b": "h2"}, {"a": "x", "b": None})
+
+    assert cache.get("pdf1", "label", {"a": "h1", "b": "h2"}) == {"a": "x", "b": None}
+    assert cache.get("pdf1", "label", {"a": "h1", "b": "changed"}) == {"a": "x"}
+    assert cache.get("pdf2", "label", {"a": "h1"}) == {}
+    cache.close()
+
+
+def test_delete_and_clear(tmp_path):
+    cache = ResultCache(tmp_path / "results.db")
+    cache.put("pdf1", "a", {"f": "h"}, {"f": "1"})
+    cache.put("pdf1", "b", {"f": "h"}, {"f": "2"})
+
+    assert cache.delete(["a", "missing"]) == 1
+    assert cache.get("pdf1", "a", {"f": "h"}) == {}
+    cache.clear()
+    assert cache.get("pdf1", "b", {"f": "h"}) == {}
+    cache.close()
+
+
+def test_field_hash_covers_variants_and_loop_cap():
+    generic = {"f": PLAN, "g": PLAN}
+    base = field_heuristic_hash(generic, "f", 100)
+
+    assert field_heuristic_hash({**generic, "g": []}, "f", 100) == base
+    assert field_heuristic_hash(generic, "f", 50) != base
+    with_variant = {**generic, "@k": [{"text": "Nome", "x": 0.1, "y": 0.1}], "f@k": []}
+    assert field_heuristic_hash(with_variant, "f", 100) != base
+    # A variant for another field changes which variant dispatch picks
+    # for this one too
+    with_g_variant = {**generic, "@j": [{"text": "Nome", "x": 0.1, "y": 0.1}], "g@j": []}
+    assert field_heuristic_hash({**with_g_variant, **with_variant}, "g", 100) != field_heuristic_hash(with_g_variant, "g", 100)
+
+
+def test_results_path_for():
+    assert results_path_for(Path("/x/heuristics.db")) == Path("/x/heuristics.results.db")
@@ -0,0 +1,143 @@
+import asyncio
+import httpx
+import openai
+import pytest
+from unittest.mock import patch
+
+from pdfse.scheduler import (
+    LLMScheduler,
+    SchedulerConfig,
+    MemoryBudget,
+    RateLimiter,
+    is_retryable
+)
+
+
+def _status_error(cls, status: int, headers: dict | None = None):
+    request = httpx.Request("POST", "http://test/v1/chat/completions")
+    response = httpx.Response(status, headers=headers or {}, request=request)
+    return cls("error", response=response, body=None)
+
+
+def test_is_retryable():
+    assert is_retryable(asyncio.TimeoutError())
+    assert is_retryable(_status_error(openai.RateLimitError, 429))
+    assert is_retryable(_status_error(openai.InternalServerError, 503))
+    assert not is_retryable(_status_error(openai.BadRequestError, 400))
+    assert not is_retryable(ValueError("bad json"))
+
+
+def test_backoff_honors_retry_after():
+    scheduler = LLMScheduler(SchedulerConfig(backoff_base=0.01, backoff_max=0.01))
+    exc = _status_error(openai.RateLimitError, 429, {"retry-after": "7"})
+    assert scheduler.backoff_delay(0, exc) == 7.0
+    assert 0 <= scheduler.backoff_delay(10) <= 0.01
+
+
+@pytest.mark.asyncio
+@patch("rich.print")
+async def test_submit_retries_then_succeeds(mock_rich_print):
+    scheduler = LLMScheduler(SchedulerConfig(backoff_base=0.001, backoff_max=0.001))
+    calls = 0
+
+    async def request():
+        nonlocal calls
+        calls += 1
+        if calls < 3:
+            raise _status_error(openai.InternalServerError, 500)
+        return {"field": []}
+
+    assert await scheduler.submit("label", request) == {"field": []}
+    assert calls == 3
+
+
+@pytest.mark.asyncio
+async def test_submit_does_not_retry_client_errors():
+    scheduler = LLMScheduler(SchedulerConfig(backoff_base=0.001))
+    calls = 0
+
+    async def request():
+        nonlocal calls
+        calls += 1
+        raise _status_error(openai.BadRequestError, 400)
+
+    with pytest.raises(openai.BadRequestError):
+        await scheduler.submit("label", request)
+    assert calls == 1
+
+
+@pytest.mark.asyncio
+async def test_submit_label_timeout():
+    scheduler = LLMScheduler(SchedulerConfig(label_timeout=0.05))
+
+    async def request():
+        await asyncio.sleep(10)
+
+    with pytest.raises(asyncio.TimeoutError):
+        await scheduler.submit("label", request)
+
+
+@pytest.mark.asyncio
+async def test_label_deadline_spans_requests():
+    scheduler = LLMScheduler(SchedulerConfig(label_timeout=0.1))
+
+    async def request():
+        await asyncio.sleep(0.06)
+        return "ok"
+
+    # Each request fits in label_timeout on its own
+    assert await scheduler.submit("label", request) == "ok"
+    assert await scheduler.submit("label", request) == "ok"
+
+    with scheduler.label_deadline("label"):
+        assert await scheduler.submit("label", request) == "ok"
+        with pytest.raises(asyncio.TimeoutError):
+            await scheduler.submit("label", request)
+        # Other labels keep their own budget
+        assert await scheduler.submit("other", request) == "ok"
+    assert scheduler._deadlines == {}
+
+
+@pytest.mark.asyncio
+async def test_max_in_flight():
+    scheduler = LLMScheduler(SchedulerConfig(max_in_flight=2))
+    in_flight = 0
+    peak = 0
+
+    async def request():
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+
+    await asyncio.gather(*[scheduler.submit(str(i), request) for i in range(6)])
+    assert peak == 2
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_waits_for_window():
+    limiter = RateLimiter(requests_per_minute=2, tokens_per_minute=None, window=0.1)
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    for _ in range(3):
+        await limiter.acquire()
+    assert loop.time() - start >= 0.09
+
+
+@pytest.mark.asyncio
+async def test_memory_budget_blocks_until_release():
+    budget = MemoryBudget(limit=100)
+    await budget.acquire(80)
+    waiter = asyncio.create_task(budget.acquire(50))
+    await asyncio.sleep(0.01)
+    assert not waiter.done()
+
+    await budget.release(80)
+    await asyncio.wait_for(waiter, 1)
+    assert budget.used == 50
+
+    # Oversized reservations are admitted once the budget is empty
+    await budget.release(50)
+    await budget.acquire(500)
+    assert budget.used == 500
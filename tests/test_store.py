@@ -0,0 +1,90 @@
+import json
+import pytest
+
+from pdfse.extract import _maybe_migrate_legacy_cache
+from pdfse.store import (
+    JsonHeuristicsStore,
+    SqliteHeuristicsStore,
+    open_store,
+    migrate_json_cache
+)
+
+MOVE_FIRST = [{"type": "command", "name": "move_first", "args": {}}]
+MOVE_LAST = [{"type": "command", "name": "move_last", "args": {}}]
+
+
+@pytest.fixture(params=["heuristics.db", "heuristics.json"])
+def store(request, tmp_path):
+    return open_store(tmp_path / request.param)
+
+
+def test_open_store_picks_backend(tmp_path):
+    assert isinstance(open_store(tmp_path / "h.json"), JsonHeuristicsStore)
+    assert isinstance(open_store(tmp_path / "h.db"), SqliteHeuristicsStore)
+
+
+def test_upsert_merges_fields(store):
+    _, first = store.upsert({"label_a": {"field1": MOVE_FIRST}})
+    replaced, second = store.upsert({"label_a": {"field2": MOVE_LAST}, "label_b": {"field1": MOVE_FIRST}})
+    store.upsert({"label_a": {"field1": MOVE_LAST}})
+
+    assert replaced == first
+    assert second != 0
+
+    assert store.load() == {
+        "label_a": {"field1": MOVE_LAST, "field2": MOVE_LAST},
+        "label_b": {"field1": MOVE_FIRST},
+    }
+
+
+def test_load_only_requested_labels(store):
+    store.upsert({"label_a": {"field1": MOVE_FIRST}, "label_b": {"field1": MOVE_LAST}})
+
+    assert store.load(["label_b", "missing"]) == {"label_b": {"field1": MOVE_LAST}}
+    assert store.load([]) == {}
+
+
+def test_delete_and_clear(store):
+    store.upsert({"label_a": {"field1": MOVE_FIRST}, "label_b": {"field1": MOVE_LAST}})
+
+    assert store.delete(["label_a", "missing"]) == ["label_a"]
+    assert store.load() == {"label_b": {"field1": MOVE_LAST}}
+
+    store.clear()
+    assert store.load() == {}
+
+
+def test_sqlite_skips_corrupt_rows(tmp_path):
+    store = SqliteHeuristicsStore(tmp_path / "h.db")
+    store.upsert({"label_a": {"field1": MOVE_FIRST, "field2": MOVE_LAST}})
+    conn = store._connect()
+    with conn:
+        conn.execute("UPDATE heuristics SET commands = 'not json' WHERE field = 'field2'")
+    conn.close()
+
+    assert store.load() == {"label_a": {"field1": MOVE_FIRST}}
+
+
+def test_migrate_json_cache(tmp_path):
+    legacy = tmp_path / "heuristics.json"
+    legacy.write_text(json.dumps({
+        "label_a": {"field1": MOVE_FIRST},
+        "label_b": {"field1": MOVE_LAST},
+    }))
+    store = SqliteHeuristicsStore(tmp_path / "h.db")
+
+    assert migrate_json_cache(legacy, store) == 2
+    assert store.load(["label_a"]) == {"label_a": {"field1": MOVE_FIRST}}
+
+
+def test_legacy_cache_is_migrated_once(tmp_path):
+    legacy = tmp_path / "heuristics.json"
+    legacy.write_text(json.dumps({"label_a": {"field1": MOVE_FIRST}}))
+    store = SqliteHeuristicsStore(tmp_path / "h.db")
+
+    _maybe_migrate_legacy_cache(store, legacy)
+    assert store.load() == {"label_a": {"field1": MOVE_FIRST}}
+
+    store.clear()
+    _maybe_migrate_legacy_cache(store, legacy)
+    assert store.is_empty()
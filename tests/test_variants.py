@@ -0,0 +1,76 @@
+import pytest
+from pydantic import ValidationError
+from pdfse.models import DatasetEntry
+from pdfse.wordspace import Word, WordSpace
+from pdfse.machine import HeuristicMachine
+from pdfse.variants import build_variant, get_variants, select_variant, is_variant_field
+
+
+def _wordspace(*positions: tuple[str, float, float]) -> WordSpace:
+    words = [Word(text, (x, y, x + 10, y + 10)) for text, x, y in positions]
+    return WordSpace(words, 100, 100)
+
+
+TOP_LAYOUT = _wordspace(("Nome:", 5, 5), ("GOKU", 20, 5), ("CPF:", 5, 20), ("123", 20, 20))
+TOP_LAYOUT_OTHER_DOC = _wordspace(("Nome:", 6, 5), ("VEGETA", 20, 5), ("CPF:", 6, 20), ("456", 20, 20))
+BOTTOM_LAYOUT = _wordspace(("CPF:", 5, 60), ("789", 5, 75), ("Nome:", 5, 78), ("GOHAN", 5, 90))
+
+TOP_PLAN = {
+    "nome": [
+        {"type": "command", "name": "anchor_to_text", "args": {"text": "Nome:"}},
+        {"type": "command", "name": "move_right", "args": {}},
+        {"type": "command", "name": "collect", "args": {}},
+    ],
+}
+BOTTOM_PLAN = {
+    "nome": [
+        {"type": "command", "name": "anchor_to_text", "args": {"text": "Nome:"}},
+        {"type": "command", "name": "move_down", "args": {}},
+        {"type": "command", "name": "collect", "args": {}},
+    ],
+    "cpf": [
+        {"type": "command", "name": "anchor_to_text", "args": {"text": "CPF:"}},
+        {"type": "command", "name": "move_down", "args": {}},
+        {"type": "command", "name": "collect", "args": {}},
+    ],
+}
+
+
+def test_build_variant():
+    variant = build_variant(TOP_PLAN, TOP_LAYOUT)
+
+    assert all(is_variant_field(name) for name in variant)
+    ((signature, fields),) = get_variants(variant).values()
+    assert signature == [{"text": "Nome:", "x": 0.1, "y": 0.1}]
+    assert fields == TOP_PLAN
+
+
+def test_build_variant_without_text_anchor():
+    plan = {"nome": [{"type": "command", "name": "move_first", "args": {}}]}
+    assert build_variant(plan, TOP_LAYOUT) == {}
+
+
+def test_select_variant_dispatches_by_layout():
+    label_heuristic = {
+        "nome": [{"type": "command", "name": "move_first", "args": {}}],
+        **build_variant(TOP_PLAN, TOP_LAYOUT),
+        **build_variant(BOTTOM_PLAN, BOTTOM_LAYOUT),
+    }
+
+    assert select_variant(label_heuristic, TOP_LAYOUT_OTHER_DOC) == TOP_PLAN
+    assert select_variant(label_heuristic, BOTTOM_LAYOUT) == BOTTOM_PLAN
+    assert select_variant(label_heuristic, _wordspace(("Nome:", 50, 50))) == {}
+    assert select_variant({"nome": []}, TOP_LAYOUT) == {}
+
+
+def test_variant_plans_extract():
+    plan = select_variant(
+        {**build_variant(TOP_PLAN, TOP_LAYOUT), **build_variant(BOTTOM_PLAN, BOTTOM_LAYOUT)},
+        BOTTOM_LAYOUT
+    )
+    assert HeuristicMachine(BOTTOM_LAYOUT).run(plan) == {"nome": "GOHAN", "cpf": "789"}
+
+
+def test_schema_fields_cannot_contain_separator():
+    with pytest.raises(ValidationError):
+        DatasetEntry(label="ficha", pdf_path="a.pdf", extraction_schema={"contato@trabalho": "Work contact"})